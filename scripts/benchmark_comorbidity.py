@@ -0,0 +1,49 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from features import DIAG_CAT_COLS, calculate_comorbidity, comorbidity_count  # noqa: E402
+
+CATEGORIES = ['circulatory', 'respiratory', 'digestive', 'diabetes', 'injury',
+              'musculoskeletal', 'genitourinary', 'neoplasms', 'others']
+
+
+def make_frame(n_rows, seed=42):
+    rng = np.random.default_rng(seed)
+    cats = np.array(CATEGORIES, dtype=object)
+    return pd.DataFrame({c: cats[rng.integers(0, len(cats), n_rows)] for c in DIAG_CAT_COLS})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parity check and benchmark for comorbidity_count.")
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--rowwise-limit', type=int, default=200_000,
+                        help="Above this size the row-wise time is extrapolated from a sample.")
+    args = parser.parse_args()
+
+    for n_rows in args.rows:
+        df = make_frame(n_rows)
+        start = time.perf_counter()
+        fast = comorbidity_count(df)
+        t_fast = time.perf_counter() - start
+
+        sample = df.iloc[:min(n_rows, args.rowwise_limit)]
+        start = time.perf_counter()
+        slow = sample.apply(calculate_comorbidity, axis=1)
+        t_slow = (time.perf_counter() - start) * n_rows / len(sample)
+
+        # Parity with the original row-wise definition
+        assert (fast.iloc[:len(sample)].to_numpy() == slow.to_numpy()).all(), "comorbidity_count mismatch"
+
+        note = " (extrapolated)" if len(sample) < n_rows else ""
+        print(f"{n_rows:>12,} rows | row-wise {t_slow:8.2f}s{note} | "
+              f"bitmask {t_fast:6.3f}s | speedup {t_slow / t_fast:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import average_precision_score, precision_score, recall_score, roc_auc_score
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from evaluation import (  # noqa: E402
+    SUBGROUP_COLUMNS, THRESHOLDS, average_precision, evaluate, roc_auc, threshold_curve,
+)
+
+
+def make_holdout(n_rows, seed=42):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        'race': rng.choice(['Caucasian', 'AfricanAmerican', 'Hispanic', 'Asian', 'Other'], n_rows),
+        'gender': rng.choice(['Female', 'Male'], n_rows),
+        'age_numeric': rng.choice(np.arange(5, 100, 10), n_rows),
+    })
+    y = (rng.random(n_rows) < 0.35).astype(np.int64)
+    # Scores on a 3-decimal grid, so ties and scores exactly on a threshold occur
+    scores = np.round(np.clip(rng.normal(0.4 + 0.2 * y, 0.2), 0, 1), 3)
+    return y, scores, frame
+
+
+def naive(y, scores, frame, n_bootstrap, seed=0):
+    """One resample at a time, one threshold and group at a time."""
+    rng = np.random.default_rng(seed)
+    groups = [np.ones(len(y), dtype=bool)] + [(frame[col] == value).to_numpy()
+                                             for col in SUBGROUP_COLUMNS for value in sorted(frame[col].unique())]
+    out = []
+    for _ in range(n_bootstrap):
+        index = rng.integers(0, len(y), len(y))
+        y_b, s_b = y[index], scores[index]
+        for member in groups:
+            m = member[index]
+            for t in THRESHOLDS:
+                flagged = m & (s_b >= t)
+                tp = np.sum(flagged & (y_b == 1))
+                out.append((tp, flagged.sum(), np.sum(m & (y_b == 1))))
+    return out
+
+
+def check_parity(y, scores, frame):
+    table = evaluate(y, scores, frame, n_bootstrap=0)
+    checks = [('all', 'all', np.ones(len(y), dtype=bool)),
+              ('race', 'Asian', (frame['race'] == 'Asian').to_numpy()),
+              ('age_numeric', 55, (frame['age_numeric'] == 55).to_numpy())]
+    for group_by, group, member in checks:
+        rows = table[(table['group_by'] == group_by) & (table['group'] == group)]
+        for t, precision, recall in zip(rows['threshold'], rows['precision'], rows['recall']):
+            pred = (scores[member] >= t).astype(int)
+            if pred.any():
+                assert np.isclose(precision, precision_score(y[member], pred)), (group, t, 'precision')
+            assert np.isclose(recall, recall_score(y[member], pred)), (group, t, 'recall')
+    curve = threshold_curve(y, scores)
+    assert np.isclose(roc_auc(curve), roc_auc_score(y, scores))
+    assert np.isclose(average_precision(curve), average_precision_score(y, scores))
+    print(f"parity vs sklearn: {len(checks)} groups x {len(THRESHOLDS)} thresholds, ROC AUC and AP ok")
+
+
+def check_intervals(y, scores, frame, n_bootstrap):
+    index = evaluate(y, scores, frame, n_bootstrap=n_bootstrap, method='index')
+    multinomial = evaluate(y, scores, frame, n_bootstrap=n_bootstrap, method='multinomial', seed=1)
+    # The two draw the same distribution, so bounds differ only by Monte Carlo noise
+    # (largest in small groups at extreme thresholds, where few rows are flagged)
+    overall = (index['group_by'] == 'all').to_numpy()
+    diffs = np.concatenate([np.abs(index[col] - multinomial[col]).to_numpy()
+                            for col in ['recall_low', 'recall_high', 'precision_low', 'precision_high']])
+    print(f"index vs multinomial resampling ({len(y):,} rows, {n_bootstrap} resamples): interval bounds differ "
+          f"by {np.nanmedian(diffs):.4f} (median), {np.nanmax(diffs[np.tile(overall, 4)]):.4f} (largest, all rows)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the threshold evaluation against a per-resample loop.")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--bootstrap', type=int, default=500)
+    parser.add_argument('--naive-resamples', type=int, default=2,
+                        help="Resamples timed for the loop; its full time is extrapolated from them.")
+    args = parser.parse_args()
+
+    y, scores, frame = make_holdout(args.rows)
+    check_parity(y[:100_000], scores[:100_000], frame.iloc[:100_000])
+    check_intervals(y[:50_000], scores[:50_000], frame.iloc[:50_000], 200)
+
+    for method in ['multinomial', 'index']:
+        start = time.perf_counter()
+        evaluate(y, scores, frame, n_bootstrap=args.bootstrap, method=method)
+        print(f"evaluate ({method:>11}) {args.rows:>12,} rows x {args.bootstrap} resamples: "
+              f"{time.perf_counter() - start:8.2f}s")
+
+    start = time.perf_counter()
+    naive(y, scores, frame, args.naive_resamples)
+    t_naive = (time.perf_counter() - start) * args.bootstrap / args.naive_resamples
+    print(f"per-resample loop       {args.rows:>12,} rows x {args.bootstrap} resamples: "
+          f"{t_naive:8.2f}s (extrapolated)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from artifacts import load_artifacts  # noqa: E402
+from forest_arrays import ForestArrays, flatten_forest  # noqa: E402
+from score import feature_matrix  # noqa: E402
+from storage import read_table  # noqa: E402
+
+
+def sklearn_nbytes(forest):
+    return sum(est.tree_.__getstate__()['nodes'].nbytes + est.tree_.value.nbytes for est in forest.estimators_)
+
+
+def best_of(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="sklearn forest vs flattened-array predictor.")
+    parser.add_argument('--model-dir', default='output')
+    parser.add_argument('--features', default='data/final_features.parquet')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 64, 512, 4096])
+    args = parser.parse_args()
+
+    encoder, models = load_artifacts(args.model_dir, mmap=False)
+    forest = models['random_forest']
+    # Single-threaded on both sides, as in the scoring workers
+    forest.n_jobs = 1
+    arrays, roots, max_depth = flatten_forest(forest)
+    flat = ForestArrays(dict(arrays, roots=roots), {'n_features': forest.n_features_in_,
+                                                    'classes': forest.classes_.tolist(),
+                                                    'max_depth': max_depth})
+
+    X = feature_matrix(encoder, read_table(args.features).head(max(args.batch_sizes)))
+    flat_bytes = sum(a.nbytes for a in arrays.values()) + roots.nbytes
+    print(f"Model memory: sklearn {sklearn_nbytes(forest) / 2**20:.1f} MB | "
+          f"flattened {flat_bytes / 2**20:.1f} MB")
+
+    for n in args.batch_sizes:
+        batch = X[:n]
+        repeats = max(3, 2000 // n)
+        t_sk, p_sk = best_of(lambda: forest.predict_proba(batch), repeats)
+        t_flat, p_flat = best_of(lambda: flat.predict_proba(batch), repeats)
+        max_diff = np.abs(p_sk - p_flat).max()
+        assert max_diff < 1e-5, f"probabilities differ by {max_diff}"
+        print(f"batch {n:>6,} | sklearn {t_sk * 1000:9.2f} ms | flattened {t_flat * 1000:9.2f} ms | "
+              f"speedup {t_sk / t_flat:5.2f}x | max |dp| {max_diff:.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from artifacts import load_artifacts  # noqa: E402
+
+
+def memory_kb():
+    """RSS split into private (anonymous) and shared-file pages, plus PSS."""
+    out = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(('VmRSS', 'RssAnon', 'RssFile')):
+                key, value = line.split(':')
+                out[key] = int(value.split()[0])
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            if line.startswith('Pss:'):
+                out['Pss'] = int(line.split()[1])
+    return out
+
+
+def worker(model_dir, mmap, n_features, barrier, results):
+    before = memory_kb()
+    start = time.perf_counter()
+    _, models = load_artifacts(model_dir, mmap=mmap)
+    load_s = time.perf_counter() - start
+    # Touch the forest like a scoring call would
+    X = np.random.default_rng(0).random((2000, n_features), dtype=np.float32)
+    models['random_forest'].predict_proba(X)
+    # Measure while all workers are alive, so shared pages are split in PSS
+    barrier.wait()
+    after = memory_kb()
+    results.put((load_s, {k: after[k] - before.get(k, 0) for k in after}))
+    barrier.wait()
+
+
+def run(model_dir, mmap, n_workers, n_features):
+    ctx = mp.get_context('spawn')
+    barrier = ctx.Barrier(n_workers)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(model_dir, mmap, n_features, barrier, results))
+             for _ in range(n_workers)]
+    for p in procs:
+        p.start()
+    out = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    load = np.array([o[0] for o in out])
+    mem = {k: np.mean([o[1][k] for o in out]) / 1024 for k in out[0][1]}
+    label = 'mmap arrays' if mmap else 'joblib pickle'
+    print(f"{label:>14} | load {load.mean() * 1000:8.1f} ms | RSS +{mem['VmRSS']:7.1f} MB "
+          f"(anon {mem['RssAnon']:6.1f}, file {mem['RssFile']:6.1f}) | PSS +{mem['Pss']:7.1f} MB per worker")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start time and memory of model artifacts across workers.")
+    parser.add_argument('--model-dir', default='output')
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    encoder, _ = load_artifacts(args.model_dir, mmap=True)
+    n_features = len(encoder.get_feature_names_out())
+    print(f"{args.workers} concurrent workers, forest from {args.model_dir}")
+    run(args.model_dir, False, args.workers, n_features)
+    run(args.model_dir, True, args.workers, n_features)
+
+
+if __name__ == "__main__":
+    main()
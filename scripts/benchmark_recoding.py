@@ -0,0 +1,81 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from preprocessing import (  # noqa: E402
+    ADMISSION_SOURCE_GROUPS, DISCHARGE_GROUPS,
+    categorize_icd9, group_admission_source, group_discharge_disposition,
+    recode_icd9, recode_ids,
+)
+
+# A mix of the code shapes found in diabetic_data.csv: plain integers,
+# decimals, V/E supplementary codes and missing values.
+SAMPLE_CODES = ['250.83', '250', '276', '428', '414', '786', '427', 'V57', 'E888',
+                '403', '599', '715', '820', '162', '38', '491', '785', '787.01',
+                '996', '250.02', '682', '434', '560', '459.9', np.nan]
+
+
+def make_frame(n_rows, seed=42):
+    rng = np.random.default_rng(seed)
+    codes = np.array(SAMPLE_CODES, dtype=object)
+    return pd.DataFrame({
+        'diag_1': codes[rng.integers(0, len(codes), n_rows)],
+        'diag_2': codes[rng.integers(0, len(codes), n_rows)],
+        'diag_3': codes[rng.integers(0, len(codes), n_rows)],
+        'discharge_disposition_id': rng.integers(1, 30, n_rows),
+        'admission_source_id': rng.integers(1, 27, n_rows),
+    })
+
+
+def rowwise(df):
+    out = pd.DataFrame(index=df.index)
+    out['discharge_disposition_group'] = df['discharge_disposition_id'].apply(group_discharge_disposition)
+    out['admission_source_group'] = df['admission_source_id'].apply(group_admission_source)
+    for col in ['diag_1', 'diag_2', 'diag_3']:
+        out[f'{col}_cat'] = df[col].apply(categorize_icd9)
+    return out
+
+
+def vectorized(df):
+    out = pd.DataFrame(index=df.index)
+    out['discharge_disposition_group'] = recode_ids(df['discharge_disposition_id'], DISCHARGE_GROUPS)
+    out['admission_source_group'] = recode_ids(df['admission_source_id'], ADMISSION_SOURCE_GROUPS)
+    for col in ['diag_1', 'diag_2', 'diag_3']:
+        out[f'{col}_cat'] = recode_icd9(df[col])
+    return out
+
+
+def timed(fn, df):
+    start = time.perf_counter()
+    result = fn(df)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark row-wise vs vectorized recoding.")
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 10_000_000])
+    parser.add_argument('--rowwise-limit', type=int, default=1_000_000,
+                        help="Above this size the row-wise time is extrapolated from a sample.")
+    args = parser.parse_args()
+
+    for n_rows in args.rows:
+        df = make_frame(n_rows)
+        fast, t_fast = timed(vectorized, df)
+
+        sample = df.iloc[:min(n_rows, args.rowwise_limit)]
+        slow, t_slow = timed(rowwise, sample)
+        t_slow *= n_rows / len(sample)
+        pd.testing.assert_frame_equal(fast.iloc[:len(sample)], slow)
+
+        note = " (extrapolated)" if len(sample) < n_rows else ""
+        print(f"{n_rows:>12,} rows | row-wise {t_slow:8.2f}s{note} | "
+              f"vectorized {t_fast:6.2f}s | speedup {t_slow / t_fast:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
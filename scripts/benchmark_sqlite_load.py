@@ -0,0 +1,80 @@
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from create_db import load_table  # noqa: E402
+from run_10_queries import SCAN_QUERIES  # noqa: E402
+from storage import read_table  # noqa: E402
+
+
+def legacy_load(conn, df):
+    """The loader create_database used before: untyped columns, no indexes."""
+    df.to_sql('patients', conn, if_exists='replace', index=False)
+
+
+def index_used(conn, sql):
+    """Name of the index the query plan reads `patients` through, or 'table scan'."""
+    for row in conn.execute('EXPLAIN QUERY PLAN ' + sql):
+        detail = row[-1]
+        if 'INDEX' in detail:
+            return detail.split('INDEX ', 1)[1].split()[0]
+    return 'table scan'
+
+
+def time_queries(conn, repeat):
+    timings, results = [], []
+    for _, sql in SCAN_QUERIES:
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rows = conn.execute(sql).fetchall()
+            best = min(best, time.perf_counter() - start)
+        timings.append(best)
+        results.append(rows)
+    return timings, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the to_sql load with the typed, indexed bulk loader.")
+    parser.add_argument('--input', default='data/processed_data.parquet')
+    parser.add_argument('--scale', type=int, default=1, help="Replicate the input this many times")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per query; the best is reported")
+    args = parser.parse_args()
+
+    df = read_table(args.input)
+    if args.scale > 1:
+        df = pd.concat([df] * args.scale, ignore_index=True)
+    print(f"{len(df):,} rows, {len(df.columns)} columns\n")
+
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, loader in [('to_sql', legacy_load), ('bulk loader', load_table)]:
+            conn = sqlite3.connect(os.path.join(tmp, f'{name.replace(" ", "_")}.db'))
+            start = time.perf_counter()
+            loader(conn, df)
+            load_time = time.perf_counter() - start
+            report[name] = (load_time,) + time_queries(conn, args.repeat)
+            if loader is load_table:
+                plans = [index_used(conn, sql) for _, sql in SCAN_QUERIES]
+            conn.close()
+
+    old, new = report['to_sql'], report['bulk loader']
+    print(f"{'':<55} {'to_sql':>10} {'indexed':>10}")
+    print(f"{'load':<55} {old[0]:>9.3f}s {new[0]:>9.3f}s")
+    for (title, _), t_old, t_new, r_old, r_new, plan in zip(SCAN_QUERIES, old[1], new[1], old[2], new[2], plans):
+        # Ties in ORDER BY count may come back in a different order
+        same = sorted(r_old, key=repr) == sorted(r_new, key=repr)
+        print(f"{title[:55]:<55} {t_old * 1000:>8.2f}ms {t_new * 1000:>8.2f}ms "
+              f"{t_old / t_new:>6.1f}x  {plan}{'' if same else '  RESULTS DIFFER'}")
+    print(f"{'all queries':<55} {sum(old[1]) * 1000:>8.2f}ms {sum(new[1]) * 1000:>8.2f}ms "
+          f"{sum(old[1]) / sum(new[1]):>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
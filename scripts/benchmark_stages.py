@@ -0,0 +1,139 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC_DIR)
+from cli import parse_rows  # noqa: E402
+
+CLI = os.path.join(SRC_DIR, 'cli.py')
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stage_baseline.json')
+
+# Pipeline stages in run order, as cli.py arguments relative to a scale's
+# work directory. Each one runs in its own process and its peak RSS is the
+# wait4 rusage of that child, which also covers its worker pools. Linux
+# carries the parent's high-water mark into a forked child, so this script
+# must stay light: no pandas/numpy here, the data is generated by `synth`.
+STAGES = {
+    'preprocess': ['preprocess', '--input', 'diabetic_data.csv', '--output', 'processed_data.parquet',
+                   '--history', 'patient_history.parquet'],
+    'features': ['features', '--input', 'processed_data.parquet', '--output', 'final_features.parquet'],
+    'train': ['train', '--input', 'final_features.parquet', '--output-dir', 'output'],
+    'db': ['db', '--input', 'processed_data.parquet', '--db', 'hospital.db', '--history', 'patient_history.parquet'],
+    'queries': ['queries', '--db', 'hospital.db'],
+}
+# A stage regresses when it is slower or larger than its baseline by more
+# than TOLERANCE, plus an absolute slack so that sub-second stages are not
+# failed by process start-up jitter.
+TOLERANCE = 0.25
+SLACK_SECONDS = 0.5
+SLACK_RSS_MB = 32
+
+
+def run_stage(args, cwd, log_path):
+    """Run one cli.py command; returns (wall seconds, peak RSS in MB)."""
+    with open(log_path, 'w') as log:
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, CLI] + args, cwd=cwd, stdout=log, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(proc.pid, 0)
+        seconds = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode:
+        raise RuntimeError(f"cli.py {' '.join(args)} failed with exit code {proc.returncode}; see {log_path}")
+    # ru_maxrss is in KiB on Linux
+    return seconds, usage.ru_maxrss / 1024
+
+
+def prepare(work_dir, label, n_rows, seed):
+    scale_dir = os.path.join(work_dir, label)
+    raw = os.path.join(scale_dir, 'diabetic_data.csv')
+    stamp = os.path.join(scale_dir, 'synthetic.json')
+    wanted = {'rows': n_rows, 'seed': seed}
+    if os.path.exists(stamp) and os.path.exists(raw):
+        with open(stamp) as f:
+            if json.load(f) == wanted:
+                return scale_dir
+    os.makedirs(os.path.join(scale_dir, 'output'), exist_ok=True)
+    subprocess.run([sys.executable, CLI, 'synth', '--rows', str(n_rows), '--output', raw, '--seed', str(seed)],
+                   check=True)
+    with open(stamp, 'w') as f:
+        json.dump(wanted, f)
+    return scale_dir
+
+
+def regressions(results, baseline, tolerance):
+    failures = []
+    for label, stages in results.items():
+        for stage, current in stages.items():
+            base = baseline.get(label, {}).get(stage)
+            if base is None:
+                continue
+            time_limit = base['seconds'] * (1 + tolerance) + SLACK_SECONDS
+            rss_limit = base['peak_rss_mb'] * (1 + tolerance) + SLACK_RSS_MB
+            if current['seconds'] > time_limit:
+                failures.append(f"{label} {stage}: {current['seconds']:.2f}s > {time_limit:.2f}s "
+                                f"(baseline {base['seconds']:.2f}s)")
+            if current['peak_rss_mb'] > rss_limit:
+                failures.append(f"{label} {stage}: {current['peak_rss_mb']:.0f} MB > {rss_limit:.0f} MB "
+                                f"(baseline {base['peak_rss_mb']:.0f} MB)")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time every pipeline stage on synthetic data and fail on regressions against a baseline.")
+    parser.add_argument('--scales', nargs='+', default=['100k'], help="Row counts, e.g. 100k 1m 10m")
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES))
+    parser.add_argument('--work-dir', default='output/bench', help="Synthetic inputs and stage outputs per scale")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="Store this run as the baseline for the scales and stages it covered")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'scale':>6} {'stage':<11} {'seconds':>9} {'rows/sec':>11} {'peak RSS':>10}")
+    for label in args.scales:
+        n_rows = parse_rows(label)
+        scale_dir = prepare(args.work_dir, label, n_rows, args.seed)
+        results[label] = {}
+        for stage in args.stages:
+            seconds, rss_mb = run_stage(STAGES[stage], scale_dir, os.path.join(scale_dir, f'{stage}.log'))
+            results[label][stage] = {'rows': n_rows, 'seconds': round(seconds, 3),
+                                     'rows_per_sec': round(n_rows / seconds), 'peak_rss_mb': round(rss_mb, 1)}
+            print(f"{label:>6} {stage:<11} {seconds:>8.2f}s {n_rows / seconds:>11,.0f} {rss_mb:>8.0f}MB")
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if args.update_baseline:
+        for label, stages in results.items():
+            baseline.setdefault(label, {}).update(stages)
+        baseline['machine'] = {'python': platform.python_version(), 'platform': platform.platform(),
+                               'cpus': os.cpu_count()}
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\nBaseline written to {args.baseline}")
+        return
+
+    missing = [f"{label} {stage}" for label, stages in results.items() for stage in stages
+               if stage not in baseline.get(label, {})]
+    if missing:
+        print(f"\nNo baseline for: {', '.join(missing)} (run with --update-baseline to record one)")
+    failures = regressions(results, baseline, args.tolerance)
+    if failures:
+        print("\nREGRESSED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print(f"\nNo stage regressed by more than {args.tolerance:.0%} against {args.baseline}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import argparse
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+from still_motion import DRAFT_SCALE, OUTPUT_SIZE, StillMotion, cover_size
+
+ASSETS = ['data_preview.png', 'code_view.png', 'feature_importance.png', 'clinical_recs.png']
+
+
+def reference_frame(image, t, duration, size=OUTPUT_SIZE, end_zoom=1.05):
+    """A frame as create_video_v2 used to render it with moviepy.
+
+    ImageClip.resized scaled the full-resolution source to cover the
+    canvas, and the composite was then resized to the zoom of time t and
+    cropped back to the canvas, both with PIL's LANCZOS, on every frame.
+    """
+    canvas = image.resize(cover_size(image.size, size), Image.Resampling.LANCZOS)
+    left, top = (canvas.width - size[0]) // 2, (canvas.height - size[1]) // 2
+    canvas = canvas.crop((left, top, left + size[0], top + size[1]))
+    zoom = 1 + (end_zoom - 1) * t / duration
+    zoomed = canvas.resize((round(size[0] * zoom), round(size[1] * zoom)), Image.Resampling.LANCZOS)
+    left, top = (zoomed.width - size[0]) // 2, (zoomed.height - size[1]) // 2
+    return np.asarray(zoomed.crop((left, top, left + size[0], top + size[1])))
+
+
+def fps(render, times):
+    start = time.perf_counter()
+    for t in times:
+        render(t)
+    return len(times) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Frames per second of still-image motion: per-frame resampling "
+                                                 "of the source vs the pre-scaled pyramid.")
+    parser.add_argument('--assets', default='assets_v2')
+    parser.add_argument('--frames', type=int, default=48, help="Frames timed per asset and renderer")
+    parser.add_argument('--duration', type=float, default=20)
+    args = parser.parse_args()
+
+    draft_size = tuple(round(side * DRAFT_SCALE) for side in OUTPUT_SIZE)
+    times = np.linspace(0, args.duration, args.frames)
+    print(f"{'asset':<24} {'source':>11} | {'per-frame':>9} {'pyramid':>9} {'draft':>9} fps | setup | diff")
+    for name in ASSETS:
+        path = os.path.join(args.assets, name)
+        image = Image.open(path)
+        image = Image.alpha_composite(Image.new('RGBA', image.size, (0, 0, 0, 255)), image.convert('RGBA'))
+        image = image.convert('RGB')
+
+        start = time.perf_counter()
+        motion = StillMotion(image, args.duration)
+        setup = time.perf_counter() - start
+        draft = StillMotion(image, args.duration, size=draft_size)
+
+        # Mean absolute difference from the reference, in 0-255 levels
+        diff = np.mean([np.abs(motion.frame(t).astype(np.int16) - reference_frame(image, t, args.duration)).mean()
+                        for t in times[::max(1, len(times) // 4)]])
+        slow = fps(lambda t: reference_frame(image, t, args.duration), times)
+        fast = fps(motion.frame, times)
+        quick = fps(draft.frame, times)
+        print(f"{name:<24} {f'{image.width}x{image.height}':>11} | {slow:9.1f} {fast:9.1f} {quick:9.1f}     "
+              f"| {setup:4.2f}s | {diff:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from create_db import append_rows, load_table  # noqa: E402
+from run_10_queries import QUERIES, SCAN_QUERIES  # noqa: E402
+from storage import read_table  # noqa: E402
+
+
+def run_all(conn, queries, repeat):
+    """Best-of-`repeat` total time for `queries`, and their results."""
+    best, results = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [conn.execute(sql).fetchall() for _, sql in queries]
+        best = min(best, time.perf_counter() - start)
+    return best, results
+
+
+def same_results(a, b):
+    # Averages may differ in the last bit; ties in ORDER BY count may swap
+    def norm(rows):
+        return sorted((tuple(round(v, 9) if isinstance(v, float) else v for v in row) for row in rows), key=repr)
+    return all(norm(x) == norm(y) for x, y in zip(a, b))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summary-table queries vs full scans, and the cost of appends.")
+    parser.add_argument('--input', default='data/processed_data.parquet')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 5, 20])
+    parser.add_argument('--append-rows', type=int, default=5_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    base = read_table(args.input)
+    print(f"{'rows':>10} {'scan queries':>13} {'summary queries':>16} {'append':>9} {'parity':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scales:
+            df = pd.concat([base] * scale, ignore_index=True)
+            conn = sqlite3.connect(os.path.join(tmp, f'scale_{scale}.db'))
+            load_table(conn, df)
+
+            start = time.perf_counter()
+            append_rows(conn, base.sample(args.append_rows, replace=True, random_state=scale))
+            append_time = time.perf_counter() - start
+
+            scan_time, scan_results = run_all(conn, SCAN_QUERIES, args.repeat)
+            summary_time, summary_results = run_all(conn, QUERIES, args.repeat)
+            ok = same_results(scan_results, summary_results)
+            n_rows = conn.execute('SELECT COUNT(*) FROM patients').fetchone()[0]
+            conn.close()
+            print(f"{n_rows:>10,} {scan_time * 1000:>11.1f}ms {summary_time * 1000:>14.2f}ms "
+                  f"{append_time * 1000:>7.0f}ms {'ok' if ok else 'DIFFER':>7}")
+
+
+if __name__ == "__main__":
+    main()
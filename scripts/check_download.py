@@ -0,0 +1,179 @@
+import hashlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from download_data import download_dataset  # noqa: E402
+
+
+def make_archive(n_rows=200_000, seed=42):
+    """A zip shaped like the UCI archive, incompressible enough to span many chunks."""
+    rng = np.random.default_rng(seed)
+    csv = 'encounter_id,value\n' + '\n'.join(f'{i},{v:.6f}' for i, v in enumerate(rng.random(n_rows)))
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as z:
+        z.writestr('diabetic_data.csv', csv)
+        z.writestr('IDS_mapping.csv', 'admission_type_id,description\n1,Emergency\n')
+    return buf.getvalue()
+
+
+class ArchiveServer(ThreadingHTTPServer):
+    """Stand-in for the dataset host: serves one file with Range support.
+
+    `cut_after` drops the connection after that many body bytes of the next
+    response, to simulate an interrupted download. `range_support=False`
+    makes it ignore Range headers like some proxies do.
+    """
+
+    def __init__(self, payload):
+        super().__init__(('127.0.0.1', 0), ArchiveHandler)
+        self.payload = payload
+        self.cut_after = None
+        self.range_support = True
+        self.requests = []
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/diabetes.zip'
+
+
+class ArchiveHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        data = self.server.payload
+        range_header = self.headers.get('Range')
+        self.server.requests.append(range_header)
+        start = 0
+        if range_header and self.server.range_support:
+            start = int(range_header.split('=')[1].split('-')[0])
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(data)}')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{len(data) - 1}/{len(data)}')
+        else:
+            self.send_response(200)
+        body = data[start:]
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.server.cut_after is not None:
+            body = body[:self.server.cut_after]
+            self.server.cut_after = None
+            self.wfile.write(body)
+            self.wfile.flush()
+            self.connection.shutdown(2)
+            return
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def check(name, condition):
+    print(f"{'ok' if condition else 'FAIL':>4}  {name}")
+    return condition
+
+
+def main():
+    payload = make_archive()
+    digest = hashlib.sha256(payload).hexdigest()
+    server = ArchiveServer(payload)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    results = []
+    print(f"Serving a {len(payload):,}-byte archive at {server.url}\n")
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        archive = os.path.join(data_dir, 'diabetes.zip')
+        csv_path = os.path.join(data_dir, 'diabetic_data.csv')
+
+        # 1. Interrupted mid-stream: fetch retries and resumes with a Range request
+        server.cut_after = len(payload) // 3
+        download_dataset(server.url, data_dir, sha256=digest, chunk_bytes=64 * 1024)
+        # Resumes from the last complete chunk written before the cut
+        resumed_at = int((server.requests[-1] or 'bytes=0-')[len('bytes='):-1])
+        results.append(check("interrupted download resumes with Range", 0 < resumed_at <= len(payload) // 3))
+        with open(archive, 'rb') as f:
+            results.append(check("resumed archive is byte-identical", f.read() == payload))
+        with zipfile.ZipFile(io.BytesIO(payload)) as z:
+            expected_csv = z.read('diabetic_data.csv')
+        with open(csv_path, 'rb') as f:
+            results.append(check("members extracted", f.read() == expected_csv))
+
+        # 2. Verified archive present: no request at all
+        n_requests = len(server.requests)
+        download_dataset(server.url, data_dir)
+        results.append(check("verified archive skips the download", len(server.requests) == n_requests))
+
+        # 3. A .part left by a killed process is resumed on the next run
+        os.remove(archive)
+        with open(archive + '.part', 'wb') as f:
+            f.write(payload[:len(payload) // 2])
+        download_dataset(server.url, data_dir, sha256=digest)
+        results.append(check("partial file from a previous run is resumed",
+                             server.requests[-1] == f'bytes={len(payload) // 2}-'))
+
+        # 4. Server ignores Range: restart from zero rather than appending a full body
+        server.range_support = False
+        os.remove(archive)
+        with open(archive + '.part', 'wb') as f:
+            f.write(payload[:1000])
+        download_dataset(server.url, data_dir, sha256=digest)
+        results.append(check("Range ignored -> download restarts cleanly", os.path.getsize(archive) == len(payload)))
+        server.range_support = True
+
+        # 5. Corrupted archive on disk: fails verification and is fetched again
+        with open(archive, 'r+b') as f:
+            f.seek(100)
+            f.write(b'corrupt')
+        download_dataset(server.url, data_dir)
+        with open(archive, 'rb') as f:
+            results.append(check("corrupted archive is replaced", f.read() == payload))
+
+        # 6. Wrong pinned checksum: error, and the bad archive is not kept
+        os.remove(archive)
+        try:
+            download_dataset(server.url, data_dir, sha256='0' * 64)
+            mismatch_raised = False
+        except ValueError:
+            mismatch_raised = True
+        results.append(check("checksum mismatch raises and removes the archive",
+                             mismatch_raised and not os.path.exists(archive)))
+
+        # 7. Unpinned first download that is not a valid zip: error, nothing recorded
+        server.payload = payload[:len(payload) // 2] + b'corrupt' + payload[len(payload) // 2 + 7:]
+        fresh_dir = os.path.join(data_dir, 'fresh')
+        try:
+            download_dataset(server.url, fresh_dir)
+            corrupt_raised = False
+        except ValueError:
+            corrupt_raised = True
+        fresh_archive = os.path.join(fresh_dir, 'diabetes.zip')
+        results.append(check("corrupt unpinned download raises, no digest recorded",
+                             corrupt_raised and not os.path.exists(fresh_archive)
+                             and not os.path.exists(fresh_archive + '.sha256')))
+
+        # 8. Unpinned first download that is valid: digest recorded after extraction
+        server.payload = payload
+        download_dataset(server.url, fresh_dir)
+        with open(fresh_archive + '.sha256') as f:
+            recorded = f.read().split()[0]
+        results.append(check("valid unpinned download records its digest",
+                             recorded == digest and os.path.exists(os.path.join(fresh_dir, 'diabetic_data.csv'))))
+
+    server.shutdown()
+    print()
+    if not all(results):
+        sys.exit("Download checks FAILED")
+    print("All download checks passed.")
+
+
+if __name__ == "__main__":
+    main()
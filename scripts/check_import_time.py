@@ -0,0 +1,88 @@
+import argparse
+import os
+import subprocess
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC_DIR)
+from cli import COMMANDS  # noqa: E402
+
+# Import-time budget per cli.py command (ms, best of --repeat runs), and
+# packages the command must not import at all. `cli` is the entry point on
+# its own, before any command module is loaded.
+BUDGETS_MS = {
+    'cli': 150,
+    'download': 400,
+    'synth': 1_200,
+    'preprocess': 1_200,
+    'features': 1_200,
+    'train': 3_500,
+    'db': 1_200,
+    'queries': 150,
+    'plots': 1_200,
+    'score': 1_500,
+    'serve': 1_500,
+}
+FORBIDDEN = {
+    'cli': ['pandas', 'numpy', 'sklearn', 'matplotlib', 'seaborn'],
+    'queries': ['pandas', 'numpy', 'sklearn', 'matplotlib', 'seaborn'],
+    'plots': ['sklearn', 'matplotlib', 'seaborn'],
+    'score': ['matplotlib', 'seaborn'],
+    'serve': ['matplotlib', 'seaborn'],
+    'train': ['matplotlib', 'seaborn'],
+    'db': ['sklearn', 'matplotlib', 'seaborn'],
+    'preprocess': ['sklearn', 'matplotlib', 'seaborn'],
+    'synth': ['sklearn', 'matplotlib', 'seaborn'],
+    'features': ['sklearn', 'matplotlib', 'seaborn'],
+}
+
+
+def measure(command):
+    """Total import time (ms) and the set of top-level packages imported, from -X importtime."""
+    code = 'import cli'
+    if command != 'cli':
+        code += f"; import importlib; importlib.import_module(cli.COMMANDS[{command!r}].module)"
+    env = dict(os.environ, PYTHONPATH=SRC_DIR)
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          env=env, capture_output=True, text=True, check=True)
+    total_us, packages = 0, set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        total_us += int(self_us)
+        packages.add(name.strip().split('.')[0])
+    return total_us / 1000, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enforce the import-time budget of every cli.py command.")
+    parser.add_argument('commands', nargs='*', default=list(BUDGETS_MS))
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    missing = set(COMMANDS) - set(BUDGETS_MS)
+    failures = [f"no budget for command(s) {sorted(missing)}"] if missing else []
+    print(f"{'command':<12} {'import':>9} {'budget':>8}")
+    for command in args.commands:
+        runs = [measure(command) for _ in range(args.repeat)]
+        best = min(ms for ms, _ in runs)
+        packages = runs[0][1]
+        forbidden = sorted(set(FORBIDDEN.get(command, [])) & packages)
+        status = 'ok'
+        if best > BUDGETS_MS[command]:
+            status = 'OVER BUDGET'
+            failures.append(f"{command}: {best:.0f} ms > {BUDGETS_MS[command]} ms")
+        if forbidden:
+            status = f"imports {', '.join(forbidden)}"
+            failures.append(f"{command}: imports {forbidden}")
+        print(f"{command:<12} {best:>7.0f}ms {BUDGETS_MS[command]:>6}ms  {status}")
+
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("\nAll commands within budget.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC_DIR)
+from pipeline import build_stages  # noqa: E402
+
+# Stage keys of a copy of src/, computed in a fresh interpreter so every
+# edit to the copy is picked up
+KEYS_SCRIPT = """
+import json, pipeline
+file_hash = pipeline.FileHasher({})
+print(json.dumps({name: pipeline.stage_key(stage, file_hash) for name, stage in pipeline.build_stages().items()}))
+"""
+
+
+def stage_keys(root):
+    proc = subprocess.run([sys.executable, '-c', KEYS_SCRIPT], cwd=root, capture_output=True, text=True,
+                          env=dict(os.environ, PYTHONPATH=os.path.join(root, 'src')))
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr)
+    return json.loads(proc.stdout)
+
+
+def edit(root, module, pattern, replacement):
+    path = os.path.join(root, 'src', module)
+    with open(path) as f:
+        text = f.read()
+    new_text, n = re.subn(pattern, replacement, text, count=1)
+    assert n, f"{pattern!r} not found in {module}"
+    with open(path, 'w') as f:
+        f.write(new_text)
+
+
+def check(name, condition):
+    print(f"{'ok' if condition else 'FAIL':>4}  {name}")
+    return condition
+
+
+def changed(before, after):
+    return sorted(name for name in before if before[name] != after[name])
+
+
+def main():
+    results = []
+    with tempfile.TemporaryDirectory() as root:
+        shutil.copytree(SRC_DIR, os.path.join(root, 'src'), ignore=shutil.ignore_patterns('__pycache__'))
+        # Stage inputs only need to exist to be hashed
+        for stage in build_stages().values():
+            for path in stage['inputs']:
+                os.makedirs(os.path.join(root, os.path.dirname(path)), exist_ok=True)
+                open(os.path.join(root, path), 'a').close()
+
+        keys = stage_keys(root)
+        edits = [
+            ("a default of another command (serve --port)",
+             'cli.py', r"'--port', type=int, default=8000", "'--port', type=int, default=8001", []),
+            ("the argument function of another command (score)",
+             'cli.py', r"(def _score_args\(parser\):)", r"\1\n    # scored in chunks", []),
+            ("instrument.py", 'instrument.py', r"\Z", "\n# metrics only\n", []),
+            ("a default of the train command (--bootstrap)",
+             'cli.py', r"'--bootstrap', type=int, default=500", "'--bootstrap', type=int, default=400", ['train']),
+            ("a helper of several commands (_table)",
+             'cli.py', r"(def _table\(args, attr, name\):)", r"\1\n    # pipeline table path",
+             ['db', 'features', 'preprocess', 'train']),
+            ("features.py", 'features.py', r"\Z", "\n# edited\n", ['features', 'train']),
+        ]
+        for title, module, pattern, replacement, expected in edits:
+            edit(root, module, pattern, replacement)
+            new_keys = stage_keys(root)
+            stale = changed(keys, new_keys)
+            results.append(check(f"editing {title} makes stale: {expected or 'nothing'}", stale == expected))
+            if stale != expected:
+                print(f"      stale: {stale}")
+            keys = new_keys
+
+    print()
+    if not all(results):
+        sys.exit("Pipeline checks FAILED")
+    print("All pipeline checks passed.")
+
+
+if __name__ == "__main__":
+    main()
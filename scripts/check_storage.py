@@ -0,0 +1,73 @@
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from storage import FORMATS, TableWriter, read_table  # noqa: E402
+
+
+def chunks():
+    """Chunks as a streamed stage writes them; the second has no value at all in its text column."""
+    return [
+        pd.DataFrame({'race': ['Caucasian', 'Asian'], 'age_numeric': np.array([55, 65], dtype='int8'),
+                      'a1c': pd.Categorical(['>7', None])}),
+        pd.DataFrame({'race': [np.nan, np.nan], 'age_numeric': np.array([75, 85], dtype='int8'),
+                      'a1c': [np.nan, np.nan]}),
+        pd.DataFrame({'race': pd.Categorical(['Hispanic', None]), 'age_numeric': np.array([5, 15], dtype='int8'),
+                      'a1c': ['Norm', 'Norm']}),
+    ]
+
+
+def check(name, condition):
+    print(f"{'ok' if condition else 'FAIL':>4}  {name}")
+    return condition
+
+
+def main():
+    results = []
+    expected = {'race': ['Caucasian', 'Asian', None, None, 'Hispanic', None],
+                'a1c': ['>7', None, None, None, 'Norm', 'Norm']}
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt, ext in FORMATS.items():
+            path = os.path.join(tmp, 'table' + ext)
+            try:
+                with TableWriter(path) as writer:
+                    for chunk in chunks():
+                        writer.write(chunk)
+                df = read_table(path)
+                values = {c: [None if pd.isna(v) else v for v in df[c]] for c in expected}
+                ok = values == expected and df['age_numeric'].tolist() == [55, 65, 75, 85, 5, 15]
+            except Exception as e:
+                print(f"      {type(e).__name__}: {e}")
+                ok = False
+            results.append(check(f"{fmt}: chunk with an all-missing text column is written as nulls", ok))
+            if fmt == 'parquet' and ok:
+                results.append(check("parquet: text columns read back as categoricals",
+                                     isinstance(df['race'].dtype, pd.CategoricalDtype)))
+
+        # A dtype plan narrows CSV integers only when every value fits
+        path = os.path.join(tmp, 'counts.csv')
+        pd.DataFrame({'time_in_hospital': [3, 14]}).to_csv(path, index=False)
+        df = read_table(path, csv_dtypes={'time_in_hospital': 'int8'})
+        results.append(check("csv: integers within range are narrowed to the planned type",
+                             df['time_in_hospital'].dtype == 'int8' and df['time_in_hospital'].tolist() == [3, 14]))
+        pd.DataFrame({'time_in_hospital': [3, 300]}).to_csv(path, index=False)
+        try:
+            df = read_table(path, csv_dtypes={'time_in_hospital': 'int8'})
+            print(f"      read as {df['time_in_hospital'].tolist()}")
+            out_of_range_raised = False
+        except ValueError:
+            out_of_range_raised = True
+        results.append(check("csv: an integer out of range of the planned type raises", out_of_range_raised))
+
+    print()
+    if not all(results):
+        sys.exit("Storage checks FAILED")
+    print("All storage checks passed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,17 @@
 from moviepy import *
+import argparse
 import os
-import math
 
-def create_video_v2():
-    print("Initializing Video V2 creation...")
+from still_motion import DRAFT_SCALE, OUTPUT_SIZE, StillMotion
+
+def create_video_v2(draft=False):
+    print("Initializing Video V2 creation..." + (" (draft)" if draft else ""))
+    
+    # Draft renders a quarter-resolution, 12 fps preview for quick iteration;
+    # layout sizes below are given for 1920x1080 and scaled by `s`
+    s = DRAFT_SCALE if draft else 1.0
+    W, H = (round(side * s) for side in OUTPUT_SIZE)
+    fps = 12 if draft else 24
     
     # Define durations
     dur_phase1 = 15
@@ -18,95 +26,28 @@ def create_video_v2():
     img_feat = os.path.join(asset_dir, 'feature_importance.png')
     img_recs = os.path.join(asset_dir, 'clinical_recs.png')
     
-    # --- Ken Burns Effect Helper ---
-    def ken_burns(clip, start_zoom=1.0, end_zoom=1.1, duration=5):
-        # Resize to start zoom
-        w, h = clip.size
-        
-        def effect(get_frame, t):
-            # Calculate current zoom level
-            zoom = start_zoom + (end_zoom - start_zoom) * (t / duration)
-            
-            # Get the frame at time t
-            img = get_frame(t)
-            
-            # We can't easily resize per frame in moviepy without being very slow or using PIL
-            # A simpler approach for "zoom in" is to resize the clip to end_zoom * resolution at start
-            # and then crop a window that shrinks? No, that's zoom out.
-            # Zoom IN: Crop a window that shrinks over time from full size to smaller size, then resize back up? 
-            # Or resize UP over time and crop center? 
-            # MoviePy 'resize' filters are per-frame.
-            
-            # Let's try a simpler approach: 
-            # Resize clip to end_zoom * (1920, 1080) initially? No, memory.
-            
-            # Standard Ken Burns in MoviePy often uses `scroll` or `resize`. 
-            # Let's use a composite transform: 
-            # 1. Resize the clip to slightly larger than 1920x1080 (e.g. 1.1x)
-            # 2. Extract a 1920x1080 crop that moves lightly? 
-            return img 
-
-        # The most robust way in moviepy v2 for a slow zoom:
-        # Resize the clip to a large size, then slide a crop wording.
-        
-        # Method 2: Scale up and center crop.
-        # This is computationally expensive per frame. 
-        # Let's do a simple PAN (Scroll) instead which is cheaper and looks good.
-        # Resize image to width=1920*1.1 = 2112
-        large_clip = clip.resized(width=int(1920 * end_zoom))
-        
-        # Center vertically
-        # Scroll horizontally from left to right? or center to slightly off center?
-        # Let's scroll from x=0 to x=100
-        
-        # If we want a zoom, we can use 'resize' with a function of time
-        # clip_zoomed = clip.resize(lambda t : 1 + 0.02*t) # linearly zoom
-        # But we need to crop to 1920x1080 after resizing.
-        
-        return clip.resized(lambda t : 1 + (end_zoom - 1) * t / duration) \
-                   .with_position('center') # Auto-centers on canvas
-        
+    # --- Motion Helper ---
+    # Slow zoom over a still (see still_motion.py): the image is scaled once,
+    # and each frame is a crop-and-downscale of the cached pyramid
     def add_motion(img_path, duration):
-        # Create clip
-        clip = ImageClip(img_path).with_duration(duration)
-        
-        # Resize to cover screen initially
-        # We want to ensure it covers 1920x1080
-        # Check aspect ratio
-        if clip.w / clip.h > 1920/1080:
-             # Image is wider, fit height
-             clip = clip.resized(height=1080)
-        else:
-             # Image is taller or equal, fit width
-             clip = clip.resized(width=1920)
-             
-        # Center it on a 1920x1080 canvas
-        clip = CompositeVideoClip([clip.with_position('center')], size=(1920, 1080))
-        
-        # Apply Zoom (Ken Burns)
-        # Zoom from 1.0 to 1.1 over duration
-        # We apply the resize function to the COMPOSITE clip so it scales up the whole thing
-        zoomed = clip.resized(lambda t : 1 + 0.05 * t / duration) # 5% zoom
-        
-        # After zooming, we need to crop back to 1920x1080 to avoid growing canvas
-        # CompositeVideoClip does not automatically crop unless we tell it
-        return zoomed.cropped(x_center=960, y_center=540, width=1920, height=1080)
+        motion = StillMotion(img_path, duration, size=(W, H), start_zoom=1.0, end_zoom=1.05) # 5% zoom
+        return VideoClip(frame_function=motion.frame, duration=duration)
 
     # Helper for Text
     def create_text(text, duration, start_time):
         try:
-            txt_clip = TextClip(text=text, font_size=45, color='white', font='Arial-Bold', method='caption', size=(1600, None))
+            txt_clip = TextClip(text=text, font_size=round(45 * s), color='white', font='Arial-Bold', method='caption', size=(round(1600 * s), None))
         except:
-             txt_clip = TextClip(text=text, font_size=45, color='white', method='caption', size=(1600, None))
+             txt_clip = TextClip(text=text, font_size=round(45 * s), color='white', method='caption', size=(round(1600 * s), None))
              
-        txt_clip = txt_clip.with_position(('center', 900)).with_duration(duration).with_start(start_time)
+        txt_clip = txt_clip.with_position(('center', round(900 * s))).with_duration(duration).with_start(start_time)
         
         # Background: Semi-transparent sleek bar
         # Gradient or solid color? Solid is reliable.
         # Rounded corners? Hard in MoviePy without masks.
-        bg_h = txt_clip.h + 50
-        bg_clip = ColorClip(size=(1920, int(bg_h)), color=(0,0,0)).with_opacity(0.8)
-        bg_clip = bg_clip.with_position(('center', 875)).with_duration(duration).with_start(start_time)
+        bg_h = txt_clip.h + 50 * s
+        bg_clip = ColorClip(size=(W, int(bg_h)), color=(0,0,0)).with_opacity(0.8)
+        bg_clip = bg_clip.with_position(('center', round(875 * s))).with_duration(duration).with_start(start_time)
         
         return [bg_clip, txt_clip]
 
@@ -184,13 +125,17 @@ def create_video_v2():
     # Create final composite
     # Note: CompositeVideoClip takes a list of clips.
     # We want them to overlay based on their start times.
-    final_video = CompositeVideoClip([p1, p2, p3, p4], size=(1920, 1080)).with_duration(total_duration)
+    final_video = CompositeVideoClip([p1, p2, p3, p4], size=(W, H)).with_duration(total_duration)
     
     # Write output
-    output_path = 'output/hospital_patient_flow_v2.mp4'
+    output_path = 'output/hospital_patient_flow_v2_draft.mp4' if draft else 'output/hospital_patient_flow_v2.mp4'
     print(f"Writing video to {output_path}...")
-    final_video.write_videofile(output_path, fps=24, codec='libx264', audio_codec='aac')
+    final_video.write_videofile(output_path, fps=fps, codec='libx264', audio_codec='aac',
+                                preset='ultrafast' if draft else 'medium')
     print("Video V2 creation complete!")
 
 if __name__ == "__main__":
-    create_video_v2()
+    parser = argparse.ArgumentParser(description="Render the demo video from assets_v2/.")
+    parser.add_argument('--draft', action='store_true',
+                        help="Quarter resolution at 12 fps, written to output/hospital_patient_flow_v2_draft.mp4")
+    create_video_v2(parser.parse_args().draft)
@@ -0,0 +1,49 @@
+import argparse
+import json
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+def post(url, records):
+    body = json.dumps(records).encode()
+    req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    with urllib.request.urlopen(req) as resp:
+        resp.read()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the scoring service started by src/serve.py.")
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--input', default='data/diabetic_data.csv', help="Raw encounters to replay")
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--batch', type=int, default=1, help="Encounters per request")
+    args = parser.parse_args()
+
+    n_records = args.requests * args.batch
+    # keep_default_na=False keeps '?' and 'None' as sent by upstream systems
+    df = pd.read_csv(args.input, nrows=n_records, keep_default_na=False)
+    records = df.to_dict(orient='records')
+    payloads = [records[(i * args.batch) % len(records):][:args.batch] for i in range(args.requests)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        latencies = np.array(list(pool.map(lambda p: post(args.url + '/score', p), payloads))) * 1000
+    elapsed = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(f"{args.requests:,} requests x {args.batch} encounters, concurrency {args.concurrency}")
+    print(f"Throughput: {args.requests / elapsed:,.0f} req/s ({args.requests * args.batch / elapsed:,.0f} encounters/s)")
+    print(f"Client latency ms: p50 {p50:.2f} | p95 {p95:.2f} | p99 {p99:.2f}")
+    with urllib.request.urlopen(args.url + '/stats') as resp:
+        print(f"Server stats: {resp.read().decode()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import math
+
+import numpy as np
+from PIL import Image
+
+# Zoom/pan ("Ken Burns") motion over a still image, rendered without
+# resampling the full-resolution source on every frame.
+#
+# The source is scaled once to cover the output at the largest zoom of the
+# scene (level 0), then halved repeatedly into a pyramid while a level still
+# covers the output. The frame at zoom z is a window of level 0 that is
+# max_zoom / z times the output size; it is read from the smallest level on
+# which that window is still at least the output size, so every frame is one
+# bilinear crop-and-downscale by a factor between 1 and 2. Window corners
+# are fractional (PIL's resize box), so slow zooms do not step by whole pixels.
+
+OUTPUT_SIZE = (1920, 1080)
+DRAFT_SCALE = 0.25
+
+
+def cover_size(image_size, size):
+    """Smallest size with the image's aspect ratio that covers `size`."""
+    scale = max(size[0] / image_size[0], size[1] / image_size[1])
+    return max(size[0], round(image_size[0] * scale)), max(size[1], round(image_size[1] * scale))
+
+
+class StillMotion:
+    """Frames of a still image zooming from `start_zoom` to `end_zoom` over `duration` seconds.
+
+    Zoom 1 shows the image scaled to cover `size` and cropped to it, as a
+    centred ImageClip on a canvas of that size would. `start_center` and
+    `end_center` pan the view: fractions of the covered image's width and
+    height, clamped so the window stays inside the image.
+    """
+
+    def __init__(self, image, duration, size=OUTPUT_SIZE, start_zoom=1.0, end_zoom=1.05,
+                 start_center=(0.5, 0.5), end_center=(0.5, 0.5)):
+        if min(start_zoom, end_zoom) < 1:
+            raise ValueError("Zoom below 1 would show past the edges of the image")
+        if not isinstance(image, Image.Image):
+            image = Image.open(image)
+        self.duration = duration
+        self.size = tuple(size)
+        self.start_zoom, self.end_zoom = start_zoom, end_zoom
+        self.start_center, self.end_center = start_center, end_center
+        self.max_zoom = max(start_zoom, end_zoom)
+
+        if 'A' in image.getbands():
+            # Transparent areas show the black canvas behind the clip
+            image = Image.alpha_composite(Image.new('RGBA', image.size, (0, 0, 0, 255)), image.convert('RGBA'))
+        # The only resample of the full-resolution source
+        covered = cover_size(image.size, self.size)
+        base = (math.ceil(covered[0] * self.max_zoom), math.ceil(covered[1] * self.max_zoom))
+        level = image.convert('RGB').resize(base, Image.Resampling.LANCZOS)
+        self.pyramid = [level]
+        while level.width // 2 >= self.size[0] and level.height // 2 >= self.size[1]:
+            level = level.reduce(2)
+            self.pyramid.append(level)
+        # Level-0 pixels per covered-image pixel
+        self.base_scale = base[0] / covered[0], base[1] / covered[1]
+
+    def view(self, t):
+        """(zoom, centre) at time t, interpolated linearly."""
+        u = min(max(t / self.duration, 0.0), 1.0) if self.duration else 1.0
+        zoom = self.start_zoom + (self.end_zoom - self.start_zoom) * u
+        center = tuple(a + (b - a) * u for a, b in zip(self.start_center, self.end_center))
+        return zoom, center
+
+    def box(self, t):
+        """Window of level 0 shown at time t, as (left, top, right, bottom)."""
+        zoom, center = self.view(t)
+        base_w, base_h = self.pyramid[0].size
+        # The output at this zoom spans size / zoom covered-image pixels
+        w = min(self.size[0] / zoom * self.base_scale[0], base_w)
+        h = min(self.size[1] / zoom * self.base_scale[1], base_h)
+        left = min(max(center[0] * base_w - w / 2, 0.0), base_w - w)
+        top = min(max(center[1] * base_h - h / 2, 0.0), base_h - h)
+        return left, top, left + w, top + h
+
+    def frame_image(self, t):
+        left, top, right, bottom = self.box(t)
+        base_w, base_h = self.pyramid[0].size
+        # Smallest level on which the window still has at least the output size
+        # (levels are not exact halves when a side is odd, so use their real scale)
+        for level in reversed(self.pyramid):
+            sx, sy = level.width / base_w, level.height / base_h
+            if (right - left) * sx >= self.size[0] and (bottom - top) * sy >= self.size[1]:
+                break
+        return level.resize(self.size, Image.Resampling.BILINEAR,
+                            box=(left * sx, top * sy, right * sx, bottom * sy))
+
+    def frame(self, t):
+        """RGB frame at time t as an (height, width, 3) uint8 array (moviepy's frame_function)."""
+        return np.asarray(self.frame_image(t))
@@ -0,0 +1,60 @@
+import argparse
+import json
+import os
+import sys
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from pipeline import METRICS_FILE  # noqa: E402
+
+
+def load(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize(records):
+    """(stage, step) -> totals over all records of that step."""
+    groups = defaultdict(lambda: {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'peak_rss_mb': 0.0,
+                                  'rows_in': 0, 'rows_out': 0, 'bytes_read': 0, 'bytes_written': 0,
+                                  'errors': 0})
+    for r in records:
+        g = groups[(r['stage'], r['step'])]
+        g['calls'] += 1
+        g['wall_s'] += r['wall_s']
+        g['cpu_s'] += r['cpu_s'] + r['children_cpu_s']
+        g['peak_rss_mb'] = max(g['peak_rss_mb'], r['peak_rss_mb'])
+        for key in ['rows_in', 'rows_out', 'bytes_read', 'bytes_written']:
+            g[key] += r[key] or 0
+        g['errors'] += r['status'] != 'ok'
+    return groups
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Where a pipeline run spends its time: per-step totals "
+                                                 "from the instrumentation JSON lines.")
+    parser.add_argument('metrics', nargs='?', default=METRICS_FILE)
+    parser.add_argument('--run', default=None, help="Run id to report (default: the most recent run)")
+    parser.add_argument('--all', action='store_true', help="Aggregate every run in the file")
+    args = parser.parse_args()
+
+    records = load(args.metrics)
+    if not records:
+        sys.exit(f"No metrics in {args.metrics}")
+    if not args.all:
+        run = args.run or records[-1].get('run')
+        records = [r for r in records if r.get('run') == run]
+        print(f"Run {run} ({len(records)} records)\n")
+
+    print(f"{'stage':<11} {'step':<28} {'calls':>5} {'wall':>9} {'cpu':>9} {'peak RSS':>9} "
+          f"{'rows in':>11} {'rows out':>11} {'MB read':>8} {'MB written':>10}")
+    groups = summarize(records)
+    for (stage, step), g in sorted(groups.items(), key=lambda item: -item[1]['wall_s']):
+        flag = f"  {g['errors']} failed" if g['errors'] else ''
+        print(f"{stage or '-':<11} {step:<28} {g['calls']:>5} {g['wall_s']:>8.2f}s {g['cpu_s']:>8.2f}s "
+              f"{g['peak_rss_mb']:>7.0f}MB {g['rows_in']:>11,} {g['rows_out']:>11,} "
+              f"{g['bytes_read'] / 2**20:>8.1f} {g['bytes_written'] / 2**20:>10.1f}{flag}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import os
+
+import joblib
+
+from forest_arrays import ForestArrays
+
+# Files modeling.train_and_evaluate writes to its results directory and that
+# score.py, serve.py, importance.py and incremental.py load back. Kept apart
+# from score.py so loading models does not pull in the scoring code.
+MODEL_DIR = 'output'
+ENCODER_FILE = 'feature_encoder.pkl'
+MODEL_FILES = {
+    'logistic_regression': 'logistic_regression_model.pkl',
+    'random_forest': 'random_forest_model.pkl',
+}
+# Memory-mappable exports (see forest_arrays.py), preferred over the pickle when present
+ARRAY_DIRS = {
+    'random_forest': 'random_forest_arrays',
+}
+
+
+def load_artifacts(model_dir=MODEL_DIR, mmap=True):
+    """Load the fitted encoder and models written by modeling.train_and_evaluate.
+
+    With `mmap`, models that have an array export are opened memory-mapped so
+    concurrent scoring processes share one copy through the page cache.
+    """
+    encoder = joblib.load(os.path.join(model_dir, ENCODER_FILE))
+    models = {}
+    for name, fname in MODEL_FILES.items():
+        array_dir = os.path.join(model_dir, ARRAY_DIRS.get(name, ''))
+        if mmap and name in ARRAY_DIRS and os.path.isdir(array_dir):
+            models[name] = ForestArrays.load(array_dir)
+        else:
+            models[name] = joblib.load(os.path.join(model_dir, fname))
+    return encoder, models
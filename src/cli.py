@@ -0,0 +1,292 @@
+import argparse
+import os
+import sys
+from collections import namedtuple
+
+import instrument
+from storage import add_format_argument, table_path
+
+# Single entry point for the pipeline stages:
+#   python3 src/cli.py <command> [options]
+# Only argparse and storage's path helpers are imported up front. Each
+# command imports its own module when it runs, so `queries` never loads
+# pandas and `score` never loads matplotlib. scripts/check_import_time.py
+# holds every command to an import-time budget.
+
+DATA_DIR = 'data'
+OUTPUT_DIR = 'output'
+DB_PATH = 'data/hospital.db'
+
+Command = namedtuple('Command', ['module', 'help', 'add_arguments', 'run'])
+
+
+def _table(args, attr, name):
+    """The explicit path given for `attr`, or the default pipeline table `name` in `--format`."""
+    return getattr(args, attr) or table_path(name, args.format, DATA_DIR)
+
+
+# --- download ---
+
+def _download_args(parser):
+    parser.add_argument('--url', default=None, help="Archive URL (default: the UCI dataset)")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--sha256', default=None, help="Expected sha256 of the archive")
+    parser.add_argument('--force', action='store_true', help="Download again even if a verified archive is present")
+
+
+def _download(args):
+    from download_data import DATASET_URL, download_dataset
+    download_dataset(args.url or DATASET_URL, args.data_dir, sha256=args.sha256, force=args.force)
+
+
+# --- synth ---
+
+def parse_rows(text):
+    """'100k' / '1m' / '10M' / '250000' -> number of rows."""
+    text = str(text).strip().lower().replace('_', '').replace(',', '')
+    scale = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    try:
+        return int(float(text[:-1] if scale > 1 else text) * scale)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid row count: {text!r}")
+
+
+def _synth_args(parser):
+    parser.add_argument('--rows', type=parse_rows, default='100k',
+                        help="Number of encounters, e.g. 100k, 1m, 10m (default: %(default)s)")
+    parser.add_argument('--output', default='data/diabetic_data.csv')
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def _synth(args):
+    from synthetic_data import write_encounters
+    write_encounters(args.output, args.rows, seed=args.seed)
+
+
+# --- preprocess ---
+
+def _preprocess_args(parser):
+    add_format_argument(parser)
+    parser.add_argument('--input', default='data/diabetic_data.csv')
+    parser.add_argument('--output', default=None, help="Default: data/processed_data.<format>")
+    parser.add_argument('--history', default=None,
+                        help="Per-patient running totals after this input, for `db` to load "
+                             "(default: data/patient_history.<format>)")
+    parser.add_argument('--history-db', default=None,
+                        help="Start from the patient_history totals in this database, for inputs that "
+                             "continue an extract already loaded there")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help="Stream the input in chunks of this many rows instead of loading it whole")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Worker processes for streaming mode (default: CPU count)")
+
+
+def _preprocess(args):
+    from preprocessing import preprocess_data
+    preprocess_data(args.input, _table(args, 'output', 'processed_data'),
+                    _table(args, 'history', 'patient_history'), history_db=args.history_db,
+                    chunksize=args.chunksize, n_workers=args.workers)
+
+
+# --- features ---
+
+def _features_args(parser):
+    add_format_argument(parser)
+    parser.add_argument('--input', default=None, help="Default: data/processed_data.<format>")
+    parser.add_argument('--output', default=None, help="Default: data/final_features.<format>")
+
+
+def _features(args):
+    from features import feature_engineering
+    feature_engineering(_table(args, 'input', 'processed_data'), _table(args, 'output', 'final_features'))
+
+
+# --- train ---
+
+def _train_args(parser):
+    add_format_argument(parser)
+    parser.add_argument('--input', default=None, help="Default: data/final_features.<format>")
+    parser.add_argument('--output-dir', default=OUTPUT_DIR, help="Models, reports and plots")
+    parser.add_argument('--tune', action='store_true',
+                        help="Search hyperparameters with successive halving before the final fit")
+    parser.add_argument('--params', default=None,
+                        help="Use hyperparameters from a previous --tune run (output/best_params.json)")
+    parser.add_argument('--candidates', type=int, default=27, help="Sampled configurations per model")
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--bootstrap', type=int, default=500,
+                        help="Bootstrap resamples for the confidence intervals of the threshold sweep "
+                             "(default: %(default)s; 0: estimates only)")
+    parser.add_argument('--importance-repeats', type=int, default=5,
+                        help="Shuffles per feature for the permutation importance of both models "
+                             "(default: %(default)s; 0: skip it and the importance plot)")
+    parser.add_argument('--incremental', metavar='BATCH_CSV', default=None,
+                        help="Update the latest model version with a batch of new labelled encounters "
+                             "instead of retraining on the full history")
+    parser.add_argument('--new-trees', type=int, default=20, help="Trees added to the forest per --incremental batch")
+    parser.add_argument('--max-trees', type=int, default=None, help="Retire the oldest trees beyond this many")
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    parser.add_argument('--publish', action='store_true',
+                        help="Copy the new version into <output-dir>/published, for score and serve --model-dir")
+    parser.add_argument('--history-db', default=DB_PATH,
+                        help="Database with the patient_history totals that an --incremental batch continues "
+                             "(default: %(default)s, if present)")
+
+
+def _train(args):
+    input_path = _table(args, 'input', 'final_features')
+    if args.incremental:
+        from incremental import update
+        update(args.incremental, history_path=input_path, new_trees=args.new_trees, max_trees=args.max_trees,
+               chunksize=args.chunksize, model_dir=args.output_dir,
+               publish_to=os.path.join(args.output_dir, 'published') if args.publish else None, history_db=args.history_db)
+        return
+    from modeling import train_and_evaluate
+    from tuning import load_params
+    train_and_evaluate(input_path,
+                       params=load_params(args.params) if args.params else None,
+                       tune_models=args.tune,
+                       tune_options={'n_candidates': args.candidates, 'n_splits': args.folds,
+                                     'n_workers': args.workers},
+                       results_dir=args.output_dir, n_bootstrap=args.bootstrap,
+                       importance_repeats=args.importance_repeats)
+
+
+# --- db ---
+
+def _db_args(parser):
+    add_format_argument(parser)
+    parser.add_argument('--input', default=None, help="Default: data/processed_data.<format>")
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--append', metavar='TABLE', default=None,
+                        help="Append the rows of an already-processed table instead of rebuilding the database")
+    parser.add_argument('--history', default=None,
+                        help="Per-patient running totals written by `preprocess`, loaded into patient_history "
+                             "(default: data/patient_history.<format>; with --append, only if given)")
+
+
+def _db(args):
+    from create_db import append_database, create_database
+    if args.append:
+        append_database(args.append, args.db, history_path=args.history)
+    else:
+        create_database(_table(args, 'input', 'processed_data'), args.db,
+                        history_path=_table(args, 'history', 'patient_history'))
+
+
+# --- queries ---
+
+def _queries_args(parser):
+    parser.add_argument('--db', default=DB_PATH)
+
+
+def _queries(args):
+    from run_10_queries import run_queries
+    run_queries(args.db)
+
+
+# --- plots ---
+
+def _plots_args(parser):
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--jobs', '-j', type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument('--force', action='store_true', help="Redraw every plot, even if unchanged")
+
+
+def _plots(args):
+    from visualize_data import main as draw_plots
+    draw_plots(args.jobs, args.force, args.db)
+
+
+# --- score ---
+
+def _score_args(parser):
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--input', help="Raw encounter CSV (diabetic_data.csv schema)")
+    source.add_argument('--db', help="SQLite database whose `patients` table should be scored")
+    parser.add_argument('--output', default='output/risk_scores.parquet',
+                        help="Output table (.parquet, .feather or .csv)")
+    parser.add_argument('--model-dir', default=OUTPUT_DIR)
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--mmap', action=argparse.BooleanOptionalAction, default=None,
+                        help="Score with the shared memory-mapped forest export (--mmap) or the sklearn "
+                             "pickle (--no-mmap: more memory per worker, about 2x faster on large chunks); "
+                             "by default the export only for chunks of up to 512 rows")
+    parser.add_argument('--history-db', default=DB_PATH,
+                        help="Database with the patient_history totals that --input encounters continue "
+                             "(default: %(default)s, if present)")
+
+
+def _score(args):
+    from score import score
+    score(args.output, input_path=args.input, db_path=args.db, model_dir=args.model_dir,
+          chunksize=args.chunksize, n_workers=args.workers, mmap=args.mmap, history_db=args.history_db)
+
+
+# --- serve ---
+
+def _serve_args(parser):
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--model-dir', default=OUTPUT_DIR)
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    parser.add_argument('--history-db', default=DB_PATH,
+                        help="Database whose patient_history totals give the prior-utilization features of "
+                             "requests with a patient_nbr (default: %(default)s, if present)")
+
+
+def _serve(args):
+    from serve import serve
+    serve(args.host, args.port, args.model_dir, args.max_batch, args.max_wait_ms, args.history_db)
+
+
+COMMANDS = {
+    'download': Command('download_data', "Download the UCI diabetes dataset.", _download_args, _download),
+    'synth': Command('synthetic_data', "Generate synthetic encounters in the raw CSV schema.", _synth_args, _synth),
+    'preprocess': Command('preprocessing', "Clean and recode the raw encounter data.", _preprocess_args, _preprocess),
+    'features': Command('features', "Build model features from the processed data.", _features_args, _features),
+    'train': Command('modeling', "Train and evaluate the readmission models.", _train_args, _train),
+    'db': Command('create_db', "Load the processed data into SQLite.", _db_args, _db),
+    'queries': Command('run_10_queries', "Run the ten analytic queries against hospital.db.", _queries_args, _queries),
+    'plots': Command('visualize_data', "Draw the analysis plots from hospital.db.", _plots_args, _plots),
+    'score': Command('score', "Score encounters with the trained readmission models.", _score_args, _score),
+    'serve': Command('serve', "Online readmission scoring service.", _serve_args, _serve),
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Hospital readmission pipeline.")
+    subparsers = parser.add_subparsers(dest='command', required=True, metavar='command')
+    for name, command in COMMANDS.items():
+        sub = subparsers.add_parser(name, help=command.help, description=command.help,
+                                    parents=[_instrument_parser()])
+        command.add_arguments(sub)
+    return parser
+
+
+def _instrument_parser():
+    # Options every command takes (see instrument.py)
+    parser = argparse.ArgumentParser(add_help=False)
+    group = parser.add_argument_group('instrumentation')
+    group.add_argument('--metrics', metavar='JSONL', default=None,
+                       help=f"Append per-step metrics (wall/CPU time, peak RSS, rows, bytes) to this "
+                            f"JSON-lines file (default: ${instrument.METRICS_ENV} if set)")
+    group.add_argument('--profile', metavar='PATH', default=None, help="Profile this command into PATH")
+    group.add_argument('--profile-mode', choices=instrument.PROFILE_MODES, default='cprofile',
+                       help="cProfile stats (python -m pstats PATH) or sampled collapsed stacks "
+                            "(default: %(default)s)")
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    args = build_parser().parse_args(argv)
+    instrument.configure(args.metrics, stage=args.command)
+    with instrument.profiled(args.profile, args.profile_mode), instrument.step('command', argv=argv):
+        COMMANDS[args.command].run(args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
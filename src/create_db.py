@@ -1,23 +1,223 @@
+import sys
 import sqlite3
+import time
 import pandas as pd
 import os
 
-def create_database():
-    db_path = 'data/hospital.db'
-    
+from instrument import step
+from patient_history import HISTORY_COLUMNS, HISTORY_KEY, HISTORY_TABLE, load_history, upsert_history
+from preprocessing import PROCESSED_COLUMNS
+from storage import read_table
+
+# Settings for the bulk load only: WAL with relaxed syncing and a 256 MB page
+# cache. A crash mid-load can lose the load, never corrupt the file, and the
+# load is simply re-run. The others last only as long as the connection, but
+# journal_mode is stored in the file, so the load switches it back to
+# AFTER_LOAD_JOURNAL_MODE when it is done.
+LOAD_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -256 * 1024,
+    'temp_store': 'MEMORY',
+}
+AFTER_LOAD_JOURNAL_MODE = 'DELETE'
+
+# Indexes on the columns the analytic queries group or filter by. Where a
+# query aggregates another column, that column is included too, so SQLite
+# answers the query from the index alone without visiting the table. The
+# ten queries of run_10_queries.py read patient_summary; these serve the
+# same GROUP BYs run directly on `patients` (run_10_queries.SCAN_QUERIES).
+INDEXES = {
+    'idx_patients_race': ['race'],
+    'idx_patients_gender': ['gender', 'time_in_hospital'],
+    'idx_patients_age': ['age', 'readmitted_binary'],
+    'idx_patients_diag_1_cat': ['diag_1_cat'],
+    'idx_patients_readmitted': ['readmitted_binary', 'num_lab_procedures'],
+    'idx_patients_insulin': ['insulin'],
+    'idx_patients_number_emergency': ['number_emergency'],
+    'idx_patients_a1c': ['A1Cresult'],
+    'idx_patients_admission_source': ['admission_source_group', 'num_procedures'],
+    'idx_patients_max_glu_serum': ['max_glu_serum'],
+}
+
+BATCH_ROWS = 50_000
+
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def sql_type(dtype):
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'REAL'
+    return 'TEXT'
+
+
+def create_table_sql(df, table='patients'):
+    columns = ',\n    '.join(f'{quote(col)} {sql_type(dtype)}' for col, dtype in df.dtypes.items())
+    return f'CREATE TABLE {quote(table)} (\n    {columns}\n)'
+
+
+def column_values(col):
+    """Plain Python values for sqlite3; NaN/missing become NULL."""
+    if col.dtype.kind in 'iub':
+        return col.tolist()
+    return col.astype(object).where(col.notna(), None).tolist()
+
+
+def insert_rows(conn, df, table='patients', batch_rows=BATCH_ROWS):
+    """executemany in batches of row tuples, converted column by column."""
+    sql = f'INSERT INTO {quote(table)} VALUES ({", ".join("?" * len(df.columns))})'
+    for start in range(0, len(df), batch_rows):
+        batch = df.iloc[start:start + batch_rows]
+        conn.executemany(sql, zip(*(column_values(batch[c]) for c in batch.columns)))
+
+
+def create_indexes(conn, table='patients', indexes=INDEXES):
+    for name, columns in indexes.items():
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {quote(name)} ON {quote(table)} '
+                     f'({", ".join(quote(c) for c in columns)})')
+    # Row counts per index, so the planner picks the covering indexes
+    conn.execute('ANALYZE')
+
+
+def load_table(conn, df, table='patients'):
+    """Replace `table` with `df`: typed schema, one transaction, indexes built after the rows.
+
+    The summary layer is rebuilt from `df` in the same transaction.
+    """
+    for pragma, value in LOAD_PRAGMAS.items():
+        conn.execute(f'PRAGMA {pragma} = {value}')
+    with conn:
+        # sqlite3 only opens a transaction implicitly before INSERT, UPDATE or
+        # DELETE, so without this the DROP and CREATE would each commit on their own
+        conn.execute('BEGIN')
+        with step('insert_rows', rows_in=len(df)) as s:
+            conn.execute(f'DROP TABLE IF EXISTS {quote(table)}')
+            conn.execute(create_table_sql(df, table))
+            insert_rows(conn, df, table)
+            s.rows_out = len(df)
+        with step('create_indexes', rows_in=len(df), indexes=len(INDEXES)):
+            create_indexes(conn, table)
+        with step('summarize', rows_in=len(df)) as s:
+            summary = summarize(df)
+            write_summary(conn, summary)
+            s.rows_out = len(summary)
+    with step('checkpoint'):
+        # Leaving WAL mode checkpoints the log into the database and removes it
+        conn.execute(f'PRAGMA journal_mode = {AFTER_LOAD_JOURNAL_MODE}')
+
+
+# --- Summary layer ---
+# patient_summary holds, for every value of every dimension the analytic
+# queries group by, the row count and the sums those queries aggregate, plus
+# a grand-total row (dimension 'all'). It has a few dozen rows however large
+# `patients` grows, and appends merge into it instead of rebuilding it.
+SUMMARY_TABLE = 'patient_summary'
+SUMMARY_DIMENSIONS = ['race', 'gender', 'age', 'diag_1_cat', 'insulin', 'A1Cresult', 'max_glu_serum',
+                      'admission_source_group', 'readmitted_binary']
+SUMMARY_MEASURES = {
+    'readmitted': 'readmitted_binary',
+    'sum_time_in_hospital': 'time_in_hospital',
+    'sum_num_lab_procedures': 'num_lab_procedures',
+    'sum_num_procedures': 'num_procedures',
+}
+HIGH_EMERGENCY_VISITS = 5
+
+
+def summarize(df):
+    """Per-dimension counts and sums of `df`, in the layout of patient_summary."""
+    measures = pd.DataFrame({name: df[col].astype('int64') for name, col in SUMMARY_MEASURES.items()})
+    measures['high_emergency'] = (df['number_emergency'] > HIGH_EMERGENCY_VISITS).astype('int64')
+    measures['n'] = 1
+    # One pass over the rows, grouped by all dimensions at once; each
+    # dimension is then rolled up from these (far fewer) groups.
+    cube = measures.groupby([df[d] for d in SUMMARY_DIMENSIONS], dropna=False, observed=True).sum()
+    parts = [cube.sum().to_frame().T.assign(dimension='all', value=None)]
+    for dim in SUMMARY_DIMENSIONS:
+        part = cube.groupby(level=dim, dropna=False, observed=True).sum()
+        values = part.index.astype(object).where(part.index.notna(), None)
+        parts.append(part.reset_index(drop=True).assign(dimension=dim, value=list(values)))
+    return pd.concat(parts, ignore_index=True)[summary_columns()]
+
+
+def summary_columns():
+    return ['dimension', 'value', 'n'] + list(SUMMARY_MEASURES) + ['high_emergency']
+
+
+def write_summary(conn, summary):
+    # `value` has no declared type, so integer dimensions stay integers
+    conn.execute(f'CREATE TABLE IF NOT EXISTS {SUMMARY_TABLE} (dimension TEXT NOT NULL, value, '
+                 + ', '.join(f'{c} INTEGER NOT NULL' for c in summary_columns()[2:]) + ')')
+    conn.execute(f'DELETE FROM {SUMMARY_TABLE}')
+    insert_rows(conn, summary, SUMMARY_TABLE)
+
+
+def merge_summary(conn, df):
+    """Add the counts and sums of newly appended rows `df` to patient_summary."""
+    current = pd.read_sql_query(f'SELECT * FROM {SUMMARY_TABLE}', conn)
+    merged = (pd.concat([current, summarize(df)], ignore_index=True)
+              .groupby(['dimension', 'value'], dropna=False, sort=False).sum().reset_index())
+    write_summary(conn, merged[summary_columns()])
+
+
+def append_rows(conn, df, table='patients', history=None):
+    """Append processed rows to `table` and fold them into the summary, in one transaction.
+
+    `history` is the matching per-patient totals table from preprocessing,
+    upserted into patient_history in the same transaction.
+    """
+    columns = [row[1] for row in conn.execute(f'PRAGMA table_info({quote(table)})')]
+    with conn:
+        insert_rows(conn, df[columns], table)
+        merge_summary(conn, df)
+        if history is not None:
+            upsert_history(conn, history.set_index(HISTORY_KEY))
+
+
+def create_database(input_path='data/processed_data.parquet', db_path='data/hospital.db',
+                    history_path='data/patient_history.parquet'):
+    with step('create_database') as total:
+        _create_database(total, input_path, db_path, history_path)
+
+
+def _create_database(total, input_path, db_path, history_path):
     # Connect to (or create) the database
     conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
     
     # Load the processed data
     print("Loading processed data into SQLite...")
-    df = pd.read_csv('data/processed_data.csv')
+    with step('load') as s:
+        df = read_table(input_path, columns=PROCESSED_COLUMNS)
+        s.read(input_path)
+        s.rows_out = len(df)
+    total.rows_in = len(df)
+    total.read(input_path)
     
-    # Write to SQL table
     # 'patients' table will contain the main data
-    df.to_sql('patients', conn, if_exists='replace', index=False)
+    start = time.perf_counter()
+    with step('load_table', rows_in=len(df)) as s:
+        load_table(conn, df, 'patients')
+        s.rows_out = len(df)
     
-    print(f"Database created at {db_path}")
+    # Running totals per patient, written by preprocessing alongside the input
+    if os.path.exists(history_path):
+        with step('load_history') as s:
+            history = read_table(history_path, columns=[HISTORY_KEY] + HISTORY_COLUMNS)
+            s.read(history_path)
+            with conn:
+                conn.execute('BEGIN')
+                load_history(conn, history.set_index(HISTORY_KEY))
+            s.rows_out = len(history)
+        print(f"Table '{HISTORY_TABLE}' created with {len(history)} patients.")
+    else:
+        print(f"No patient history at {history_path}; '{HISTORY_TABLE}' not created.")
+    total.rows_out = len(df)
+    total.wrote(db_path)
+    
+    print(f"Database created at {db_path} in {time.perf_counter() - start:.2f}s")
     print(f"Table 'patients' created with {len(df)} rows.")
     
     # --- Example Queries ---
@@ -26,12 +226,12 @@ def create_database():
     # Query 1: Readmission Rate by Gender
     query1 = """
     SELECT 
-        gender,
-        COUNT(*) as total_patients,
-        SUM(readmitted_binary) as readmitted_count,
-        ROUND(CAST(SUM(readmitted_binary) AS FLOAT) / COUNT(*) * 100, 2) as readmission_rate
-    FROM patients
-    GROUP BY gender
+        value as gender,
+        n as total_patients,
+        readmitted as readmitted_count,
+        ROUND(CAST(readmitted AS FLOAT) / n * 100, 2) as readmission_rate
+    FROM patient_summary
+    WHERE dimension = 'gender'
     ORDER BY readmission_rate DESC;
     """
     print("\nQuery 1: Readmission Rate by Gender")
@@ -40,12 +240,11 @@ def create_database():
     # Query 2: Top 5 Diagnosis Categories with highest readmission volume
     query2 = """
     SELECT 
-        diag_1_cat as primary_diagnosis,
-        COUNT(*) as total_cases,
-        SUM(readmitted_binary) as readmissions
-    FROM patients
-    WHERE diag_1_cat != 'others'
-    GROUP BY diag_1_cat
+        value as primary_diagnosis,
+        n as total_cases,
+        readmitted as readmissions
+    FROM patient_summary
+    WHERE dimension = 'diag_1_cat' AND value != 'others'
     ORDER BY readmissions DESC
     LIMIT 5;
     """
@@ -54,5 +253,26 @@ def create_database():
     
     conn.close()
 
+def append_database(input_path, db_path='data/hospital.db', history_path=None):
+    with step('append_database') as s:
+        conn = sqlite3.connect(db_path)
+        df = read_table(input_path, columns=PROCESSED_COLUMNS)
+        s.read(input_path)
+        s.rows_in = len(df)
+        history = None
+        if history_path:
+            history = read_table(history_path, columns=[HISTORY_KEY] + HISTORY_COLUMNS)
+            s.read(history_path)
+        start = time.perf_counter()
+        append_rows(conn, df, 'patients', history)
+        total = conn.execute("SELECT n FROM patient_summary WHERE dimension = 'all'").fetchone()[0]
+        conn.close()
+        s.rows_out = len(df)
+        s.fields['rows_in_table'] = total
+    print(f"Appended {len(df)} rows to 'patients' in {time.perf_counter() - start:.2f}s ({total} rows in total).")
+    if history is not None:
+        print(f"Updated the running totals of {len(history)} patients in '{HISTORY_TABLE}'.")
+
 if __name__ == "__main__":
-    create_database()
+    import cli
+    cli.main(['db'] + sys.argv[1:])
@@ -1,24 +1,147 @@
+import sys
 import os
+import hashlib
+import shutil
 import requests
 import zipfile
-import io
+import zlib
 
-def download_dataset():
-    url = "https://archive.ics.uci.edu/static/public/296/diabetes+130-us+hospitals+for+years+1999-2008.zip"
-    data_dir = "data"
-    
+DATASET_URL = "https://archive.ics.uci.edu/static/public/296/diabetes+130-us+hospitals+for+years+1999-2008.zip"
+DATA_DIR = "data"
+CHUNK_BYTES = 1 << 20
+# Pin the published archive's sha256 here or with --sha256. Without a pin,
+# the first download is only trusted once every member passes its CRC check
+# and extracts; its digest is then recorded next to the archive
+# (<archive>.sha256) and later runs are checked against it.
+DATASET_SHA256 = None
+
+
+def sha256_file(path, chunk_bytes=CHUNK_BYTES):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_bytes), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fetch(url, dest, chunk_bytes=CHUNK_BYTES, retries=3, timeout=60, session=None):
+    """Stream `url` to `dest` in `chunk_bytes` pieces.
+
+    Bytes go to `dest + '.part'` first. A partial file left by an interrupted
+    run (or a failed attempt) is resumed with an HTTP Range request; if the
+    server ignores the range, the download restarts from zero.
+    """
+    session = session or requests.Session()
+    part = dest + '.part'
+    for attempt in range(1, retries + 1):
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+        try:
+            with session.get(url, stream=True, headers=headers, timeout=timeout) as response:
+                if response.status_code == 416 and offset:
+                    # Nothing left to send: the partial file is already complete
+                    break
+                response.raise_for_status()
+                if offset and response.status_code != 206:
+                    offset = 0
+                if offset:
+                    print(f"Resuming download at {offset:,} bytes...")
+                with open(part, 'ab' if offset else 'wb') as f:
+                    for block in response.iter_content(chunk_bytes):
+                        f.write(block)
+            break
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            if attempt == retries:
+                raise
+            print(f"Download interrupted ({e.__class__.__name__}); retrying ({attempt}/{retries - 1})...")
+    os.replace(part, dest)
+    return dest
+
+
+def expected_digest(archive, sha256=None):
+    if sha256 or DATASET_SHA256:
+        return sha256 or DATASET_SHA256
+    if os.path.exists(archive + '.sha256'):
+        with open(archive + '.sha256') as f:
+            return f.read().split()[0]
+    return None
+
+
+def readable_zip(archive):
+    """True if `archive` is a zip whose members all decompress and match their CRCs."""
+    try:
+        with zipfile.ZipFile(archive) as z:
+            return z.testzip() is None
+    except (zipfile.BadZipFile, zlib.error, EOFError):
+        return False
+
+
+def verify(archive, sha256=None):
+    """True if `archive` matches the expected digest, or (unpinned) is a readable zip."""
+    expected = expected_digest(archive, sha256)
+    if expected:
+        return sha256_file(archive) == expected
+    return readable_zip(archive)
+
+
+def extract(archive, data_dir, chunk_bytes=CHUNK_BYTES, skip_existing=True):
+    """Stream each member to disk; with `skip_existing`, files already extracted at full size are kept."""
+    root = os.path.realpath(data_dir)
+    with zipfile.ZipFile(archive) as z:
+        for member in z.infolist():
+            target = os.path.realpath(os.path.join(root, member.filename))
+            if os.path.commonpath([root, target]) != root:
+                raise ValueError(f"Refusing to extract {member.filename!r} outside {data_dir}")
+            if member.is_dir():
+                os.makedirs(target, exist_ok=True)
+                continue
+            if skip_existing and os.path.exists(target) and os.path.getsize(target) == member.file_size:
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with z.open(member) as src, open(target, 'wb') as dst:
+                shutil.copyfileobj(src, dst, chunk_bytes)
+
+
+def download_dataset(url=DATASET_URL, data_dir=DATA_DIR, sha256=None, force=False, chunk_bytes=CHUNK_BYTES):
     if not os.path.exists(data_dir):
         os.makedirs(data_dir)
-        
-    print(f"Downloading dataset from {url}...")
-    response = requests.get(url)
-    
-    if response.status_code == 200:
-        with zipfile.ZipFile(io.BytesIO(response.content)) as z:
-            z.extractall(data_dir)
-        print("Dataset extracted successfully to 'data/' directory.")
+    archive = os.path.join(data_dir, os.path.basename(url.split('?')[0]))
+
+    if force:
+        # Also forget the recorded digest, in case the published archive changed
+        for path in [archive, archive + '.sha256']:
+            if os.path.exists(path):
+                os.remove(path)
+    downloaded = False
+    if os.path.exists(archive) and verify(archive, sha256):
+        print(f"Verified {archive} is already present; skipping download.")
     else:
-        print(f"Failed to download dataset. Status code: {response.status_code}")
+        if os.path.exists(archive):
+            print(f"{archive} failed verification; downloading it again.")
+            os.remove(archive)
+        print(f"Downloading dataset from {url}...")
+        fetch(url, archive, chunk_bytes)
+        digest = sha256_file(archive)
+        expected = expected_digest(archive, sha256)
+        if expected and digest != expected:
+            os.remove(archive)
+            raise ValueError(f"Checksum mismatch for {url}: expected {expected}, got {digest}")
+        if not expected:
+            print("No sha256 pinned for this archive (DATASET_SHA256 or --sha256); checking it as a zip instead.")
+            if not readable_zip(archive):
+                os.remove(archive)
+                raise ValueError(f"Download from {url} is not a readable zip archive (sha256 {digest})")
+        print(f"Downloaded {os.path.getsize(archive):,} bytes (sha256 {digest}).")
+        downloaded = True
+
+    extract(archive, data_dir, chunk_bytes, skip_existing=not downloaded)
+    if downloaded:
+        # Recorded only once the archive has extracted, so later runs never
+        # verify against the digest of an archive that could not be used
+        with open(archive + '.sha256', 'w') as f:
+            f.write(f"{digest}  {os.path.basename(archive)}\n")
+    print(f"Dataset extracted successfully to '{data_dir}/' directory.")
 
 if __name__ == "__main__":
-    download_dataset()
+    import cli
+    cli.main(['download'] + sys.argv[1:])
@@ -0,0 +1,247 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Threshold evaluation for the readmission models: precision, recall and
+# workload at every decision threshold, with bootstrap confidence intervals,
+# overall and per subgroup.
+#
+# Every metric here is a function of four counts per threshold (flagged
+# positives/negatives, all positives/negatives). Scores are binned once on
+# the threshold grid; a reverse cumulative sum over the bins then gives the
+# counts at every threshold at once. Subgroups and bootstrap replicates are
+# extra axes of the same count array, so the whole report is a few array
+# operations rather than a loop over thresholds, groups or replicates.
+
+# Decision thresholds of the evaluation table and its confidence intervals
+THRESHOLDS = np.round(np.linspace(0, 1, 101), 2)
+# Subgroup breakdowns, by column of the feature frame ('age' is bucketed as age_numeric)
+SUBGROUP_COLUMNS = ['race', 'gender', 'age_numeric']
+N_BOOTSTRAP = 500
+CONFIDENCE = 0.95
+# Bootstrap index matrices are drawn in blocks of about this many elements (int32)
+BLOCK_ELEMENTS = 1 << 24
+METRICS = ['precision', 'recall', 'specificity', 'f1', 'flagged_rate']
+# Thresholds written to the text report (the CSV has all of THRESHOLDS)
+REPORT_THRESHOLDS = np.round(np.arange(0.1, 0.91, 0.1), 2)
+
+
+def threshold_curve(y_true, scores):
+    """Counts and rates at every distinct score, from one descending sort.
+
+    Row i is the rule "flag when score >= threshold[i]"; rows run from the
+    strictest threshold to the most lenient.
+    """
+    y_true = np.asarray(y_true, dtype=np.int64)
+    scores = np.asarray(scores, dtype=np.float64)
+    order = np.argsort(-scores, kind='stable')
+    ranked, labels = scores[order], y_true[order]
+    # Last position of each run of equal scores: ties are flagged together
+    last = np.r_[ranked[1:] != ranked[:-1], True]
+    tp = np.cumsum(labels)[last]
+    fp = np.cumsum(1 - labels)[last]
+    curve = pd.DataFrame({'threshold': ranked[last], 'tp': tp, 'fp': fp})
+    positives, negatives = labels.sum(), len(labels) - labels.sum()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        curve['precision'] = tp / (tp + fp)
+        curve['recall'] = tp / positives
+        curve['fpr'] = fp / negatives
+    return curve
+
+
+def roc_auc(curve):
+    """Area under the ROC curve (trapezoids through the origin), from threshold_curve."""
+    fpr = np.r_[0.0, curve['fpr'].to_numpy()]
+    tpr = np.r_[0.0, curve['recall'].to_numpy()]
+    return float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+
+
+def average_precision(curve):
+    """Precision averaged over recall steps (sklearn's average_precision_score), from threshold_curve."""
+    recall = np.r_[0.0, curve['recall'].to_numpy()]
+    return float(np.sum(np.diff(recall) * curve['precision'].to_numpy()))
+
+
+def subgroups(frame, columns=SUBGROUP_COLUMNS):
+    """Group membership as (combo code per row, combo -> group indicator, group labels).
+
+    Rows are coded by their joint combination of `columns`, so each row
+    falls in exactly one combo. Group 0 is every row; then one group per
+    value of each column. A column missing from `frame` is skipped.
+    """
+    columns = [c for c in columns if frame is not None and c in frame.columns]
+    n_rows = len(frame) if frame is not None else 0
+    if not columns:
+        return np.zeros(n_rows, dtype=np.int64), np.ones((1, 1), dtype=np.int64), [('all', 'all')]
+    codes, levels = [], []
+    for col in columns:
+        col_codes, uniques = pd.factorize(frame[col], sort=True, use_na_sentinel=False)
+        codes.append(col_codes)
+        levels.append(list(uniques))
+    joint = np.ravel_multi_index(codes, [len(values) for values in levels])
+    combos, combo_codes = np.unique(joint, return_inverse=True)
+    combo_levels = np.unravel_index(combos, [len(values) for values in levels])
+
+    labels = [('all', 'all')]
+    rows = [np.ones(len(combos), dtype=np.int64)]
+    for col, values, members in zip(columns, levels, combo_levels):
+        for j, value in enumerate(values):
+            labels.append((col, value))
+            rows.append((members == j).astype(np.int64))
+    return combo_codes.reshape(-1), np.vstack(rows), labels
+
+
+def _cell_codes(y_true, scores, combos, thresholds):
+    # Cell of every row: (combo, score bin, label). Bin b holds the scores in
+    # [thresholds[b-1], thresholds[b]), so a threshold k flags bins > k.
+    bins = np.searchsorted(thresholds, scores, side='right')
+    return ((combos * (len(thresholds) + 1) + bins) * 2 + y_true).astype(np.int32)
+
+
+def group_counts(counts, membership, n_bins):
+    """Cell counts (replicates, n_cells) -> counts per group (replicates, groups, bins, 2)."""
+    counts = counts.reshape(len(counts), membership.shape[1], n_bins * 2).astype(np.float64)
+    # One matrix product sums the combos of every group
+    return (membership.astype(np.float64) @ counts).reshape(len(counts), len(membership), n_bins, 2)
+
+
+def _metrics(grouped):
+    """Rates at every threshold from group counts (replicates, groups, bins, 2).
+
+    Returns a dict of arrays (replicates, groups, thresholds), plus the
+    group sizes and positives of each replicate.
+    """
+    # Flagged counts at every threshold: a reverse cumulative sum over the bins
+    flagged = grouped[:, :, ::-1].cumsum(axis=2)[:, :, ::-1]
+    totals = flagged[:, :, 0]
+    tp, fp = flagged[:, :, 1:, 1], flagged[:, :, 1:, 0]
+    positives, negatives = totals[:, :, 1:2], totals[:, :, 0:1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = tp / (tp + fp)
+        recall = tp / positives
+        rates = {
+            'precision': precision,
+            'recall': recall,
+            'specificity': 1 - fp / negatives,
+            'f1': 2 * precision * recall / (precision + recall),
+            'flagged_rate': (tp + fp) / (positives + negatives),
+        }
+    return rates, totals.sum(axis=2), totals[:, :, 1]
+
+
+def bootstrap_counts(cells, n_cells, n_bootstrap, seed=0, block_elements=BLOCK_ELEMENTS):
+    """Cell counts of `n_bootstrap` resamples of the rows, in blocks of shape (replicates, n_cells).
+
+    Reference resampler: each block of replicates is one (replicates, rows)
+    index matrix drawn at once, and the cells of the sampled rows are
+    counted with a single bincount over the block, offset by replicate.
+    Costs O(replicates * rows); multinomial_counts draws the same
+    distribution from the cell counts alone.
+    """
+    rng = np.random.default_rng(seed)
+    n_rows = len(cells)
+    per_block = max(1, block_elements // max(n_rows, 1))
+    index_dtype = np.int32 if n_rows < 2**31 else np.int64
+    for start in range(0, n_bootstrap, per_block):
+        size = min(per_block, n_bootstrap - start)
+        index = rng.integers(0, n_rows, size=(size, n_rows), dtype=index_dtype)
+        sampled = np.take(cells, index) + (np.arange(size) * n_cells)[:, None]
+        yield np.bincount(sampled.ravel(), minlength=size * n_cells).reshape(size, n_cells)
+
+
+def multinomial_counts(cells, n_cells, n_bootstrap, seed=0, block_elements=BLOCK_ELEMENTS):
+    """Cell counts of `n_bootstrap` resamples of the rows, as bootstrap_counts.
+
+    Drawing n rows with replacement puts Multinomial(n, cell shares) rows
+    in the cells, and every metric depends on the rows only through those
+    counts. So each replicate is one multinomial draw over the occupied
+    cells, O(cells) instead of O(rows).
+    """
+    rng = np.random.default_rng(seed)
+    observed = np.bincount(cells, minlength=n_cells)
+    occupied = np.flatnonzero(observed)
+    shares = observed[occupied] / len(cells)
+    per_block = max(1, block_elements // n_cells)
+    for start in range(0, n_bootstrap, per_block):
+        size = min(per_block, n_bootstrap - start)
+        counts = np.zeros((size, n_cells), dtype=np.int64)
+        counts[:, occupied] = rng.multinomial(len(cells), shares, size=size)
+        yield counts
+
+
+BOOTSTRAP_METHODS = {'multinomial': multinomial_counts, 'index': bootstrap_counts}
+
+
+def evaluate(y_true, scores, frame=None, subgroup_columns=SUBGROUP_COLUMNS, thresholds=THRESHOLDS,
+             n_bootstrap=N_BOOTSTRAP, confidence=CONFIDENCE, seed=0, method='multinomial'):
+    """Metrics at every threshold, overall and per subgroup, with bootstrap intervals.
+
+    `frame` holds the subgroup columns of the same rows (e.g. the unencoded
+    test split). Returns a long table: one row per (group, threshold) with
+    n, positives and, for each of METRICS, the estimate and its
+    `confidence` percentile interval over `n_bootstrap` resamples of the
+    rows (drawn by BOOTSTRAP_METHODS[method]). Rates that are undefined
+    (e.g. precision when nothing is flagged) are NaN.
+    """
+    y_true = np.asarray(y_true, dtype=np.int64)
+    scores = np.asarray(scores, dtype=np.float64)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    combos, membership, labels = subgroups(frame, subgroup_columns)
+    n_combos = membership.shape[1]
+    n_bins = len(thresholds) + 1
+    n_cells = n_combos * n_bins * 2
+    cells = _cell_codes(y_true, scores, combos, thresholds)
+
+    point = np.bincount(cells, minlength=n_cells).reshape(1, n_cells)
+    estimates, sizes, positives = _metrics(group_counts(point, membership, n_bins))
+
+    table = pd.DataFrame({
+        'group_by': np.repeat([col for col, _ in labels], len(thresholds)),
+        'group': np.repeat([value for _, value in labels], len(thresholds)),
+        'threshold': np.tile(thresholds, len(labels)),
+        'n': np.repeat(sizes[0].astype(np.int64), len(thresholds)),
+        'positives': np.repeat(positives[0].astype(np.int64), len(thresholds)),
+    })
+    low_q, high_q = 100 * (1 - confidence) / 2, 100 * (1 + confidence) / 2
+    replicates = None
+    if n_bootstrap:
+        # Only the per-group counts of each block are kept
+        grouped = np.concatenate([group_counts(block, membership, n_bins)
+                                  for block in BOOTSTRAP_METHODS[method](cells, n_cells, n_bootstrap, seed)])
+        replicates, _, _ = _metrics(grouped)
+    for name in METRICS:
+        table[name] = estimates[name][0].ravel()
+        if replicates is not None:
+            with warnings.catch_warnings():
+                # All-NaN slices (e.g. precision where nothing is ever flagged) stay NaN
+                warnings.simplefilter('ignore', RuntimeWarning)
+                low, high = np.nanpercentile(replicates[name], [low_q, high_q], axis=0)
+            table[f'{name}_low'] = low.ravel()
+            table[f'{name}_high'] = high.ravel()
+    return table
+
+
+def format_report(name, table, curve, thresholds=REPORT_THRESHOLDS, subgroup_threshold=0.5):
+    """Text section for model_evaluation_report.txt."""
+    def cell(row, metric):
+        value = row[metric]
+        if pd.isna(value):
+            return f"{'-':>21}"
+        if f'{metric}_low' in row:
+            return f"{value:6.3f} [{row[f'{metric}_low']:.3f}, {row[f'{metric}_high']:.3f}]"
+        return f"{value:>21.3f}"
+
+    lines = [f"ROC AUC {roc_auc(curve):.4f}, average precision {average_precision(curve):.4f}", '',
+             f"{'threshold':>9} {'precision':>21} {'recall':>21} {'flagged':>21}"]
+    overall = table[(table['group_by'] == 'all') & table['threshold'].isin(thresholds)]
+    for _, row in overall.iterrows():
+        lines.append(f"{row['threshold']:>9.2f} {cell(row, 'precision')} {cell(row, 'recall')} "
+                     f"{cell(row, 'flagged_rate')}")
+    lines += ['', f"Subgroups at threshold {subgroup_threshold:.2f}:",
+              f"{'group':<28} {'n':>7} {'precision':>21} {'recall':>21} {'flagged':>21}"]
+    at = table[(table['group_by'] != 'all') & np.isclose(table['threshold'], subgroup_threshold)]
+    for _, row in at.iterrows():
+        lines.append(f"{f'{row.group_by}={row.group}':<28} {row['n']:>7,} {cell(row, 'precision')} "
+                     f"{cell(row, 'recall')} {cell(row, 'flagged_rate')}")
+    return f"=== {name}: threshold sweep ===\n" + '\n'.join(lines) + '\n'
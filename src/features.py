@@ -1,50 +1,152 @@
+import sys
+import warnings
+from contextlib import contextmanager
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import LabelEncoder, StandardScaler
+from scipy import sparse
 
-def feature_engineering(input_path, output_path):
-    print(f"Loading data from {input_path}...")
-    df = pd.read_csv(input_path)
+from instrument import step
+from preprocessing import PROCESSED_COLUMNS, PROCESSED_DTYPES
+from storage import read_table, write_table
+
+DIAG_CAT_COLS = ['diag_1_cat', 'diag_2_cat', 'diag_3_cat']
+# The processed columns feature_engineering reads: all but the encounter_id
+# the patients table is keyed by, which is not a model input
+FEATURE_SOURCE_COLUMNS = [c for c in PROCESSED_COLUMNS if c != 'encounter_id']
+# Columns of the feature table build_features writes: the model inputs plus the target
+FEATURE_COLUMNS = [c for c in FEATURE_SOURCE_COLUMNS if c != 'age'] + ['comorbidity_count', 'age_numeric']
+
+AGE_MAPPING = {
+    '[0-10)': 5, '[10-20)': 15, '[20-30)': 25, '[30-40)': 35,
+    '[40-50)': 45, '[50-60)': 55, '[60-70)': 65, '[70-80)': 75,
+    '[80-90)': 85, '[90-100)': 95
+}
+
+# Baseline level of every one-hot block (dropped): missing values and
+# categories the encoder did not see in training encode as this level
+UNSEEN_LEVEL = '(missing or unseen)'
+
+# Byte-wise popcount table, used when numpy has no bitwise_count (< 2.0)
+_POPCOUNT_8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(masks):
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(masks)
+    as_bytes = masks.reshape(-1, 1).view(np.uint8)
+    return _POPCOUNT_8[as_bytes].sum(axis=1, dtype=np.uint8)
+
+
+def comorbidity_count(df, diag_cols=DIAG_CAT_COLS, exclude='others'):
+    """Count distinct diagnosis categories per row, ignoring `exclude`.
     
+    Every category gets one bit of a 64-bit mask; the per-column masks are
+    OR-ed together so duplicates collapse, and the popcount is the count.
+    """
+    values = np.concatenate([df[c].to_numpy(dtype=object) for c in diag_cols])
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    if len(uniques) > 64:
+        raise ValueError(f"Too many diagnosis categories for a 64-bit mask: {len(uniques)}")
+    
+    bits = np.left_shift(np.uint64(1), np.arange(len(uniques), dtype=np.uint64))
+    bits[np.asarray(uniques == exclude, dtype=bool)] = 0
+    
+    masks = np.bitwise_or.reduce(bits[codes].reshape(len(diag_cols), -1), axis=0)
+    return pd.Series(_popcount(masks).astype(np.int64), index=df.index)
+
+
+def calculate_comorbidity(row, diag_cols=DIAG_CAT_COLS):
+    # Row-wise reference for comorbidity_count; kept for parity checks
+    cats = [row[c] for c in diag_cols if row[c] != 'others']
+    return len(set(cats))
+
+
+def build_features(df):
+    """Derived features on a processed frame; categorical columns stay as text."""
     # 1. Create a feature for 'comorbidity'
     # Defining comorbidity as the count of distinct non-'others' clinical categories
     # across the three primary diagnoses.
-    diag_cols = ['diag_1_cat', 'diag_2_cat', 'diag_3_cat']
-    
-    def calculate_comorbidity(row):
-        cats = [row[c] for c in diag_cols if row[c] != 'others']
-        return len(set(cats))
-        
-    df['comorbidity_count'] = df.apply(calculate_comorbidity, axis=1)
-    
-    # 2. Encode Categorical Features
-    # Identify categorical columns
-    cat_cols = df.select_dtypes(include=['object']).columns.tolist()
-    print(f"Encoding categorical columns: {cat_cols}")
-    
-    # Use Label Encoding for models like Random Forest, 
-    # but One-Hot for Logistic Regression. 
-    # For simplicity and 'Gold Standard' portfolio, we'll use One-Hot Encoding
-    # but keep the number of features manageable.
+    df['comorbidity_count'] = comorbidity_count(df)
     
     # Group age into numeric (midpoints)
-    age_mapping = {
-        '[0-10)': 5, '[10-20)': 15, '[20-30)': 25, '[30-40)': 35,
-        '[40-50)': 45, '[50-60)': 55, '[60-70)': 65, '[70-80)': 75,
-        '[80-90)': 85, '[90-100)': 95
-    }
-    df['age_numeric'] = df['age'].map(age_mapping)
+    df['age_numeric'] = df['age'].astype(object).map(AGE_MAPPING)
     df.drop(columns=['age'], inplace=True)
+    return df
+
+
+def text_columns(df):
+    return df.select_dtypes(include=['object', 'category']).columns.tolist()
+
+
+def fit_encoder(X):
+    """Fit the one-hot encoder that turns a feature frame into a CSR matrix.
     
-    # One-Hot Encoding
-    # Note: Many scripts like 'metformin', 'repaglinide' etc. are 'No', 'Steady', 'Up', 'Down'.
-    # We should keep them as features.
-    
-    df_encoded = pd.get_dummies(df, drop_first=True)
+    Like pd.get_dummies(X), but the category vocabulary is learned once from
+    the training frame and stored in the encoder, so every later batch maps
+    to the same columns. Every level seen in training gets its own column;
+    the dropped baseline is UNSEEN_LEVEL, which no real value maps to, so
+    missing values and categories unseen during fit (all zeros) are not
+    mistaken for an actual level.
+    """
+    from sklearn.compose import ColumnTransformer
+    from sklearn.preprocessing import OneHotEncoder
+    cat_cols = text_columns(X)
+    num_cols = [c for c in X.columns if c not in cat_cols]
+    categories = [[UNSEEN_LEVEL] + sorted(pd.unique(X[c].dropna().astype(object))) for c in cat_cols]
+    print(f"Encoding categorical columns: {cat_cols}")
     
-    print(f"Feature engineering complete. Shape: {df_encoded.shape}")
-    df_encoded.to_csv(output_path, index=False)
-    print(f"Saved feature-engineered data to {output_path}")
+    encoder = ColumnTransformer(
+        [('num', 'passthrough', num_cols),
+         ('cat', OneHotEncoder(categories=categories, drop='first', handle_unknown='ignore',
+                               sparse_output=True, dtype=np.float32), cat_cols)],
+        sparse_threshold=1.0,
+        verbose_feature_names_out=False,
+    )
+    with _quiet_unknowns():
+        return encoder.fit(X)
+
+
+def encode(encoder, X):
+    with _quiet_unknowns():
+        return sparse.csr_matrix(encoder.transform(X), dtype=np.float32)
+
+
+@contextmanager
+def _quiet_unknowns():
+    # Missing/unseen categories encoding as zeros is intended, not worth a warning per batch
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', message='Found unknown categories', category=UserWarning)
+        yield
+
+
+def feature_engineering(input_path, output_path):
+    with step('feature_engineering') as total:
+        print(f"Loading data from {input_path}...")
+        with step('load') as s:
+            df = read_table(input_path, columns=FEATURE_SOURCE_COLUMNS, csv_dtypes=PROCESSED_DTYPES)
+            s.read(input_path)
+            s.rows_out = len(df)
+        total.rows_in = len(df)
+        total.read(input_path)
+        
+        with step('build_features', rows_in=len(df)) as s:
+            df = build_features(df)
+            s.rows_out = len(df)
+        
+        # 2. Categorical columns are left as text here. One-Hot Encoding is done by
+        # the fitted encoder (fit_encoder) in modeling.py, so the category
+        # vocabulary comes from the training split and is saved with the models.
+        # Note: Many scripts like 'metformin', 'repaglinide' etc. are 'No', 'Steady', 'Up', 'Down'.
+        # We should keep them as features.
+        
+        print(f"Feature engineering complete. Shape: {df.shape}")
+        with step('write', rows_in=len(df)) as s:
+            write_table(df, output_path)
+            s.wrote(output_path)
+        total.rows_out = len(df)
+        total.wrote(output_path)
+        print(f"Saved feature-engineered data to {output_path}")
 
 if __name__ == "__main__":
-    feature_engineering('data/processed_data.csv', 'data/final_features.csv')
+    import cli
+    cli.main(['features'] + sys.argv[1:])
@@ -0,0 +1,143 @@
+import json
+import os
+
+import numpy as np
+from scipy import sparse
+
+# A fitted RandomForestClassifier stored as plain .npy arrays, one file per
+# field, with all trees concatenated. Unlike the joblib pickle (whose Tree
+# objects copy their node arrays on unpickling), these files can be opened
+# with np.load(mmap_mode='r'), so every scoring process maps the same pages
+# from the OS page cache instead of holding a private copy.
+ARRAY_FIELDS = ['feature', 'threshold', 'children', 'value']
+META_FILE = 'meta.json'
+TREE_LEAF = -1
+
+
+def export_forest(forest, out_dir):
+    """Write the node arrays of a fitted forest to `out_dir`.
+    
+    Arrays use compact dtypes: float32 thresholds and values, int32 child
+    indices and int16 feature ids where the feature count allows it.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    arrays, roots, max_depth = flatten_forest(forest)
+    for name, arr in arrays.items():
+        np.save(os.path.join(out_dir, f'{name}.npy'), arr)
+    np.save(os.path.join(out_dir, 'roots.npy'), roots)
+
+    meta = {
+        'n_trees': len(roots),
+        'n_features': int(forest.n_features_in_),
+        'classes': [c.item() if hasattr(c, 'item') else c for c in forest.classes_],
+        'max_depth': max_depth,
+    }
+    with open(os.path.join(out_dir, META_FILE), 'w') as f:
+        json.dump(meta, f)
+
+
+def flatten_forest(forest):
+    """Concatenate all trees of a fitted forest into contiguous node arrays.
+    
+    Child indices are global, and leaves point back to themselves with an
+    infinite threshold, so a batch can take `max_depth` steps through every
+    tree without checking which rows have already reached a leaf.
+    """
+    trees = [est.tree_ for est in forest.estimators_]
+    offsets = np.cumsum([0] + [t.node_count for t in trees])
+    n_nodes = int(offsets[-1])
+    index_dtype = np.int32
+    feature_dtype = np.int16 if forest.n_features_in_ <= np.iinfo(np.int16).max else np.int32
+
+    node_ids = np.arange(n_nodes, dtype=index_dtype)
+    left = np.concatenate([t.children_left + off for t, off in zip(trees, offsets)])
+    right = np.concatenate([t.children_right + off for t, off in zip(trees, offsets)])
+    is_leaf = np.concatenate([t.children_left == TREE_LEAF for t in trees])
+    feature = np.concatenate([t.feature for t in trees])
+    threshold = np.concatenate([t.threshold for t in trees])
+
+    arrays = {
+        'feature': np.where(is_leaf, 0, feature).astype(feature_dtype),
+        'threshold': _float32_floor(np.where(is_leaf, np.inf, threshold)),
+        # children[2 * node + (x <= threshold)]: right child first, then left
+        'children': np.stack([np.where(is_leaf, node_ids, right),
+                              np.where(is_leaf, node_ids, left)], axis=1).astype(index_dtype).ravel(),
+        # Per-leaf class probabilities, as each tree's predict_proba returns them
+        'value': np.concatenate([_leaf_proba(t) for t in trees]).astype(np.float32),
+    }
+    roots = offsets[:-1].astype(index_dtype)
+    return arrays, roots, int(max(t.max_depth for t in trees))
+
+
+def _float32_floor(threshold):
+    # sklearn compares float32 inputs against float64 thresholds. Rounding each
+    # threshold down to the nearest float32 keeps `x <= t` identical for every
+    # float32 x, so the split decisions are exact rather than approximate.
+    t32 = threshold.astype(np.float32)
+    rounded_up = t32.astype(np.float64) > threshold
+    t32[rounded_up] = np.nextafter(t32[rounded_up], np.float32(-np.inf))
+    return t32
+
+
+def _leaf_proba(tree):
+    value = tree.value[:, 0, :]
+    totals = value.sum(axis=1, keepdims=True)
+    return value / np.where(totals == 0, 1, totals)
+
+
+class ForestArrays:
+    """predict_proba over exported forest arrays, drop-in for the sklearn model."""
+
+    def __init__(self, arrays, meta):
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.children = arrays['children']
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.n_features_in_ = meta['n_features']
+        self.classes_ = np.array(meta['classes'])
+        self.max_depth = meta['max_depth']
+
+    @classmethod
+    def load(cls, in_dir, mmap=True):
+        mode = 'r' if mmap else None
+        arrays = {name: np.load(os.path.join(in_dir, f'{name}.npy'), mmap_mode=mode)
+                  for name in ARRAY_FIELDS + ['roots']}
+        with open(os.path.join(in_dir, META_FILE)) as f:
+            meta = json.load(f)
+        return cls(arrays, meta)
+
+    def predict_proba(self, X, block_size=4096):
+        X = X.toarray() if sparse.issparse(X) else np.asarray(X)
+        X = X.astype(np.float32, copy=False)
+        proba = np.empty((len(X), self.value.shape[1]), dtype=np.float64)
+        # Blocks keep the (rows x trees) node matrix cache-sized
+        for start in range(0, len(X), block_size):
+            block = X[start:start + block_size]
+            leaves = self.apply(block)
+            proba[start:start + len(block)] = self.value[leaves].mean(axis=1)
+        return proba
+
+    def apply(self, X):
+        """Leaf index reached in every tree, shape (n_rows, n_trees)."""
+        n_rows, n_trees = len(X), len(self.roots)
+        x_flat = np.ascontiguousarray(X).ravel()
+        node = np.tile(self.roots, n_rows)
+        row_offset = np.repeat(np.arange(n_rows, dtype=np.int64) * X.shape[1], n_trees)
+        # Only (row, tree) pairs still moving are stepped; a pair whose node
+        # did not change has reached its self-looping leaf.
+        active = np.arange(len(node))
+        for _ in range(self.max_depth + 1):
+            current = node[active]
+            go_left = np.take(x_flat, row_offset[active] + np.take(self.feature, current)) \
+                <= np.take(self.threshold, current)
+            next_node = np.take(self.children, 2 * current + go_left)
+            moved = next_node != current
+            if not moved.any():
+                break
+            active = active[moved]
+            node[active] = next_node[moved]
+        return node.reshape(n_rows, n_trees)
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
@@ -0,0 +1,127 @@
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from artifacts import load_artifacts
+from evaluation import roc_auc, threshold_curve
+from tuning import load_matrix, publish_matrix
+
+# Permutation importance of the saved models: the drop in ROC AUC on the
+# test split when one input column is shuffled across rows. A categorical
+# column is its block of one-hot columns, shuffled as one feature, so every
+# input column gets one score whatever its encoding, for either model.
+#
+# Baseline probabilities are computed once per model. A shuffle leaves many
+# rows unchanged (two rows with the same category swap identical values),
+# so only the rows whose encoded values changed are predicted again; the
+# rest keep their baseline probability. Workers load the forest from its
+# pickle: the compiled sklearn trees predict whole batches faster than the
+# memory-mapped arrays, which are built for the latency of small batches.
+N_REPEATS = 5
+IMPORTANCE_FILE = 'permutation_importance.csv'
+
+
+def feature_groups(encoder):
+    """(input column, first, last + 1) encoded columns of every input column of the fitted encoder."""
+    groups = []
+    for name, transformer, columns in encoder.transformers_:
+        if name not in encoder.output_indices_:
+            continue
+        start = encoder.output_indices_[name].start
+        if hasattr(transformer, 'categories_'):
+            drop = transformer.drop_idx_ if transformer.drop_idx_ is not None else [None] * len(columns)
+            widths = [len(cats) - (d is not None) for cats, d in zip(transformer.categories_, drop)]
+        else:
+            widths = [1] * len(columns)
+        for col, width in zip(columns, widths):
+            groups.append((col, start, start + width))
+            start += width
+    return groups
+
+
+def permuted_rows(X, lo, hi, perm, block=None):
+    """Rows changed by shuffling columns [lo, hi) with `perm`, and those rows after the shuffle."""
+    block = X[:, lo:hi] if block is None else block
+    shuffled = block[perm]
+    diff = (shuffled - block).tocsr()
+    diff.eliminate_zeros()
+    changed = np.flatnonzero(np.diff(diff.indptr))
+    rows = X[changed]
+    rows = sparse.hstack([rows[:, :lo], shuffled[changed], rows[:, hi:]], format='csr')
+    return changed, rows
+
+
+def _auc(y, proba):
+    return roc_auc(threshold_curve(y, proba))
+
+
+# --- Worker process state ---
+# Each worker maps the published test matrix, labels and baseline
+# probabilities, and loads the saved models once.
+_SHARED = None
+
+
+def _init_worker(path, model_dir, model_names):
+    global _SHARED
+    X, y, *baselines = load_matrix(path, names=[f'baseline_{name}' for name in model_names])
+    _, models = load_artifacts(model_dir, mmap=False)
+    for model in models.values():
+        if hasattr(model, 'n_jobs'):
+            # Parallelism comes from the pool
+            model.n_jobs = 1
+    _SHARED = X, y, dict(zip(model_names, baselines)), models
+
+
+def _permute_group(task):
+    """AUC of one model with one column group shuffled, for each repeat."""
+    name, group, lo, hi, n_repeats, seed = task
+    X, y, baselines, models = _SHARED
+    block = X[:, lo:hi]
+    scores = np.empty(n_repeats)
+    for repeat in range(n_repeats):
+        perm = np.random.default_rng([seed, group, repeat]).permutation(X.shape[0])
+        changed, rows = permuted_rows(X, lo, hi, perm, block)
+        proba = np.array(baselines[name])
+        if len(changed):
+            proba[changed] = models[name].predict_proba(rows)[:, 1]
+        scores[repeat] = _auc(y, proba)
+    return scores
+
+
+def permutation_importance(X, y, model_dir='output', n_repeats=N_REPEATS, n_workers=None, seed=42):
+    """Permutation importance of every saved model in `model_dir` on the encoded test rows `X`.
+
+    Returns one row per (model, input column) with the mean and standard
+    deviation of the AUC drop over `n_repeats` shuffles. The same shuffles
+    are used for every model.
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    encoder, models = load_artifacts(model_dir, mmap=False)
+    groups = feature_groups(encoder)
+    X = sparse.csr_matrix(X, dtype=np.float32)
+    y = np.asarray(y)
+    names = list(models)
+    baselines = {f'baseline_{name}': models[name].predict_proba(X)[:, 1] for name in names}
+    baseline_auc = {name: _auc(y, baselines[f'baseline_{name}']) for name in names}
+
+    tasks = [(name, g, lo, hi, n_repeats, seed) for name in names for g, (_, lo, hi) in enumerate(groups)]
+    path = publish_matrix(X, y, prefix='readmission_importance_', **baselines)
+    try:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                 initargs=(path, model_dir, names)) as pool:
+            results = list(pool.map(_permute_group, tasks, chunksize=max(1, len(tasks) // (4 * n_workers))))
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+    drops = np.array([baseline_auc[name] - scores for (name, *_), scores in zip(tasks, results)])
+    return pd.DataFrame({
+        'model': [name for name, *_ in tasks],
+        'feature': [groups[g][0] for _, g, *_ in tasks],
+        'n_columns': [hi - lo for _, _, lo, hi, *_ in tasks],
+        'importance_mean': drops.mean(axis=1),
+        'importance_std': drops.std(axis=1),
+    })
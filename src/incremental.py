@@ -0,0 +1,273 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+from scipy import sparse
+from sklearn.linear_model import SGDClassifier
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import MaxAbsScaler
+from sklearn.utils.class_weight import compute_class_weight
+
+from artifacts import ARRAY_DIRS, ENCODER_FILE, MODEL_DIR, MODEL_FILES
+from forest_arrays import export_forest
+from patient_history import attach_priors, open_history, upsert_history
+from preprocessing import read_encounters, streamed_prior_utilization
+from score import TARGET_COL, feature_matrix, prepare_raw
+from storage import read_table
+
+# Versioned models for incremental retraining, in the registry under the
+# model directory of the full training run (cli.py: <output-dir>/models):
+#   output/models/v0001/  encoder, both models, forest arrays, manifest.json
+#   output/models/latest.json  -> {"version": 1}
+# Every version records the batches (file hash and row count) it has seen,
+# so the same extract is never trained on twice.
+REGISTRY_SUBDIR = 'models'
+REGISTRY_DIR = os.path.join(MODEL_DIR, REGISTRY_SUBDIR)
+MANIFEST_FILE = 'manifest.json'
+# Where --publish puts a version for score.py and serve.py (--model-dir).
+# Not output/ itself: those files are the train stage's outputs, and
+# pipeline.py would keep reporting train as up to date over a published version.
+PUBLISH_DIR = os.path.join(MODEL_DIR, 'published')
+
+
+def version_dir(version, registry=REGISTRY_DIR):
+    return os.path.join(registry, f'v{version:04d}')
+
+
+def latest_version(registry=REGISTRY_DIR):
+    path = os.path.join(registry, 'latest.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)['version']
+
+
+def load_version(version, registry=REGISTRY_DIR):
+    path = version_dir(version, registry)
+    encoder = joblib.load(os.path.join(path, ENCODER_FILE))
+    models = {name: joblib.load(os.path.join(path, fname)) for name, fname in MODEL_FILES.items()}
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    return encoder, models, manifest
+
+
+def save_version(encoder, models, manifest, registry=REGISTRY_DIR):
+    path = version_dir(manifest['version'], registry)
+    os.makedirs(path, exist_ok=True)
+    joblib.dump(encoder, os.path.join(path, ENCODER_FILE))
+    for name, fname in MODEL_FILES.items():
+        joblib.dump(models[name], os.path.join(path, fname))
+    export_forest(models['random_forest'], os.path.join(path, ARRAY_DIRS['random_forest']))
+    with open(os.path.join(path, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    # Pointer is replaced atomically so readers never see a half-written version
+    tmp = os.path.join(registry, 'latest.json.tmp')
+    with open(tmp, 'w') as f:
+        json.dump({'version': manifest['version']}, f)
+    os.replace(tmp, os.path.join(registry, 'latest.json'))
+    return path
+
+
+def publish(version, model_dir=PUBLISH_DIR, registry=REGISTRY_DIR):
+    """Copy a version's artifacts to `model_dir`, where score.py and serve.py can load them from."""
+    path = version_dir(version, registry)
+    os.makedirs(model_dir, exist_ok=True)
+    for fname in [ENCODER_FILE] + list(MODEL_FILES.values()) + [MANIFEST_FILE]:
+        shutil.copy2(os.path.join(path, fname), os.path.join(model_dir, fname))
+    for dirname in ARRAY_DIRS.values():
+        shutil.copytree(os.path.join(path, dirname), os.path.join(model_dir, dirname), dirs_exist_ok=True)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_linear_model(y):
+    """Logistic regression fitted by SGD, so it can be updated with partial_fit.
+
+    partial_fit does not support class_weight='balanced', so the balanced
+    weights are computed once from the bootstrap labels and then kept fixed.
+    The scaler is fitted at bootstrap and also kept fixed, so the coefficient
+    for each column keeps the same meaning across versions.
+    """
+    classes = np.array([0, 1])
+    weights = compute_class_weight('balanced', classes=classes, y=y)
+    return Pipeline([
+        ('scale', MaxAbsScaler()),
+        ('clf', SGDClassifier(loss='log_loss', alpha=1e-4, class_weight=dict(zip(classes.tolist(), weights)),
+                              random_state=42)),
+    ])
+
+
+def partial_fit_linear(model, X, y):
+    X = model.named_steps['scale'].transform(X)
+    model.named_steps['clf'].partial_fit(X, y, classes=np.array([0, 1]))
+
+
+def grow_forest(forest, X, y, n_new_trees, max_trees=None, trees_grown=None):
+    """Add `n_new_trees` trees fitted on the new rows only (warm_start).
+
+    With `max_trees`, the oldest trees are retired so the forest keeps a
+    bounded size and leans toward recent data. warm_start seeds the i-th
+    tree from the i-th draw of random_state, so after a trim new trees
+    would repeat the seeds of earlier ones; instead they draw from a stream
+    keyed by `trees_grown`, the count of trees ever fitted (retired ones included).
+    """
+    if trees_grown is None:
+        trees_grown = len(forest.estimators_)
+    seed = forest.random_state
+    if isinstance(seed, (int, np.integer)):
+        forest.set_params(random_state=int(np.random.SeedSequence([int(seed), trees_grown]).generate_state(1)[0]))
+    forest.set_params(warm_start=True, n_estimators=len(forest.estimators_) + n_new_trees)
+    try:
+        forest.fit(X, y)
+    finally:
+        forest.set_params(random_state=seed)
+    if max_trees and len(forest.estimators_) > max_trees:
+        forest.estimators_ = forest.estimators_[-max_trees:]
+        forest.set_params(n_estimators=max_trees)
+    return forest
+
+
+def bootstrap(history_path, model_dir=MODEL_DIR, chunksize=100_000, registry=None):
+    """Version 1 of the registry, built from a full train_and_evaluate run.
+
+    The encoder and forest are reused as they are; the linear model is
+    trained by streaming the training split of the history table once
+    through partial_fit. The split is the one train_and_evaluate made, so
+    the rows it was evaluated on stay held out here too.
+    Balanced class weights are frozen from the training labels, since later
+    batches alone would give warm-started trees a different weighting.
+    """
+    registry = registry or os.path.join(model_dir, REGISTRY_SUBDIR)
+    print(f"Bootstrapping incremental models from {model_dir} and {history_path}...")
+    encoder = joblib.load(os.path.join(model_dir, ENCODER_FILE))
+    forest = joblib.load(os.path.join(model_dir, MODEL_FILES['random_forest']))
+    table = read_table(history_path, columns=list(encoder.feature_names_in_) + [TARGET_COL])
+    # Same split as train_and_evaluate
+    history, _ = train_test_split(table, test_size=0.2, random_state=42, stratify=table[TARGET_COL])
+    y = history[TARGET_COL].to_numpy()
+
+    linear = make_linear_model(y)
+    forest.set_params(class_weight=linear.named_steps['clf'].class_weight)
+    linear.named_steps['scale'].fit(feature_matrix(encoder, history))
+    for start in range(0, len(history), chunksize):
+        chunk = history.iloc[start:start + chunksize]
+        partial_fit_linear(linear, feature_matrix(encoder, chunk), chunk[TARGET_COL].to_numpy())
+
+    manifest = {
+        'version': 1,
+        'parent': None,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'rows_seen': int(len(history)),
+        'n_trees': len(forest.estimators_),
+        'trees_grown': len(forest.estimators_),
+        'batches': [{'source': history_path, 'sha256': file_sha256(history_path), 'rows': int(len(history)),
+                     'held_out': int(len(table) - len(history))}],
+    }
+    path = save_version(encoder, {'logistic_regression': linear, 'random_forest': forest}, manifest, registry)
+    print(f"Saved version 1 to {path} ({len(history):,} training rows, {len(table) - len(history):,} held out)")
+    return manifest
+
+
+def record_history(history_db, totals):
+    """Upsert a batch's per-patient totals (an iterable of frames) into patient_history.
+
+    The next batch's prior features then continue from them.
+    """
+    conn = open_history(history_db, read_only=False)
+    if conn is None:
+        return
+    n_patients = 0
+    try:
+        with conn:
+            for frame in totals:
+                upsert_history(conn, frame)
+                n_patients += len(frame)
+    finally:
+        conn.close()
+    print(f"Updated the running totals of {n_patients:,} patients in {history_db}")
+
+
+def update(batch_path, history_path=None, new_trees=20, max_trees=None, chunksize=100_000,
+           model_dir=MODEL_DIR, registry=None, publish_to=None, history_db=None):
+    """Train a new model version on one batch of labelled raw encounters.
+
+    The linear model streams over the batch in chunks with partial_fit; the
+    forest gains `new_trees` trees fitted on the batch. Only the new rows are
+    read, so the cost is proportional to the batch, not the history; the
+    batch's prior-utilization features start from the patient_history
+    totals in `history_db`, and its encounters are added to those totals
+    once the new version is saved. The registry defaults to
+    `model_dir`/models.
+    """
+    registry = registry or os.path.join(model_dir, REGISTRY_SUBDIR)
+    version = latest_version(registry)
+    if version is None:
+        if history_path is None:
+            raise ValueError("No model registry yet: pass the training history table to bootstrap it")
+        version = bootstrap(history_path, model_dir, chunksize, registry)['version']
+
+    encoder, models, manifest = load_version(version, registry)
+    batch_hash = file_sha256(batch_path)
+    if any(b['sha256'] == batch_hash for b in manifest['batches']):
+        print(f"{batch_path} was already used by version {version}; nothing to do.")
+        return manifest
+
+    print(f"Updating version {version} with {batch_path}...")
+    start = time.perf_counter()
+    blocks, labels = [], []
+    with streamed_prior_utilization(batch_path, chunksize, history_db) as priors:
+        reader = attach_priors(read_encounters(batch_path, chunksize=chunksize), priors)
+        for chunk in reader:
+            if 'readmitted' not in chunk.columns:
+                raise ValueError(f"{batch_path} has no 'readmitted' column; incremental training needs labels")
+            _, df = prepare_raw(chunk)
+            X = feature_matrix(encoder, df)
+            y = df[TARGET_COL].to_numpy()
+            partial_fit_linear(models['logistic_regression'], X, y)
+            blocks.append(X)
+            labels.append(y)
+
+        n_rows = sum(len(y) for y in labels)
+        # Manifests from before the counter existed: assume no tree was retired
+        trees_grown = manifest.get('trees_grown', manifest['n_trees'])
+        y_all = np.concatenate(labels) if labels else np.zeros(0)
+        if len(np.unique(y_all)) < 2:
+            # A forest refit on one class would have trees with a single
+            # predict_proba column, unusable next to the existing ones
+            print(f"{batch_path} has {'no rows' if not n_rows else 'a single class'}; "
+                  f"the forest keeps its {len(models['random_forest'].estimators_)} trees")
+        else:
+            grow_forest(models['random_forest'], sparse.vstack(blocks).tocsr(), y_all,
+                        new_trees, max_trees, trees_grown)
+            trees_grown += new_trees
+
+        new_manifest = {
+            'version': version + 1,
+            'parent': version,
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'rows_seen': manifest['rows_seen'] + n_rows,
+            'n_trees': len(models['random_forest'].estimators_),
+            'trees_grown': trees_grown,
+            'batches': manifest['batches'] + [{'source': batch_path, 'sha256': batch_hash, 'rows': n_rows}],
+        }
+        path = save_version(encoder, models, new_manifest, registry)
+        print(f"Saved version {version + 1} to {path}: {n_rows:,} new rows, "
+              f"{new_manifest['rows_seen']:,} seen in total, {new_manifest['n_trees']} trees "
+              f"({time.perf_counter() - start:.1f}s)")
+        record_history(history_db, priors.totals())
+    if publish_to:
+        publish(version + 1, publish_to, registry)
+        print(f"Published version {version + 1} to {publish_to}")
+    return new_manifest
@@ -0,0 +1,286 @@
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Shared instrumentation for the pipeline stages. Each stage wraps its main
+# steps in `step(...)`; when metrics are enabled every step appends one JSON
+# line to the metrics file:
+#
+#   {"ts": ..., "run": ..., "stage": "preprocess", "step": "clean", "parent": "preprocess_data",
+#    "wall_s": 0.41, "cpu_s": 0.40, "children_cpu_s": 0.0, "peak_rss_mb": 180.2,
+#    "rows_in": 100000, "rows_out": 77310, "bytes_read": 0, "bytes_written": 0,
+#    "io_read_bytes": 4096, "io_write_bytes": 0, "pid": 4242, "status": "ok"}
+#
+# Metrics are off unless a file is given (cli.py --metrics, or the
+# PIPELINE_METRICS environment variable, which worker processes inherit);
+# disabled steps cost nothing beyond the function call. Only the standard
+# library is imported here, so every module can use it.
+
+METRICS_ENV = 'PIPELINE_METRICS'
+STAGE_ENV = 'PIPELINE_STAGE'
+# Groups the records of one pipeline run (all stages and their workers)
+RUN_ENV = 'PIPELINE_RUN_ID'
+PROFILE_MODES = ['cprofile', 'sample']
+SAMPLE_INTERVAL = 0.005
+
+_local = threading.local()
+_write_lock = threading.Lock()
+
+
+def new_run_id():
+    return datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S') + f'-{os.getpid()}'
+
+
+def configure(metrics_path=None, stage=None):
+    """Enable metrics for this process and the processes it starts."""
+    if metrics_path:
+        os.makedirs(os.path.dirname(os.path.abspath(metrics_path)), exist_ok=True)
+        os.environ[METRICS_ENV] = metrics_path
+    if stage:
+        os.environ[STAGE_ENV] = stage
+    os.environ.setdefault(RUN_ENV, new_run_id())
+
+
+def metrics_path():
+    return os.environ.get(METRICS_ENV)
+
+
+def emit(record):
+    """Append one JSON line to the metrics file (a no-op when metrics are off)."""
+    path = metrics_path()
+    if not path:
+        return
+    line = json.dumps(record, default=str) + '\n'
+    # One write per record on an O_APPEND file, so lines from concurrent
+    # processes do not interleave
+    with _write_lock:
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode())
+        finally:
+            os.close(fd)
+
+
+def file_size(path):
+    """Bytes in a file, or in all files under a directory (0 if missing)."""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, names in os.walk(path) for name in names)
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+# --- Process counters ---
+# Peak RSS is per step where the kernel lets us reset the high-water mark
+# (writing 5 to /proc/self/clear_refs); elsewhere it is the process peak.
+
+def _hwm_kb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _reset_hwm():
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _io_bytes():
+    try:
+        with open('/proc/self/io') as f:
+            fields = dict(line.split(':') for line in f)
+        return int(fields['rchar']), int(fields['wchar'])
+    except (OSError, KeyError, ValueError):
+        return 0, 0
+
+
+def _cpu():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime, children.ru_utime + children.ru_stime
+
+
+class Step:
+    """Counters of one step; the stage code fills in rows and bytes."""
+
+    def __init__(self, name, rows_in=None, **fields):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.fields = fields
+        self.peak_kb = 0
+
+    def read(self, path):
+        """Count the size of an input file (or directory)."""
+        self.bytes_read += file_size(path)
+
+    def wrote(self, path):
+        """Count the size of an output file (or directory)."""
+        self.bytes_written += file_size(path)
+
+
+class _Disabled(Step):
+    def read(self, path):
+        pass
+
+    def wrote(self, path):
+        pass
+
+
+@contextmanager
+def step(name, rows_in=None, **fields):
+    """Measure the enclosed block and emit it as one metrics record.
+
+    Yields a Step: set `rows_out` (and `rows_in` if not known up front) and
+    call `read(path)` / `wrote(path)` for the files the step touches. Extra
+    keyword arguments are copied into the record.
+    """
+    if not metrics_path():
+        yield _Disabled(name, rows_in, **fields)
+        return
+
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    current = Step(name, rows_in, **fields)
+    # Fold the peak so far into the enclosing steps before resetting it.
+    # Only the main thread resets: the mark is shared by the whole process.
+    per_step = threading.current_thread() is threading.main_thread()
+    if per_step:
+        hwm = _hwm_kb()
+        for parent in stack:
+            parent.peak_kb = max(parent.peak_kb, hwm)
+        per_step = _reset_hwm()
+    parent = stack[-1].name if stack else None
+    stack.append(current)
+
+    status, error = 'ok', None
+    cpu_start, children_start = _cpu()
+    io_start = _io_bytes()
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        status, error = 'error', f"{e.__class__.__name__}: {e}"
+        raise
+    finally:
+        wall = time.perf_counter() - start
+        cpu_end, children_end = _cpu()
+        io_end = _io_bytes()
+        stack.pop()
+        current.peak_kb = max(current.peak_kb, _hwm_kb())
+        record = {
+            'ts': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            'run': os.environ.get(RUN_ENV),
+            'stage': os.environ.get(STAGE_ENV),
+            'step': name,
+            'parent': parent,
+            'wall_s': round(wall, 4),
+            'cpu_s': round(cpu_end - cpu_start, 4),
+            'children_cpu_s': round(children_end - children_start, 4),
+            'peak_rss_mb': round(current.peak_kb / 1024, 1),
+            'peak_rss_scope': 'step' if per_step else 'process',
+            'rows_in': current.rows_in,
+            'rows_out': current.rows_out,
+            'bytes_read': current.bytes_read,
+            'bytes_written': current.bytes_written,
+            'io_read_bytes': io_end[0] - io_start[0],
+            'io_write_bytes': io_end[1] - io_start[1],
+            'pid': os.getpid(),
+            'status': status,
+        }
+        if error:
+            record['error'] = error
+        record.update(current.fields)
+        emit(record)
+
+
+# --- Profiling ---
+
+class SamplingProfiler(threading.Thread):
+    """Samples the main thread's stack every `interval` seconds.
+
+    Writes collapsed stacks ("outer;inner;leaf count" per line), the input
+    format of flamegraph.pl and speedscope. Cheaper than cProfile on code
+    with many small calls, at the cost of statistical counts.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.counts = {}
+        self._target = threading.main_thread().ident
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                key = ';'.join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for stack, count in sorted(self.counts.items(), key=lambda item: -item[1]):
+                f.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def profiled(path, mode='cprofile', interval=SAMPLE_INTERVAL):
+    """Profile the enclosed block into `path` (no-op when `path` is None).
+
+    'cprofile' writes pstats data (python -m pstats <path>); 'sample' writes
+    collapsed stacks from SamplingProfiler. Only this process is profiled,
+    not its worker pools.
+    """
+    if not path:
+        yield
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if mode == 'sample':
+        sampler = SamplingProfiler(interval)
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            sampler.dump(path)
+            print(f"Sampling profile ({sum(sampler.counts.values())} samples) written to {path}",
+                  file=sys.stderr)
+        return
+
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"cProfile written to {path}; top functions by cumulative time:", file=sys.stderr)
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(15)
@@ -1,79 +1,171 @@
-import pandas as pd
+import sys
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LogisticRegression
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
+from sklearn.metrics import classification_report
 import joblib
 import os
 
-def train_and_evaluate(input_path):
+from artifacts import ARRAY_DIRS, ENCODER_FILE, MODEL_FILES
+from evaluation import N_BOOTSTRAP, evaluate, format_report, threshold_curve
+from features import FEATURE_COLUMNS, encode, fit_encoder
+from forest_arrays import export_forest
+from importance import IMPORTANCE_FILE, N_REPEATS, permutation_importance
+from instrument import step
+from storage import read_table
+from tuning import make_model, save_params, tune
+
+def train_and_evaluate(input_path, params=None, tune_models=False, tune_options=None, results_dir='output',
+                       n_bootstrap=N_BOOTSTRAP, importance_repeats=N_REPEATS):
+    with step('train_and_evaluate') as total:
+        _train_and_evaluate(total, input_path, params, tune_models, tune_options, results_dir, n_bootstrap,
+                            importance_repeats)
+
+
+def threshold_sweep(name, model, X_test, y_test, test_frame, n_bootstrap):
+    """Threshold table (see evaluation.py) and its report section for one fitted model."""
+    with step(f'evaluate_{name}', rows_in=X_test.shape[0], n_bootstrap=n_bootstrap) as s:
+        scores = model.predict_proba(X_test)[:, 1]
+        table = evaluate(y_test, scores, test_frame, n_bootstrap=n_bootstrap)
+        report = format_report(name.replace('_', ' ').title(), table, threshold_curve(y_test, scores))
+        s.rows_out = len(table)
+    return table, report
+
+
+def _train_and_evaluate(total, input_path, params, tune_models, tune_options, results_dir, n_bootstrap,
+                        importance_repeats):
     print(f"Loading data from {input_path}...")
-    df = pd.read_csv(input_path)
+    with step('load') as s:
+        df = read_table(input_path, columns=FEATURE_COLUMNS)
+        s.read(input_path)
+        s.rows_out = len(df)
+    total.rows_in = len(df)
+    total.read(input_path)
     
     # Target and Features
     X = df.drop(columns=['readmitted_binary'])
     y = df['readmitted_binary']
     
-    # 1. Split Data
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    with step('split_encode', rows_in=len(df)) as s:
+        # 1. Split Data
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+        # Unencoded test rows, for the subgroup breakdowns of the threshold sweep
+        test_frame = X_test
+        
+        # 2. One-Hot Encode into sparse matrices; the vocabulary comes from the training split only
+        encoder = fit_encoder(X_train)
+        X_train = encode(encoder, X_train)
+        X_test = encode(encoder, X_test)
+        s.rows_out = X_train.shape[0] + X_test.shape[0]
+        s.fields['n_features'] = X_train.shape[1]
     
     print(f"Train set size: {X_train.shape}, Test set size: {X_test.shape}")
     print(f"Class distribution in training: {np.bincount(y_train)}")
     
-    results_dir = 'output'
     if not os.path.exists(results_dir):
         os.makedirs(results_dir)
+    
+    # Optional hyperparameter search on the training split (see tuning.py)
+    params = dict(params or {})
+    if tune_models:
+        with step('tune', rows_in=X_train.shape[0]):
+            tuned = tune(X_train, y_train.to_numpy(), **(tune_options or {}))
+        save_params(tuned, os.path.join(results_dir, 'best_params.json'))
+        params.update({name: result['params'] for name, result in tuned.items()})
         
     # --- Logistic Regression ---
     print("\nTraining Logistic Regression...")
     # Use class_weight='balanced' to handle imbalance
-    lr_model = LogisticRegression(max_iter=1000, class_weight='balanced', random_state=42)
-    lr_model.fit(X_train, y_train)
-    y_pred_lr = lr_model.predict(X_test)
+    lr_model = make_model('logistic_regression', params.get('logistic_regression'))
+    with step('fit_logistic_regression', rows_in=X_train.shape[0]):
+        lr_model.fit(X_train, y_train)
+    with step('predict_logistic_regression', rows_in=X_test.shape[0]) as s:
+        y_pred_lr = lr_model.predict(X_test)
+        s.rows_out = len(y_pred_lr)
     
     print("\nLogistic Regression Classification Report:")
     lr_report = classification_report(y_test, y_pred_lr)
     print(lr_report)
+    lr_sweep, lr_sweep_report = threshold_sweep('logistic_regression', lr_model, X_test, y_test, test_frame,
+                                                n_bootstrap)
+    print(lr_sweep_report)
     
     # --- Random Forest ---
     print("\nTraining Random Forest Classifier...")
     # Use class_weight='balanced' here too
-    rf_model = RandomForestClassifier(n_estimators=100, class_weight='balanced', random_state=42, n_jobs=-1)
-    rf_model.fit(X_train, y_train)
-    y_pred_rf = rf_model.predict(X_test)
+    rf_model = make_model('random_forest', params.get('random_forest'))
+    with step('fit_random_forest', rows_in=X_train.shape[0]):
+        rf_model.fit(X_train, y_train)
+    with step('predict_random_forest', rows_in=X_test.shape[0]) as s:
+        y_pred_rf = rf_model.predict(X_test)
+        s.rows_out = len(y_pred_rf)
     
     print("\nRandom Forest Classification Report:")
     rf_report = classification_report(y_test, y_pred_rf)
     print(rf_report)
+    rf_sweep, rf_sweep_report = threshold_sweep('random_forest', rf_model, X_test, y_test, test_frame,
+                                                n_bootstrap)
+    print(rf_sweep_report)
     
-    # --- Feature Importance Plot (Random Forest) ---
-    print("\nGenerating Feature Importance Plot...")
-    importances = rf_model.feature_importances_
-    indices = np.argsort(importances)[-15:] # Top 15 features
-    
-    plt.figure(figsize=(10, 8))
-    plt.title('Top 15 Predictors for Patient Readmission')
-    plt.barh(range(len(indices)), importances[indices], color='skyblue', align='center')
-    plt.yticks(range(len(indices)), [X.columns[i] for i in indices])
-    plt.xlabel('Relative Importance Score')
-    plt.tight_layout()
-    plt.savefig(os.path.join(results_dir, 'feature_importance.png'))
-    print(f"Feature importance plot saved to {os.path.join(results_dir, 'feature_importance.png')}")
-    
-    # Save reports to text file for the user
-    with open(os.path.join(results_dir, 'model_evaluation_report.txt'), 'w') as f:
-        f.write("=== Logistic Regression Report ===\n")
-        f.write(lr_report)
-        f.write("\n\n=== Random Forest Report ===\n")
-        f.write(rf_report)
-    
-    # Save models
-    joblib.dump(lr_model, os.path.join(results_dir, 'logistic_regression_model.pkl'))
-    joblib.dump(rf_model, os.path.join(results_dir, 'random_forest_model.pkl'))
+    with step('save') as s:
+        # Save reports to text file for the user
+        with open(os.path.join(results_dir, 'model_evaluation_report.txt'), 'w') as f:
+            f.write("=== Logistic Regression Report ===\n")
+            f.write(lr_report)
+            f.write("\n\n=== Random Forest Report ===\n")
+            f.write(rf_report)
+            f.write("\n\n" + lr_sweep_report)
+            f.write("\n" + rf_sweep_report)
+        # Every threshold, group and confidence bound, for capacity planning
+        lr_sweep.to_csv(os.path.join(results_dir, 'threshold_metrics_logistic_regression.csv'), index=False)
+        rf_sweep.to_csv(os.path.join(results_dir, 'threshold_metrics_random_forest.csv'), index=False)
+        
+        # Save models (with the encoder, so scoring uses the training-time columns)
+        joblib.dump(encoder, os.path.join(results_dir, ENCODER_FILE))
+        joblib.dump(lr_model, os.path.join(results_dir, MODEL_FILES['logistic_regression']))
+        joblib.dump(rf_model, os.path.join(results_dir, MODEL_FILES['random_forest']))
+        # Flat node arrays of the forest, memory-mapped by the scoring processes
+        export_forest(rf_model, os.path.join(results_dir, ARRAY_DIRS['random_forest']))
+        for name in ['model_evaluation_report.txt', 'threshold_metrics_logistic_regression.csv',
+                     'threshold_metrics_random_forest.csv', ENCODER_FILE, *MODEL_FILES.values(),
+                     *ARRAY_DIRS.values()]:
+            s.wrote(os.path.join(results_dir, name))
+    total.bytes_written += s.bytes_written
     print("Models and reports saved successfully.")
+    
+    # --- Permutation Importance (both saved models) ---
+    if importance_repeats:
+        print("\nComputing permutation importance on the test set...")
+        importance_path = os.path.join(results_dir, IMPORTANCE_FILE)
+        with step('permutation_importance', rows_in=X_test.shape[0], n_repeats=importance_repeats) as s:
+            importance = permutation_importance(X_test, y_test, results_dir, n_repeats=importance_repeats,
+                                                n_workers=(tune_options or {}).get('n_workers'))
+            importance.to_csv(importance_path, index=False)
+            s.rows_out = len(importance)
+            s.wrote(importance_path)
+        total.wrote(importance_path)
+        
+        print("\nGenerating Feature Importance Plot...")
+        plot_path = os.path.join(results_dir, 'feature_importance.png')
+        with step('plot_feature_importance') as s:
+            import matplotlib
+            matplotlib.use('Agg')
+            import matplotlib.pyplot as plt
+            fig, axes = plt.subplots(1, 2, figsize=(16, 8))
+            for ax, (name, ranked) in zip(axes, importance.groupby('model', sort=False)):
+                top = ranked.nlargest(15, 'importance_mean').iloc[::-1] # Top 15 features
+                ax.barh(range(len(top)), top['importance_mean'], xerr=top['importance_std'],
+                        color='skyblue', align='center')
+                ax.set_yticks(range(len(top)), top['feature'])
+                ax.set_title(name.replace('_', ' ').title())
+                ax.set_xlabel('Drop in ROC AUC when shuffled')
+            fig.suptitle('Top 15 Predictors for Patient Readmission')
+            fig.tight_layout()
+            fig.savefig(plot_path)
+            s.wrote(plot_path)
+        total.wrote(plot_path)
+        print(f"Feature importance plot saved to {plot_path}")
+
 
 if __name__ == "__main__":
-    train_and_evaluate('data/final_features.csv')
+    import cli
+    cli.main(['train'] + sys.argv[1:])
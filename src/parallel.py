@@ -0,0 +1,16 @@
+from collections import deque
+
+
+def ordered_imap(pool, fn, items, window):
+    """Like pool.map, but keeps at most `window` tasks in flight.
+
+    Executor.map submits every item up front, which would pull a whole
+    chunked reader into memory. Results are yielded in input order.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
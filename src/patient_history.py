@@ -0,0 +1,403 @@
+import os
+import sqlite3
+import tempfile
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+
+# Prior-utilization features: for every encounter, running totals over the
+# same patient's earlier encounters only, so the current visit (and its
+# label) never leaks into its own features. The extract has no dates, so
+# "earlier" means a lower encounter_id, and recency is kept as the id of the
+# patient's last encounter rather than as days since discharge.
+#
+# Running totals per patient are stored in hospital.db, keyed by patient_nbr:
+#
+#   patient_history(patient_nbr INTEGER PRIMARY KEY, prior_encounters, prior_inpatient_days,
+#                   prior_emergency_admissions, prior_readmissions, last_encounter_id)
+#
+# A new extract starts from the stored totals of its patients (primary-key
+# lookups) and the updated totals are upserted back, so neither scoring nor
+# an update ever rescans the full history.
+
+HISTORY_TABLE = 'patient_history'
+HISTORY_KEY = 'patient_nbr'
+# Each feature is the sum over prior encounters of one per-encounter value
+PRIOR_COLUMNS = ['prior_encounters', 'prior_inpatient_days', 'prior_emergency_admissions', 'prior_readmissions']
+HISTORY_COLUMNS = PRIOR_COLUMNS + ['last_encounter_id']
+# int32 throughout: int16 would wrap silently for a patient with more than
+# 32,767 of anything once totals accumulate across extracts
+PRIOR_DTYPES = {
+    'prior_encounters': 'int32',
+    'prior_inpatient_days': 'int32',
+    'prior_emergency_admissions': 'int32',
+    'prior_readmissions': 'int32',
+}
+# The raw columns the features are computed from (read_encounters(..., columns=SOURCE_COLUMNS))
+SOURCE_COLUMNS = ['encounter_id', 'patient_nbr', 'time_in_hospital', 'admission_source_id', 'readmitted']
+# Records SpilledPriors spills to disk: SOURCE_COLUMNS (readmitted as a '<30'
+# flag) with the file row, the features by row, and the totals per patient
+SPILL_RECORD = np.dtype([('row', np.int64), ('patient_nbr', np.int64), ('encounter_id', np.int64),
+                         ('time_in_hospital', np.int32), ('admission_source_id', np.int32), ('readmitted', np.int8)])
+PRIOR_RECORD = np.dtype([('row', np.int64)] + [(c, np.int32) for c in PRIOR_COLUMNS])
+TOTALS_RECORD = np.dtype([(HISTORY_KEY, np.int64)] + [(c, np.int64) for c in HISTORY_COLUMNS])
+# Rows per SpilledPriors partition and row range, unless the chunk size is larger
+SPILL_PARTITION_ROWS = 250_000
+# ADMISSION_SOURCE_GROUPS['emergency'] in preprocessing.py
+EMERGENCY_SOURCE_IDS = [7]
+# Bound parameters per `IN (...)` lookup, below SQLite's default limit
+LOOKUP_BATCH = 900
+
+# priors: PRIOR_COLUMNS aligned with the input rows; totals: HISTORY_COLUMNS
+# per patient after the input; covered: rows the stored totals already
+# included (see prior_features)
+History = namedtuple('History', ['priors', 'totals', 'covered'])
+
+
+def encounter_values(df):
+    """What each encounter adds to its patient's running totals."""
+    values = pd.DataFrame({
+        'prior_encounters': 1,
+        'prior_inpatient_days': df['time_in_hospital'],
+        'prior_emergency_admissions': df['admission_source_id'].isin(EMERGENCY_SOURCE_IDS),
+        # Unlabelled extracts add nothing here; their readmissions are not known yet
+        'prior_readmissions': df['readmitted'] == '<30' if 'readmitted' in df.columns else 0,
+    }, index=df.index)
+    return values.to_numpy(dtype=np.int64)
+
+
+def _exclusive_cumsum(values, starts, group):
+    # Per-group sum of the rows before each row (rows sorted by group)
+    before = values.cumsum(axis=0) - values
+    return before - before[starts][group]
+
+
+def prior_features(df, base=None):
+    """Leak-free prior-utilization features for raw encounters `df`.
+
+    One stable sort by (patient_nbr, encounter_id); each feature is then a
+    cumulative sum within the patient, excluding the row itself, on top of
+    the patient's stored totals in `base` (a lookup_history frame).
+    Encounters at or below a patient's stored last_encounter_id are already
+    part of `base`; they get totals over the earlier rows of `df` only and
+    are not added to `base` again.
+    """
+    if HISTORY_KEY not in df.columns:
+        raise ValueError(f"Prior-utilization features need the '{HISTORY_KEY}' column")
+    n = len(df)
+    patients = df[HISTORY_KEY].to_numpy(dtype=np.int64)
+    has_ids = 'encounter_id' in df.columns
+    encounters = df['encounter_id'].to_numpy(dtype=np.int64) if has_ids else np.arange(n, dtype=np.int64)
+    order = np.lexsort((encounters, patients))
+    patients, encounters = patients[order], encounters[order]
+    values = encounter_values(df)[order]
+
+    first = np.r_[True, patients[1:] != patients[:-1]] if n else np.zeros(0, dtype=bool)
+    starts = np.flatnonzero(first)
+    ends = np.r_[starts[1:], n] - 1
+    group = np.cumsum(first) - 1
+
+    stored = (base if base is not None else empty_history()).reindex(patients[starts])
+    stored_totals = stored[PRIOR_COLUMNS].fillna(0).to_numpy(dtype=np.int64)
+    stored_last = stored['last_encounter_id'].fillna(-1).to_numpy(dtype=np.int64)
+
+    covered = encounters <= stored_last[group] if has_ids else np.zeros(n, dtype=bool)
+    new_values = np.where(covered[:, None], 0, values)
+    prior = _exclusive_cumsum(new_values, starts, group) + stored_totals[group]
+    if covered.any():
+        prior[covered] = _exclusive_cumsum(values, starts, group)[covered]
+
+    priors = np.empty_like(prior)
+    priors[order] = prior
+    priors = pd.DataFrame(priors, index=df.index, columns=PRIOR_COLUMNS).astype(PRIOR_DTYPES)
+
+    totals = pd.DataFrame(stored_totals + (np.add.reduceat(new_values, starts) if n else 0),
+                          index=pd.Index(patients[starts], name=HISTORY_KEY), columns=PRIOR_COLUMNS)
+    totals['last_encounter_id'] = np.maximum(stored_last, encounters[ends]) if has_ids else stored_last
+    return History(priors, totals, int(covered.sum()))
+
+
+def empty_history():
+    return pd.DataFrame(columns=HISTORY_COLUMNS, dtype=np.int64,
+                        index=pd.Index([], dtype=np.int64, name=HISTORY_KEY))
+
+
+def stored_prior_features(df, conn=None):
+    """prior_features of `df` on top of the totals stored in `conn` (None: no stored history).
+
+    `df` must hold every encounter of its patients in the extract; chunked
+    stages get there through SpilledPriors.
+    """
+    base = lookup_history(conn, df[HISTORY_KEY]) if conn is not None else None
+    return prior_features(df, base)
+
+
+class SpilledPriors:
+    """stored_prior_features of an extract read in chunks, with memory bounded by the partition size.
+
+    A patient's features depend on all of their earlier encounters,
+    wherever those fall in the file, so file-order chunks cannot be handled
+    one at a time. The SOURCE_COLUMNS of every chunk are spilled to a
+    temporary directory, split into partitions that each hold every
+    encounter of their patients (patient_nbr modulo the partition count),
+    and each partition goes through stored_prior_features on its own. The
+    features are then filed by row range for attach_priors, and the
+    per-patient totals kept for totals(). Partitions and row ranges hold
+    about max(chunksize, SPILL_PARTITION_ROWS) rows.
+    """
+
+    def __init__(self, chunks, conn=None, chunksize=100_000):
+        self._dir = tempfile.TemporaryDirectory(prefix='prior_features-')
+        self.part_rows = max(chunksize, SPILL_PARTITION_ROWS)
+        self.rows = self.covered = self.patients = 0
+        self.has_ids = self.labelled = None
+        self._range = (None, None)
+        with open(self._path('source'), 'wb') as f:
+            for chunk in chunks:
+                self._records(chunk).tofile(f)
+        n_parts = max(1, -(-self.rows // self.part_rows))
+        self._partition(n_parts)
+        for part in range(n_parts):
+            path = self._path(f'source-{part}')
+            if os.path.exists(path):
+                self._run(np.fromfile(path, SPILL_RECORD), conn)
+                os.remove(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._dir.cleanup()
+
+    def _path(self, name):
+        return os.path.join(self._dir.name, name + '.bin')
+
+    def _append(self, name, records):
+        with open(self._path(name), 'ab') as f:
+            records.tofile(f)
+
+    def _records(self, chunk):
+        if self.has_ids is None:
+            self.has_ids = 'encounter_id' in chunk.columns
+            self.labelled = 'readmitted' in chunk.columns
+        records = np.zeros(len(chunk), SPILL_RECORD)
+        records['row'] = np.arange(self.rows, self.rows + len(chunk))
+        records['patient_nbr'] = chunk[HISTORY_KEY].to_numpy(dtype=np.int64)
+        if self.has_ids:
+            records['encounter_id'] = chunk['encounter_id'].to_numpy(dtype=np.int64)
+        records['time_in_hospital'] = chunk['time_in_hospital'].to_numpy()
+        records['admission_source_id'] = chunk['admission_source_id'].to_numpy()
+        if self.labelled:
+            records['readmitted'] = (chunk['readmitted'] == '<30').to_numpy()
+        self.rows += len(chunk)
+        return records
+
+    def _partition(self, n_parts):
+        with open(self._path('source'), 'rb') as f:
+            while True:
+                block = np.fromfile(f, SPILL_RECORD, count=self.part_rows)
+                if not len(block):
+                    break
+                parts = block['patient_nbr'] % n_parts
+                order = np.argsort(parts, kind='stable')
+                bounds = np.searchsorted(parts[order], np.arange(n_parts + 1))
+                for part in np.flatnonzero(np.diff(bounds)):
+                    self._append(f'source-{part}', block[order[bounds[part]:bounds[part + 1]]])
+        os.remove(self._path('source'))
+
+    def _run(self, records, conn):
+        # Rows of a partition stay in file order, as prior_features expects without encounter ids
+        df = pd.DataFrame({HISTORY_KEY: records['patient_nbr'],
+                           'time_in_hospital': records['time_in_hospital'],
+                           'admission_source_id': records['admission_source_id']})
+        if self.has_ids:
+            df['encounter_id'] = records['encounter_id']
+        if self.labelled:
+            df['readmitted'] = pd.Categorical.from_codes(records['readmitted'], ['NO', '<30'])
+        history = stored_prior_features(df, conn)
+        priors = np.zeros(len(records), PRIOR_RECORD)
+        priors['row'] = records['row']
+        for col in PRIOR_COLUMNS:
+            priors[col] = history.priors[col].to_numpy()
+        ranges = priors['row'] // self.part_rows
+        for r in np.unique(ranges):
+            self._append(f'priors-{r}', priors[ranges == r])
+        totals = np.zeros(len(history.totals), TOTALS_RECORD)
+        totals[HISTORY_KEY] = history.totals.index.to_numpy()
+        for col in HISTORY_COLUMNS:
+            totals[col] = history.totals[col].to_numpy()
+        self._append('totals', totals)
+        self.covered += history.covered
+        self.patients += len(totals)
+
+    def _row_range(self, r):
+        if self._range[0] != r:
+            block = np.fromfile(self._path(f'priors-{r}'), PRIOR_RECORD)
+            self._range = (r, block[np.argsort(block['row'])])
+        return self._range[1]
+
+    def priors(self, start, stop):
+        """PRIOR_COLUMNS of file rows [start, stop)."""
+        blocks = []
+        for r in range(start // self.part_rows, -(-stop // self.part_rows)):
+            first = r * self.part_rows
+            blocks.append(self._row_range(r)[max(start, first) - first:stop - first])
+        block = np.concatenate(blocks) if blocks else np.zeros(0, PRIOR_RECORD)
+        return pd.DataFrame({col: block[col] for col in PRIOR_COLUMNS}).astype(PRIOR_DTYPES)
+
+    def totals(self):
+        """HISTORY_COLUMNS per patient after the extract, in frames of up to part_rows patients (at least one)."""
+        if not self.patients:
+            yield empty_history()
+            return
+        with open(self._path('totals'), 'rb') as f:
+            while True:
+                block = np.fromfile(f, TOTALS_RECORD, count=self.part_rows)
+                if not len(block):
+                    return
+                yield pd.DataFrame({col: block[col] for col in HISTORY_COLUMNS},
+                                   index=pd.Index(block[HISTORY_KEY], name=HISTORY_KEY))
+
+
+def attach_priors(chunks, spilled):
+    """Add the features of SpilledPriors `spilled` to consecutive chunks of the file it was computed from."""
+    start = 0
+    for chunk in chunks:
+        stop = start + len(chunk)
+        priors = spilled.priors(start, stop)
+        for col in PRIOR_COLUMNS:
+            chunk[col] = priors[col].to_numpy()
+        start = stop
+        yield chunk
+
+
+# --- hospital.db ---
+
+def open_history(db_path, read_only=True):
+    """Connection to a database with a patient_history table, or None if there is none."""
+    if not db_path or not os.path.exists(db_path):
+        return None
+    conn = (sqlite3.connect(f'file:{db_path}?mode=ro', uri=True, check_same_thread=False) if read_only
+            else sqlite3.connect(db_path))
+    if not has_history(conn):
+        conn.close()
+        return None
+    return conn
+
+
+def has_history(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                        (HISTORY_TABLE,)).fetchone() is not None
+
+
+def lookup_history(conn, patient_ids):
+    """Stored totals of `patient_ids`, indexed by patient_nbr; unknown patients are absent."""
+    ids = pd.unique(pd.Series(patient_ids).dropna().astype(np.int64)).tolist()
+    rows = []
+    select = f'SELECT {HISTORY_KEY}, {", ".join(HISTORY_COLUMNS)} FROM {HISTORY_TABLE} WHERE {HISTORY_KEY} IN '
+    for start in range(0, len(ids), LOOKUP_BATCH):
+        batch = ids[start:start + LOOKUP_BATCH]
+        rows += conn.execute(select + f'({", ".join("?" * len(batch))})', batch).fetchall()
+    if not rows:
+        return empty_history()
+    return pd.DataFrame(rows, columns=[HISTORY_KEY] + HISTORY_COLUMNS).set_index(HISTORY_KEY)
+
+
+def create_history_table(conn):
+    # INTEGER PRIMARY KEY makes patient_nbr the rowid: a lookup is one B-tree search
+    conn.execute(f'CREATE TABLE IF NOT EXISTS {HISTORY_TABLE} ({HISTORY_KEY} INTEGER PRIMARY KEY, '
+                 + ', '.join(f'{c} INTEGER NOT NULL' for c in HISTORY_COLUMNS) + ')')
+
+
+def _history_rows(totals):
+    return zip(totals.index.tolist(), *(totals[c].astype(np.int64).tolist() for c in HISTORY_COLUMNS))
+
+
+def load_history(conn, totals):
+    """Replace patient_history with `totals` (caller commits)."""
+    conn.execute(f'DROP TABLE IF EXISTS {HISTORY_TABLE}')
+    create_history_table(conn)
+    conn.executemany(f'INSERT INTO {HISTORY_TABLE} VALUES ({", ".join("?" * (len(HISTORY_COLUMNS) + 1))})',
+                     _history_rows(totals))
+
+
+def upsert_history(conn, totals):
+    """Fold updated per-patient `totals` into patient_history (caller commits).
+
+    Totals already include the stored ones, so a row replaces the stored
+    row, unless that row has seen a later encounter (an older extract
+    arriving late does not roll a patient back).
+    """
+    create_history_table(conn)
+    updates = ', '.join(f'{c} = excluded.{c}' for c in HISTORY_COLUMNS)
+    conn.executemany(
+        f'INSERT INTO {HISTORY_TABLE} ({HISTORY_KEY}, {", ".join(HISTORY_COLUMNS)}) '
+        f'VALUES ({", ".join("?" * (len(HISTORY_COLUMNS) + 1))}) '
+        f'ON CONFLICT({HISTORY_KEY}) DO UPDATE SET {updates} '
+        f'WHERE excluded.last_encounter_id > {HISTORY_TABLE}.last_encounter_id',
+        _history_rows(totals))
+
+
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def record_priors(conn, requests):
+    """Prior features for the encounters of each request (lists of raw encounter dicts), one lookup for all.
+
+    A request is scored as one input, the way batch scoring treats a file:
+    every encounter gets what prior_features gives it in a frame of the
+    request's encounters. Encounters the stored totals already include
+    count the patient's earlier encounters in the request only, and other
+    requests batched with it never count. Encounters without a usable
+    patient_nbr get zeros, like a first visit. Returns one dict per
+    encounter, in order.
+    """
+    patients = [[_as_int(r.get(HISTORY_KEY)) for r in records] for records in requests]
+    known = [p for ids in patients for p in ids if p is not None]
+    stored = lookup_history(conn, known) if conn is not None and known else empty_history()
+    totals = stored.to_dict('index')
+    out = []
+    for records, ids in zip(requests, patients):
+        rows = [i for i, p in enumerate(ids) if p is not None]
+        priors = [dict.fromkeys(PRIOR_COLUMNS, 0) for _ in records]
+        if len({ids[i] for i in rows}) < len(rows):
+            # A patient seen more than once: the cumulative sums of prior_features
+            for i, prior in zip(rows, _request_priors([records[i] for i in rows], stored)):
+                priors[i] = prior
+        else:
+            # One encounter per patient, where prior_features reduces to this lookup
+            for i in rows:
+                patient_totals = totals.get(ids[i])
+                encounter = _as_int(records[i].get('encounter_id'))
+                if patient_totals is not None and (encounter is None
+                                                   or encounter > patient_totals['last_encounter_id']):
+                    priors[i] = {c: int(patient_totals[c]) for c in PRIOR_COLUMNS}
+        out.extend(priors)
+    return out
+
+
+def _request_priors(records, stored):
+    df = pd.DataFrame({
+        HISTORY_KEY: [_as_int(r.get(HISTORY_KEY)) for r in records],
+        'encounter_id': [_as_int(r.get('encounter_id')) for r in records],
+        # Values features() rejects count as nothing here
+        'time_in_hospital': pd.to_numeric(pd.Series([r.get('time_in_hospital') for r in records]),
+                                          errors='coerce').fillna(0).to_numpy(),
+        'admission_source_id': pd.to_numeric(pd.Series([r.get('admission_source_id') for r in records]),
+                                             errors='coerce').to_numpy(),
+    })
+    if any('readmitted' in r for r in records):
+        df['readmitted'] = [r.get('readmitted') for r in records]
+    if df['encounter_id'].isna().any():
+        # As for an input without encounter ids: input order, nothing covered
+        df = df.drop(columns='encounter_id')
+    return prior_features(df, stored).priors.astype(np.int64).to_dict('records')
@@ -0,0 +1,299 @@
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import cli
+from instrument import METRICS_ENV, PROFILE_MODES, RUN_ENV, new_run_id
+from storage import FORMATS, DEFAULT_FORMAT
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SRC_DIR)
+STATE_FILE = os.path.join('data', '.pipeline_state.json')
+LOG_DIR = os.path.join('output', 'logs')
+METRICS_FILE = os.path.join(LOG_DIR, 'metrics.jsonl')
+
+# Left out of stage keys: every stage imports it for metrics and profiling,
+# which do not change what a stage writes
+UNHASHED_MODULES = ['instrument.py']
+
+PLOT_FILES = ['1_race_distribution.png', '2_avg_time_hospital_gender.png', '3_readmission_by_age.png',
+              '4_top_diagnosis.png', '5_lab_procedures_readmission.png', '6_insulin_distribution.png',
+              '7_a1c_distribution.png', '8_max_glucose_distribution.png']
+
+
+def build_stages(fmt=DEFAULT_FORMAT):
+    """The pipeline DAG. Paths are relative to the project root.
+
+    A stage depends on another when it reads one of that stage's outputs.
+    `stdout` captures the console output of stages whose result is a report.
+    """
+    ext = FORMATS[fmt]
+    processed = f'data/processed_data{ext}'
+    features = f'data/final_features{ext}'
+    history = f'data/patient_history{ext}'
+    return {
+        'download': dict(script='download_data.py', inputs=[], outputs=['data/diabetic_data.csv']),
+        'preprocess': dict(script='preprocessing.py', args=['--format', fmt],
+                           inputs=['data/diabetic_data.csv'], outputs=[processed, history]),
+        'features': dict(script='features.py', args=['--format', fmt],
+                         inputs=[processed], outputs=[features]),
+        'train': dict(script='modeling.py', args=['--format', fmt], inputs=[features],
+                      outputs=['output/logistic_regression_model.pkl', 'output/random_forest_model.pkl',
+                               'output/feature_encoder.pkl', 'output/model_evaluation_report.txt']),
+        'db': dict(script='create_db.py', args=['--format', fmt],
+                   inputs=[processed, history], outputs=['data/hospital.db']),
+        'queries': dict(script='run_10_queries.py', inputs=['data/hospital.db'],
+                        outputs=['output/query_results.txt'], stdout='output/query_results.txt'),
+        'plots': dict(script='visualize_data.py', inputs=['data/hospital.db'],
+                      outputs=[f'output/{name}' for name in PLOT_FILES]),
+    }
+
+
+def dependencies(stages):
+    producers = {out: name for name, stage in stages.items() for out in stage['outputs']}
+    return {name: sorted({producers[i] for i in stage['inputs'] if i in producers} - {name})
+            for name, stage in stages.items()}
+
+
+def _is_main_guard(node):
+    return (isinstance(node, ast.If) and isinstance(node.test, ast.Compare)
+            and isinstance(node.test.left, ast.Name) and node.test.left.id == '__name__')
+
+
+def module_files(script, src_dir=SRC_DIR):
+    """The script plus every src/ module it imports, transitively.
+
+    Imports under `if __name__ == "__main__":` are not followed: scripts
+    hand their command line to cli.py there, which would otherwise pull
+    every module into every stage. stage_key hashes the part of cli.py
+    that wires up the stage's command (command_wiring).
+    """
+    seen = []
+    todo = [os.path.join(src_dir, script)]
+    while todo:
+        path = todo.pop()
+        if path in seen:
+            continue
+        seen.append(path)
+        with open(path) as f:
+            tree = ast.parse(f.read(), filename=path)
+        tree.body = [node for node in tree.body if not _is_main_guard(node)]
+        for node in ast.walk(tree):
+            names = []
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module]
+            for name in names:
+                candidate = os.path.join(src_dir, name.split('.')[0] + '.py')
+                if os.path.exists(candidate):
+                    todo.append(candidate)
+    return sorted(seen)
+
+
+class FileHasher:
+    """sha256 of file contents, cached by (size, mtime) so unchanged large files are not re-read."""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def __call__(self, path):
+        st = os.stat(path)
+        stamp = [st.st_size, st.st_mtime_ns]
+        cached = self.cache.get(path)
+        if cached and cached['stamp'] == stamp:
+            return cached['sha256']
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        self.cache[path] = {'stamp': stamp, 'sha256': digest.hexdigest()}
+        return digest.hexdigest()
+
+
+def command_of(script):
+    """The cli.py command a stage script hands its command line to."""
+    module = os.path.splitext(script)[0]
+    return next(name for name, command in cli.COMMANDS.items() if command.module == module)
+
+
+def command_wiring(name, argv=(), src_dir=SRC_DIR):
+    """What cli.py contributes to a run of command `name` with `argv`.
+
+    Returns the options as parsed (defaults included, instrumentation
+    left out) and the source of the command's argument and run functions
+    plus the cli.py helpers and constants they use, transitively. Edits to
+    other commands leave both unchanged. Imports inside the run function
+    are not followed: they are the stage's own module, whose imports
+    module_files covers.
+    """
+    command = cli.COMMANDS[name]
+    options = vars(cli.build_parser().parse_args([name] + list(argv)))
+    for key in vars(cli._instrument_parser().parse_args([])):
+        options.pop(key)
+
+    with open(os.path.join(src_dir, 'cli.py')) as f:
+        source = f.read()
+    definitions = {}
+    for node in ast.parse(source).body:
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            definitions[node.name] = node
+        elif isinstance(node, ast.Assign):
+            definitions.update((t.id, node) for t in node.targets if isinstance(t, ast.Name))
+    used = []
+    todo = [command.add_arguments.__name__, command.run.__name__]
+    while todo:
+        fn = todo.pop()
+        if fn in used:
+            continue
+        used.append(fn)
+        todo.extend(node.id for node in ast.walk(definitions[fn])
+                    if isinstance(node, ast.Name) and node.id in definitions)
+    return options, {fn: ast.get_source_segment(source, definitions[fn]) for fn in sorted(used)}
+
+
+def stage_key(stage, file_hash):
+    """Content address of a stage run: its input files, code and parameters."""
+    options, wiring = command_wiring(command_of(stage['script']), stage.get('args', []))
+    payload = {
+        'inputs': {p: file_hash(p) for p in stage['inputs']},
+        'code': {os.path.relpath(p, ROOT_DIR): file_hash(p) for p in module_files(stage['script'])
+                 if os.path.basename(p) not in UNHASHED_MODULES},
+        'cli': wiring,
+        'options': options,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def load_state(path=STATE_FILE):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {'stages': {}, 'files': {}}
+
+
+def save_state(state, path=STATE_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def run_stage(name, stage, metrics=METRICS_FILE, profile_mode=None, run_id=None):
+    """Run one stage script; its console output goes to `stdout` or output/logs/<stage>.log.
+
+    Per-step metrics are appended to `metrics` (see instrument.py). With
+    `profile_mode`, the stage is also profiled into output/logs/<stage>.prof
+    (cProfile) or <stage>.collapsed (sampled stacks).
+    """
+    cmd = [sys.executable, os.path.join(SRC_DIR, stage['script'])] + stage.get('args', [])
+    if profile_mode:
+        ext = '.prof' if profile_mode == 'cprofile' else '.collapsed'
+        cmd += ['--profile', os.path.join(LOG_DIR, name + ext), '--profile-mode', profile_mode]
+    env = dict(os.environ)
+    if metrics:
+        env[METRICS_ENV] = metrics
+        env[RUN_ENV] = run_id or new_run_id()
+    log_path = stage.get('stdout') or os.path.join(LOG_DIR, f'{name}.log')
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    start = time.perf_counter()
+    with open(log_path, 'w') as out:
+        proc = subprocess.run(cmd, stdout=out, stderr=subprocess.PIPE, text=True, env=env)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Stage '{name}' failed (exit {proc.returncode}):\n{proc.stderr}")
+    return time.perf_counter() - start
+
+
+def run_pipeline(fmt=DEFAULT_FORMAT, targets=None, force=(), jobs=None, dry_run=False,
+                 metrics=METRICS_FILE, profile=None, profile_mode='cprofile'):
+    """Run the stages needed for `targets` (default: all), skipping up-to-date ones.
+
+    A stage is up to date when its outputs exist and the hash of its inputs,
+    code and arguments matches the last successful run. Stages whose
+    dependencies are satisfied run concurrently. `profile` names a stage to
+    profile (it then always runs, as profiling a skipped stage shows nothing).
+    """
+    stages = build_stages(fmt)
+    deps = dependencies(stages)
+    selected = set()
+    todo = list(targets or stages)
+    while todo:
+        name = todo.pop()
+        if name not in selected:
+            selected.add(name)
+            todo.extend(deps[name])
+
+    state = load_state()
+    file_hash = FileHasher(state['files'])
+    run_id = new_run_id()
+    done, stale, running = set(), set(), {}
+    remaining = {name for name in stages if name in selected}
+
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+        while remaining or running:
+            for name in sorted(remaining):
+                if any(d not in done for d in deps[name]):
+                    continue
+                remaining.discard(name)
+                stage = stages[name]
+                upstream_stale = any(d in stale for d in deps[name])
+                if dry_run and upstream_stale:
+                    # Inputs will change, so the current key says nothing
+                    print(f"[{name}] would run")
+                    stale.add(name)
+                    done.add(name)
+                    continue
+                key = stage_key(stage, file_hash)
+                fresh = (state['stages'].get(name) == key and name not in force and name != profile
+                         and all(os.path.exists(o) for o in stage['outputs']))
+                if fresh or dry_run:
+                    print(f"[{name}] {'up to date' if fresh else 'would run'}")
+                    if not fresh:
+                        stale.add(name)
+                    done.add(name)
+                    continue
+                print(f"[{name}] running {stage['script']}...")
+                mode = profile_mode if name == profile else None
+                running[pool.submit(run_stage, name, stage, metrics, mode, run_id)] = (name, key)
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, key = running.pop(future)
+                elapsed = future.result()
+                state['stages'][name] = key
+                save_state(state)
+                print(f"[{name}] done in {elapsed:.1f}s")
+                done.add(name)
+    save_state(state)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the pipeline, skipping stages whose inputs, code and "
+                                                 "parameters are unchanged since their last run.")
+    parser.add_argument('targets', nargs='*', help="Stages to bring up to date (default: all)")
+    parser.add_argument('--format', choices=list(FORMATS), default=DEFAULT_FORMAT,
+                        help="File format for intermediate tables (default: %(default)s)")
+    parser.add_argument('--force', nargs='*', default=[], help="Re-run these stages even if up to date")
+    parser.add_argument('--jobs', '-j', type=int, default=None, help="Stages to run concurrently")
+    parser.add_argument('--dry-run', action='store_true', help="Only report which stages would run")
+    parser.add_argument('--metrics', default=METRICS_FILE,
+                        help="JSON-lines file for per-step metrics of every stage (default: %(default)s; "
+                             "'' to disable)")
+    parser.add_argument('--profile', metavar='STAGE', default=None,
+                        help="Profile this stage into output/logs/<stage>.prof (or .collapsed)")
+    parser.add_argument('--profile-mode', choices=PROFILE_MODES, default='cprofile')
+    args = parser.parse_args()
+    unknown = set(args.targets) | set(args.force) | ({args.profile} if args.profile else set())
+    unknown -= set(build_stages(args.format))
+    if unknown:
+        parser.error(f"unknown stages: {sorted(unknown)}")
+    run_pipeline(args.format, args.targets, set(args.force), args.jobs, args.dry_run,
+                 args.metrics, args.profile, args.profile_mode)
@@ -1,19 +1,286 @@
+import sys
 import pandas as pd
 import numpy as np
 import os
+from concurrent.futures import ProcessPoolExecutor
 
-def preprocess_data(input_path, output_path):
-    print(f"Loading data from {input_path}...")
-    df = pd.read_csv(input_path)
+from instrument import step
+from parallel import ordered_imap
+from patient_history import (HISTORY_KEY, PRIOR_COLUMNS, PRIOR_DTYPES, SOURCE_COLUMNS, SpilledPriors,
+                             attach_priors, open_history, stored_prior_features)
+from storage import TableWriter, narrow_integers, parse_dtypes, write_table
+
+# --- Recoding tables ---
+# The grouping rules are kept as data so they can be evaluated column-wise
+# instead of calling a Python function per row.
+
+# Discharge Disposition: Group home-related, transferred, and other/expired
+# 1: Discharged to home
+# 6: Discharged/transferred to home with home health service
+# 8: Discharged/transferred to home under care of Home IV provider
+# 13: Hospice/home
+# 19, 20, 21: Expired (should probably be excluded if we only want to predict survival-readmission, 
+# but for a simple model we can group them as "Not Home")
+DISCHARGE_GROUPS = {
+    'discharged_to_home': [1, 6, 8],
+    'expired': [11, 19, 20, 21],
+    'transferred_to_facility': [3, 4, 5, 14, 22, 23, 24],
+}
+
+ADMISSION_SOURCE_GROUPS = {
+    'referral': [1, 2, 3],
+    'transfer': [4, 5, 6, 10, 22, 25],
+    'emergency': [7],
+}
+
+# ICD-9 ranges as (low, high, high_inclusive, category). Single codes such as
+# 785 are written as one-point ranges. Ranges must not overlap.
+ICD9_RANGES = [
+    (140, 239, True, 'neoplasms'),
+    (250, 251, False, 'diabetes'), # Exact 250.xx is diabetes
+    (390, 459, True, 'circulatory'),
+    (460, 519, True, 'respiratory'),
+    (520, 579, True, 'digestive'),
+    (580, 629, True, 'genitourinary'),
+    (710, 739, True, 'musculoskeletal'),
+    (785, 785, True, 'circulatory'),
+    (786, 786, True, 'respiratory'),
+    (787, 787, True, 'digestive'),
+    (788, 788, True, 'genitourinary'),
+    (800, 999, True, 'injury'),
+]
+
+DEFAULT_GROUP = 'other'
+DEFAULT_ICD9_CATEGORY = 'others'
+
+# --- Parse-time dtype plan for raw encounter extracts (diabetic_data.csv) ---
+# Without a plan read_csv infers int64 for every count and object for every
+# string. Low-cardinality strings are read straight into categoricals and
+# bounded counts/IDs into the smallest integer type that holds them. Those are
+# parsed as int64 and narrowed after a range check (storage.narrow_integers),
+# since read_csv would silently wrap a value out of range around.
+MEDICATION_COLUMNS = [
+    'metformin', 'repaglinide', 'nateglinide', 'chlorpropamide', 'glimepiride',
+    'acetohexamide', 'glipizide', 'glyburide', 'tolbutamide', 'pioglitazone',
+    'rosiglitazone', 'acarbose', 'miglitol', 'troglitazone', 'tolazamide',
+    'examide', 'citoglipton', 'insulin', 'glyburide-metformin', 'glipizide-metformin',
+    'glimepiride-pioglitazone', 'metformin-rosiglitazone', 'metformin-pioglitazone',
+]
+CATEGORY_COLUMNS = (
+    ['race', 'gender', 'age', 'weight', 'payer_code', 'medical_specialty',
+     'diag_1', 'diag_2', 'diag_3', 'max_glu_serum', 'A1Cresult']
+    + MEDICATION_COLUMNS
+    + ['change', 'diabetesMed', 'readmitted']
+)
+INTEGER_DTYPES = {
+    'admission_type_id': 'int8',
+    'discharge_disposition_id': 'int8',
+    'admission_source_id': 'int8',
+    'time_in_hospital': 'int8',
+    'num_lab_procedures': 'int16',
+    'num_procedures': 'int8',
+    'num_medications': 'int16',
+    'number_outpatient': 'int16',
+    'number_emergency': 'int16',
+    'number_inpatient': 'int16',
+    'number_diagnoses': 'int8',
+}
+RAW_DTYPES = {**{c: 'category' for c in CATEGORY_COLUMNS}, **INTEGER_DTYPES}
+# Missing values are written as '?' in the extract (pandas' default NA
+# strings, e.g. 'None', still apply on top)
+RAW_NA_VALUES = ['?']
+# Dropped by clean_encounters without being looked at, so never parsed.
+# The prior-utilization features (patient_history.py) need patient_nbr.
+# encounter_id is not a feature either, but it is kept through to the
+# patients table so scores can be joined back to their encounters.
+UNUSED_RAW_COLUMNS = ['patient_nbr', 'admission_type_id']
+
+# Encounters missing any of these are dropped by clean_encounters (a small
+# minority). Scoring reports them with MISSING_CRITICAL as the reason
+# instead of a score, in batch and online alike.
+CRITICAL_COLUMNS = ['race', 'gender', 'diag_1']
+MISSING_CRITICAL = 'missing required field (race, gender or diag_1)'
+
+# The same plan for the processed table when it is kept as CSV (Parquet and
+# Feather store the dtypes themselves). RAW_ONLY_COLUMNS are the ones
+# clean_encounters drops or replaces with a recoded column.
+RAW_ONLY_COLUMNS = ['weight', 'payer_code', 'medical_specialty',
+                    'admission_type_id', 'discharge_disposition_id', 'admission_source_id',
+                    'diag_1', 'diag_2', 'diag_3', 'readmitted']
+PROCESSED_DTYPES = {
+    'encounter_id': 'int64',
+    **{c: t for c, t in RAW_DTYPES.items() if c not in RAW_ONLY_COLUMNS},
+    'discharge_disposition_group': 'category',
+    'admission_source_group': 'category',
+    'diag_1_cat': 'category',
+    'diag_2_cat': 'category',
+    'diag_3_cat': 'category',
+    'readmitted_binary': 'int8',
+    **PRIOR_DTYPES,
+}
+# Every column of the processed table, for stages reading it with read_table(columns=)
+PROCESSED_COLUMNS = list(PROCESSED_DTYPES)
+
+
+def read_encounters(path, chunksize=None, keep=(), columns=None):
+    """pd.read_csv of a raw encounter extract with the dtype plan applied.
+
+    '?' is parsed as NA and UNUSED_RAW_COLUMNS are skipped unless listed in
+    `keep`; `columns` reads only those columns instead. Columns missing from
+    the file are simply not read, so extracts without e.g. 'readmitted' load
+    the same way. A count or ID out of range of its planned integer type
+    raises ValueError.
+    """
+    skip = set(UNUSED_RAW_COLUMNS) - set(keep)
+    wanted = None if columns is None else set(columns)
+    reader = pd.read_csv(path, chunksize=chunksize, dtype=parse_dtypes(RAW_DTYPES), na_values=RAW_NA_VALUES,
+                         usecols=lambda c: c not in skip if wanted is None else c in wanted)
+    if chunksize is None:
+        return narrow_integers(reader, RAW_DTYPES)
+    return (narrow_integers(chunk, RAW_DTYPES) for chunk in reader)
+
+
+def recode_ids(ids, groups, default=DEFAULT_GROUP):
+    """Map integer IDs to group labels through a dense lookup array."""
+    labels = np.array(list(groups) + [default], dtype=object)
+    default_code = len(labels) - 1
+    
+    max_id = max(v for members in groups.values() for v in members)
+    lookup = np.full(max_id + 1, default_code, dtype=np.int8)
+    for code, members in enumerate(groups.values()):
+        lookup[members] = code
     
-    # 1. Handle missing values represented by '?'
-    df.replace('?', np.nan, inplace=True)
+    values = ids.to_numpy(dtype=np.int64)
+    in_range = (values >= 0) & (values <= max_id)
+    codes = np.full(len(values), default_code, dtype=np.int8)
+    codes[in_range] = lookup[values[in_range]]
+    return pd.Series(labels[codes], index=ids.index)
+
+
+def recode_icd9(codes, ranges=ICD9_RANGES, default=DEFAULT_ICD9_CATEGORY):
+    """Bin ICD-9 codes into clinical categories in one vectorized pass.
     
-    # Analyze missingness
-    missing_pct = df.isnull().mean() * 100
+    V/E supplementary codes and anything non-numeric fall into `default`.
+    Codes are factorized first, so the string parsing and range lookup only
+    run over the few hundred distinct codes rather than every row.
+    """
+    lows = np.array([r[0] for r in ranges], dtype=np.float64)
+    highs = np.array([r[1] for r in ranges], dtype=np.float64)
+    inclusive = np.array([r[2] for r in ranges])
+    labels = np.array([r[3] for r in ranges] + [default], dtype=object)
+    order = np.argsort(lows)
+    lows, highs, inclusive = lows[order], highs[order], inclusive[order]
+    labels = np.concatenate([labels[:-1][order], labels[-1:]])
+    default_code = len(labels) - 1
+    
+    row_codes, uniques = pd.factorize(codes)
+    # Plain object values, whether the codes came in as strings or categoricals
+    uniques = pd.Series(np.asarray(uniques, dtype=object))
+    as_str = uniques.astype(str)
+    supplementary = (as_str.str.startswith('V') | as_str.str.startswith('E')).to_numpy()
+    values = pd.to_numeric(uniques, errors='coerce').to_numpy(dtype=np.float64, copy=True)
+    values[supplementary] = np.nan
+    
+    # Candidate range is the last one starting at or below the value
+    idx = np.searchsorted(lows, values, side='right') - 1
+    safe_idx = np.clip(idx, 0, len(lows) - 1)
+    hi = highs[safe_idx]
+    inside = (idx >= 0) & np.where(inclusive[safe_idx], values <= hi, values < hi)
+    unique_labels = np.append(np.where(inside, safe_idx, default_code), default_code)
+    
+    # Missing values are factorized to -1, which picks the trailing default
+    return pd.Series(labels[unique_labels[row_codes]], index=codes.index)
+
+
+# --- Row-wise reference implementations ---
+# These are the original per-value rules. The pipeline uses recode_ids /
+# recode_icd9; these stay as the ground truth for parity checks and benchmarks.
+
+def group_discharge_disposition(val):
+    val = int(val)
+    if val in [1, 6, 8]:
+        return 'discharged_to_home'
+    elif val in [11, 19, 20, 21]:
+        return 'expired'
+    elif val in [3, 4, 5, 14, 22, 23, 24]:
+        return 'transferred_to_facility'
+    else:
+        return 'other'
+
+
+def group_admission_source(val):
+    val = int(val)
+    if val in [1, 2, 3]:
+        return 'referral'
+    elif val in [4, 5, 6, 10, 22, 25]:
+        return 'transfer'
+    elif val == 7:
+        return 'emergency'
+    else:
+        return 'other'
+
+
+def categorize_icd9(code):
+    if pd.isnull(code):
+        return 'others'
+    
+    # Remove any alphanumeric prefixes (like 'V' or 'E') for primary numeric check
+    # But keep track for specific V/E categories if needed
+    str_code = str(code)
+    if str_code.startswith('V') or str_code.startswith('E'):
+        return 'others'
+        
+    try:
+        val = float(code)
+    except ValueError:
+        return 'others'
+        
+    if 390 <= val <= 459 or val == 785:
+        return 'circulatory'
+    elif 460 <= val <= 519 or val == 786:
+        return 'respiratory'
+    elif 520 <= val <= 579 or val == 787:
+        return 'digestive'
+    elif 250 <= val < 251: # Exact 250.xx is diabetes
+        return 'diabetes'
+    elif 800 <= val <= 999:
+        return 'injury'
+    elif 710 <= val <= 739:
+        return 'musculoskeletal'
+    elif 580 <= val <= 629 or val == 788:
+        return 'genitourinary'
+    elif 140 <= val <= 239:
+        return 'neoplasms'
+    else:
+        return 'others'
+
+
+def report_missingness(null_counts, n_rows):
+    missing_pct = null_counts / n_rows * 100
     print("Missing values percentage per column:")
     print(missing_pct[missing_pct > 0])
+
+
+def memory_report(before, after):
+    """Bytes per column of two frames (e.g. inferred vs planned dtypes), largest saving first."""
+    report = pd.DataFrame({
+        'dtype_before': before.dtypes.astype(str),
+        'bytes_before': before.memory_usage(index=False, deep=True),
+        'dtype_after': after.dtypes.astype(str),
+        'bytes_after': after.memory_usage(index=False, deep=True),
+    })
+    report['bytes_after'] = report['bytes_after'].fillna(0).astype(np.int64)
+    report['dtype_after'] = report['dtype_after'].fillna('(not loaded)')
+    report['saved'] = report['bytes_before'] - report['bytes_after']
+    return report.sort_values('saved', ascending=False)
+
+
+def clean_encounters(df):
+    """Stateless cleaning/recoding of a raw encounter frame ('?' already NaN).
     
+    Every step is row-local, so it gives the same result on any slice of the
+    input as on the whole file.
+    """
     # Drop columns with very high missingness
     # Weight is ~97% missing, payer_code ~40% (often irrelevant for clinical prediction), 
     # medical_specialty ~49% (can be useful but highly sparse).
@@ -21,97 +288,180 @@ def preprocess_data(input_path, output_path):
     df.drop(columns=cols_to_drop, inplace=True, errors='ignore')
     
     # Drop rows with missing values in critical columns (minority of data)
-    df.dropna(subset=['race', 'gender', 'diag_1'], inplace=True)
+    df.dropna(subset=CRITICAL_COLUMNS, inplace=True)
     
     # 2. Group and re-categorize 'Admission Source' and 'Discharge Disposition'
-    # Grouping IDs based on clinical/administrative similarity
-    
-    # Discharge Disposition: Group home-related, transferred, and other/expired
-    # 1: Discharged to home
-    # 6: Discharged/transferred to home with home health service
-    # 8: Discharged/transferred to home under care of Home IV provider
-    # 13: Hospice/home
-    # 19, 20, 21: Expired (should probably be excluded if we only want to predict survival-readmission, 
-    # but for a simple model we can group them as "Not Home")
-    
-    def group_discharge_disposition(val):
-        val = int(val)
-        if val in [1, 6, 8]:
-            return 'discharged_to_home'
-        elif val in [11, 19, 20, 21]:
-            return 'expired'
-        elif val in [3, 4, 5, 14, 22, 23, 24]:
-            return 'transferred_to_facility'
-        else:
-            return 'other'
-            
-    df['discharge_disposition_group'] = df['discharge_disposition_id'].apply(group_discharge_disposition)
-    
-    # Admission Source
-    def group_admission_source(val):
-        val = int(val)
-        if val in [1, 2, 3]:
-            return 'referral'
-        elif val in [4, 5, 6, 10, 22, 25]:
-            return 'transfer'
-        elif val == 7:
-            return 'emergency'
-        else:
-            return 'other'
-            
-    df['admission_source_group'] = df['admission_source_id'].apply(group_admission_source)
+    # Grouping IDs based on clinical/administrative similarity (see the
+    # DISCHARGE_GROUPS / ADMISSION_SOURCE_GROUPS tables above)
+    df['discharge_disposition_group'] = recode_ids(df['discharge_disposition_id'], DISCHARGE_GROUPS)
+    df['admission_source_group'] = recode_ids(df['admission_source_id'], ADMISSION_SOURCE_GROUPS)
     
     # 3. Handle high-cardinality categorical features: Diagnosis codes (ICD-9)
-    def categorize_icd9(code):
-        if pd.isnull(code):
-            return 'others'
-        
-        # Remove any alphanumeric prefixes (like 'V' or 'E') for primary numeric check
-        # But keep track for specific V/E categories if needed
-        str_code = str(code)
-        if str_code.startswith('V') or str_code.startswith('E'):
-            return 'others'
-            
-        try:
-            val = float(code)
-        except ValueError:
-            return 'others'
-            
-        if 390 <= val <= 459 or val == 785:
-            return 'circulatory'
-        elif 460 <= val <= 519 or val == 786:
-            return 'respiratory'
-        elif 520 <= val <= 579 or val == 787:
-            return 'digestive'
-        elif 250 <= val < 251: # Exact 250.xx is diabetes
-            return 'diabetes'
-        elif 800 <= val <= 999:
-            return 'injury'
-        elif 710 <= val <= 739:
-            return 'musculoskeletal'
-        elif 580 <= val <= 629 or val == 788:
-            return 'genitourinary'
-        elif 140 <= val <= 239:
-            return 'neoplasms'
-        else:
-            return 'others'
-
-    df['diag_1_cat'] = df['diag_1'].apply(categorize_icd9)
-    df['diag_2_cat'] = df['diag_2'].apply(categorize_icd9)
-    df['diag_3_cat'] = df['diag_3'].apply(categorize_icd9)
+    for col in ['diag_1', 'diag_2', 'diag_3']:
+        df[f'{col}_cat'] = recode_icd9(df[col])
     
     # 4. Target Variable: Readmitted < 30 days
-    # Original values: '<30', '>30', 'NO'
-    df['readmitted_binary'] = df['readmitted'].apply(lambda x: 1 if x == '<30' else 0)
+    # Original values: '<30', '>30', 'NO'. Absent in extracts that are only scored.
+    if 'readmitted' in df.columns:
+        df['readmitted_binary'] = (df['readmitted'] == '<30').astype(np.int8)
     
-    # Drop original ID columns to avoid leakage/redundancy
-    df.drop(columns=['encounter_id', 'patient_nbr', 'admission_type_id', 
+    # Drop original ID columns to avoid leakage/redundancy (encounter_id stays as
+    # the row key; build_features' callers leave it out of the model inputs)
+    df.drop(columns=['patient_nbr', 'admission_type_id', 
                      'discharge_disposition_id', 'admission_source_id',
-                     'diag_1', 'diag_2', 'diag_3', 'readmitted'], inplace=True)
+                     'diag_1', 'diag_2', 'diag_3', 'readmitted'], inplace=True, errors='ignore')
+    return df
+
+
+def _clean_chunk(chunk):
+    # Worker entry point for streaming mode: returns the cleaned rows plus the
+    # pre-cleaning null counts so the parent can build the missingness report.
+    with step('clean_chunk', rows_in=len(chunk)) as s:
+        null_counts = chunk.isnull().sum()
+        n_rows = len(chunk)
+        cleaned = clean_encounters(chunk)
+        s.rows_out = len(cleaned)
+    return cleaned, null_counts, n_rows
+
+
+def prior_utilization(source, history_db=None, history_path=None):
+    """Prior-utilization features of raw encounters `source` (see patient_history.py).
+
+    Starts from the patient_history totals in `history_db` when given and
+    it has them. With `history_path`, the updated per-patient totals are
+    written there for create_db.py to load into hospital.db. Returns the
+    features, aligned with `source`.
+    """
+    with step('prior_features', rows_in=len(source)) as s:
+        conn = open_history(history_db)
+        try:
+            history = stored_prior_features(source, conn)
+        finally:
+            if conn is not None:
+                conn.close()
+        s.rows_out = len(history.totals)
+    _report_priors(history_db, conn, history.covered)
+    if history_path:
+        with step('write_history', rows_in=len(history.totals)) as s:
+            write_table(history.totals.reset_index(), history_path)
+            s.wrote(history_path)
+        print(f"Saved running totals of {len(history.totals):,} patients to {history_path}")
+    return history.priors
+
+
+def streamed_prior_utilization(path, chunksize, history_db=None, history_path=None):
+    """prior_utilization of the raw extract at `path`, read `chunksize` rows at a time.
+
+    Returns the SpilledPriors for attach_priors to hand each chunk of a
+    second pass its features; the caller closes it.
+    """
+    with step('prior_features', chunksize=chunksize) as s:
+        conn = open_history(history_db)
+        try:
+            source = read_encounters(path, chunksize=chunksize, columns=SOURCE_COLUMNS)
+            spilled = SpilledPriors(source, conn, chunksize)
+        finally:
+            if conn is not None:
+                conn.close()
+        s.rows_in, s.rows_out = spilled.rows, spilled.patients
+    _report_priors(history_db, conn, spilled.covered)
+    if history_path:
+        with step('write_history', rows_in=spilled.patients) as s, TableWriter(history_path) as writer:
+            for totals in spilled.totals():
+                writer.write(totals.reset_index())
+            s.wrote(history_path)
+        print(f"Saved running totals of {spilled.patients:,} patients to {history_path}")
+    return spilled
+
+
+def _report_priors(history_db, conn, covered):
+    if history_db and conn is None:
+        print(f"No patient history in {history_db}; prior features count the encounters of this input only")
+    if covered:
+        print(f"{covered:,} encounters are already in {history_db}; "
+              f"their prior features count earlier encounters of this input only")
+
+
+def preprocess_data(input_path, output_path, history_path, history_db=None, chunksize=None, n_workers=None):
+    if chunksize:
+        return preprocess_data_streaming(input_path, output_path, history_path, history_db, chunksize, n_workers)
     
-    print(f"Preprocessing complete. Shape: {df.shape}")
-    df.to_csv(output_path, index=False)
+    with step('preprocess_data') as total:
+        print(f"Loading data from {input_path}...")
+        with step('load') as s:
+            # 1. Missing values represented by '?' are read as NaN (see RAW_DTYPES
+            # for the rest of the dtype plan)
+            df = read_encounters(input_path, keep=[HISTORY_KEY])
+            s.read(input_path)
+            s.rows_out = len(df)
+        print(f"Loaded {df.shape[0]:,} rows x {df.shape[1]} columns "
+              f"({df.memory_usage(deep=True).sum() / 2**20:.1f} MB in memory)")
+        total.rows_in = len(df)
+        total.read(input_path)
+        
+        # Analyze missingness
+        report_missingness(df.isnull().sum(), len(df))
+        
+        # Before cleaning, which drops the IDs and the rows it cannot use
+        # (those still count as earlier encounters)
+        priors = prior_utilization(df, history_db, history_path)
+        for col in PRIOR_COLUMNS:
+            df[col] = priors[col]
+        
+        with step('clean', rows_in=len(df)) as s:
+            df = clean_encounters(df)
+            s.rows_out = len(df)
+        
+        print(f"Preprocessing complete. Shape: {df.shape}")
+        with step('write', rows_in=len(df)) as s:
+            write_table(df, output_path)
+            s.wrote(output_path)
+        total.rows_out = len(df)
+        total.wrote(output_path)
+        print(f"Saved processed data to {output_path}")
+
+
+def preprocess_data_streaming(input_path, output_path, history_path, history_db=None, chunksize=100_000,
+                              n_workers=None):
+    """Chunked variant of preprocess_data for inputs larger than memory.
+    
+    Chunks are cleaned on a process pool and written in input order. At most
+    `2 * n_workers` chunks are in flight, so peak memory depends on the chunk
+    size rather than the file size. The prior-utilization features need a
+    patient's encounters in order, wherever they fall in the file, so they
+    are computed first, by a chunked pass over the SOURCE_COLUMNS that
+    sorts them on disk (SpilledPriors), and handed to each chunk.
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    print(f"Streaming data from {input_path} in chunks of {chunksize:,} rows ({n_workers} workers)...")
+    
+    null_counts = None
+    n_rows_in = 0
+    n_rows_out = 0
+    n_cols = 0
+    with step('preprocess_data_streaming', chunksize=chunksize, workers=n_workers) as total:
+        # The dtype plan also gives every chunk the same dtypes, e.g. diagnosis
+        # codes stay text whether or not a chunk happens to contain V/E codes.
+        with streamed_prior_utilization(input_path, chunksize, history_db, history_path) as priors, \
+                ProcessPoolExecutor(max_workers=n_workers) as pool, TableWriter(output_path) as writer:
+            reader = attach_priors(read_encounters(input_path, chunksize=chunksize), priors)
+            for cleaned, chunk_nulls, chunk_rows in ordered_imap(pool, _clean_chunk, reader, 2 * n_workers):
+                null_counts = chunk_nulls if null_counts is None else null_counts.add(chunk_nulls, fill_value=0)
+                n_rows_in += chunk_rows
+                n_rows_out += len(cleaned)
+                n_cols = cleaned.shape[1]
+                writer.write(cleaned)
+            writer.close()
+        total.rows_in, total.rows_out = n_rows_in, n_rows_out
+        total.read(input_path)
+        total.wrote(output_path)
+    
+    if n_rows_in:
+        report_missingness(null_counts, n_rows_in)
+    print(f"Preprocessing complete. Shape: ({n_rows_out}, {n_cols})")
     print(f"Saved processed data to {output_path}")
 
+
 if __name__ == "__main__":
-    preprocess_data('data/diabetic_data.csv', 'data/processed_data.csv')
+    import cli
+    cli.main(['preprocess'] + sys.argv[1:])
@@ -0,0 +1,151 @@
+import sys
+import os
+import resource
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from artifacts import MODEL_DIR, load_artifacts
+from features import build_features, encode
+from parallel import ordered_imap
+from patient_history import attach_priors
+from preprocessing import MISSING_CRITICAL, clean_encounters, read_encounters, streamed_prior_utilization
+from storage import TableWriter
+
+TARGET_COL = 'readmitted_binary'
+
+
+def feature_matrix(encoder, df):
+    """Encode a feature frame into the exact column layout used at training time."""
+    X = df.drop(columns=[TARGET_COL], errors='ignore')
+    return encode(encoder, X[list(encoder.feature_names_in_)])
+
+
+def predict_risk(encoder, models, df):
+    X = feature_matrix(encoder, df)
+    return pd.DataFrame({f'risk_{name}': model.predict_proba(X)[:, 1].astype(np.float32)
+                         for name, model in models.items()}, index=df.index)
+
+
+def prepare_raw(chunk, id_col='encounter_id'):
+    """Raw encounters (diabetic_data.csv schema) -> (ids, feature frame).
+
+    `ids` covers every input row; the feature frame only the rows
+    clean_encounters keeps (same index).
+    """
+    ids = chunk[id_col] if id_col in chunk.columns else pd.Series(chunk.index, index=chunk.index, name=id_col)
+    df = build_features(clean_encounters(chunk))
+    return ids, df
+
+
+def prepare_processed(chunk, id_col='encounter_id'):
+    """Rows of the SQLite `patients` table (already preprocessed) -> (ids, feature frame)."""
+    ids = chunk.pop(id_col)
+    return ids, build_features(chunk)
+
+
+def score_rows(encoder, models, ids, df):
+    """One output row per id: the risk scores, or null scores and the reason in `error`."""
+    scores = predict_risk(encoder, models, df).reindex(ids.index)
+    scores.insert(0, ids.name, ids.to_numpy())
+    scores['error'] = pd.Series(MISSING_CRITICAL, index=ids.index, dtype=object).mask(ids.index.isin(df.index))
+    return scores
+
+
+# --- Worker process state ---
+# Largest chunk the memory-mapped forest export scores faster than the
+# sklearn forest; it is about 2x slower on chunks of several thousand rows
+# (scripts/benchmark_forest_predictor.py)
+MMAP_MAX_CHUNK = 512
+
+# Each worker loads the artifacts once in its initializer and reuses them
+# for every chunk it is handed.
+_ARTIFACTS = None
+
+
+def _init_worker(model_dir, mmap):
+    global _ARTIFACTS
+    encoder, models = load_artifacts(model_dir, mmap=mmap)
+    # Parallelism comes from the pool; a forest trained with n_jobs=-1 would
+    # otherwise start a thread per core inside every worker.
+    for model in models.values():
+        if hasattr(model, 'n_jobs'):
+            model.n_jobs = 1
+    _ARTIFACTS = encoder, models
+
+
+def _score_chunk(task):
+    kind, chunk = task
+    ids, df = prepare_raw(chunk) if kind == 'raw' else prepare_processed(chunk)
+    return score_rows(*_ARTIFACTS, ids, df), len(chunk)
+
+
+def read_chunks(input_path=None, db_path=None, chunksize=100_000, history_db=None):
+    if input_path:
+        # Prior-utilization features follow each patient across chunks, so
+        # they are computed by a chunked pass over the file before the first chunk
+        with streamed_prior_utilization(input_path, chunksize, history_db) as priors:
+            for chunk in attach_priors(read_encounters(input_path, chunksize=chunksize), priors):
+                yield 'raw', chunk
+        return
+    conn = sqlite3.connect(db_path)
+    try:
+        for chunk in pd.read_sql_query("SELECT * FROM patients", conn, chunksize=chunksize):
+            yield 'processed', chunk
+    finally:
+        conn.close()
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux; children covers the worker processes
+    self_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    child_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return self_kb / 1024, child_kb / 1024
+
+
+def score(output_path, input_path=None, db_path=None, model_dir=MODEL_DIR, chunksize=100_000, n_workers=None,
+          mmap=None, history_db=None):
+    """Score raw encounters (`input_path`) or the `patients` table of `db_path`.
+
+    `mmap` picks the forest the workers use: the shared array export or
+    the sklearn pickle; by default the export only for chunks of up to
+    MMAP_MAX_CHUNK rows.
+
+    Raw encounters get their prior-utilization features from the
+    patient_history table of `history_db` plus their own earlier rows; the
+    `patients` table already has them.
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    if mmap is None:
+        mmap = chunksize <= MMAP_MAX_CHUNK
+    source = input_path or f"{db_path} (patients)"
+    forest = 'memory-mapped forest' if mmap else 'sklearn forest'
+    print(f"Scoring {source} in chunks of {chunksize:,} rows ({n_workers} workers, {forest})...")
+    
+    start = time.perf_counter()
+    n_in = n_scored = 0
+    chunks = read_chunks(input_path, db_path, chunksize, history_db)
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(model_dir, mmap)) as pool, \
+            TableWriter(output_path) as writer:
+        for scores, chunk_rows in ordered_imap(pool, _score_chunk, chunks, 2 * n_workers):
+            n_in += chunk_rows
+            n_scored += int(scores['error'].isna().sum())
+            writer.write(scores)
+    elapsed = time.perf_counter() - start
+    
+    parent_mb, worker_mb = peak_rss_mb()
+    print(f"Scored {n_scored:,} of {n_in:,} rows in {elapsed:.2f}s ({n_in / max(elapsed, 1e-9):,.0f} rows/sec)")
+    if n_scored < n_in:
+        print(f"{n_in - n_scored:,} rows could not be scored; they are kept with null scores and the reason in 'error'")
+    print(f"Peak RSS: parent {parent_mb:,.0f} MB, largest worker {worker_mb:,.0f} MB")
+    print(f"Saved risk scores to {output_path}")
+    return {'rows_in': n_in, 'rows_out': n_in, 'rows_scored': n_scored, 'seconds': elapsed,
+            'peak_rss_mb': parent_mb, 'peak_worker_rss_mb': worker_mb}
+
+
+if __name__ == "__main__":
+    import cli
+    cli.main(['score'] + sys.argv[1:])
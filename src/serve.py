@@ -0,0 +1,330 @@
+import sys
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from scipy import sparse
+
+from artifacts import MODEL_DIR, load_artifacts
+from features import AGE_MAPPING, DIAG_CAT_COLS, calculate_comorbidity
+from patient_history import PRIOR_COLUMNS, open_history, record_priors
+from preprocessing import (
+    CRITICAL_COLUMNS, MISSING_CRITICAL, categorize_icd9, group_admission_source, group_discharge_disposition,
+)
+
+# Features derived from raw fields, and the raw fields they are computed from
+DERIVED_FIELDS = {
+    'discharge_disposition_group': ['discharge_disposition_id'],
+    'admission_source_group': ['admission_source_id'],
+    'diag_1_cat': ['diag_1'],
+    'diag_2_cat': ['diag_2'],
+    'diag_3_cat': ['diag_3'],
+    'comorbidity_count': ['diag_1', 'diag_2', 'diag_3'],
+    'age_numeric': ['age'],
+    # Looked up in patient_history by patient_nbr; zeros when it is not given
+    **{col: [] for col in PRIOR_COLUMNS},
+}
+# Grouped admission/discharge codes: feature -> (raw ID field, row-wise grouping)
+GROUPED_IDS = {
+    'discharge_disposition_group': ('discharge_disposition_id', group_discharge_disposition),
+    'admission_source_group': ('admission_source_id', group_admission_source),
+}
+
+
+class RecordEncoder:
+    """Per-record form of clean_encounters + build_features + encode.
+
+    Builds CSR rows straight from raw encounter dicts using the row-wise
+    recoding functions and the vocabulary of the fitted encoder, avoiding
+    the per-call DataFrame overhead that dominates for small batches.
+    """
+
+    def __init__(self, encoder):
+        # Column order of fit_encoder: numeric passthrough, then one-hot blocks
+        num_cols = list(encoder.transformers_[0][2])
+        cat_cols = list(encoder.transformers_[1][2])
+        ohe = encoder.named_transformers_['cat']
+        self.cat_cols = cat_cols
+        self.num_index = {c: i for i, c in enumerate(num_cols)}
+        self.cat_index = {}
+        offset = len(num_cols)
+        for col, cats, drop in zip(cat_cols, ohe.categories_, ohe.drop_idx_):
+            for j, cat in enumerate(cats):
+                if drop is not None and j == drop:
+                    continue
+                self.cat_index[(col, cat)] = offset
+                offset += 1
+        self.n_features = offset
+        self.raw_num_cols = [c for c in num_cols if c not in DERIVED_FIELDS]
+        required = set(CRITICAL_COLUMNS)
+        for col in num_cols + cat_cols:
+            required.update(DERIVED_FIELDS.get(col, [col]))
+        self.required = sorted(required)
+
+    def missing_fields(self, record):
+        return [f for f in self.required if f not in record]
+
+    def features(self, record, priors=None):
+        """(features, error) for one raw encounter: a processed feature dict, or the reason it cannot be scored.
+
+        Encounters the batch pipeline would drop, and values that cannot be
+        coerced to the types the models were trained on, get a reason
+        instead of failing the micro-batch they are part of.
+        `priors` are its prior-utilization features (record_priors); none means a first visit.
+        """
+        rec = {k: (None if v == '?' else v) for k, v in record.items()}
+        if any(rec.get(f) is None for f in CRITICAL_COLUMNS):
+            return None, MISSING_CRITICAL
+        invalid = [f for f in self.required if isinstance(rec.get(f), (list, dict))]
+        for col in self.raw_num_cols:
+            try:
+                rec[col] = float(rec[col])
+            except (TypeError, ValueError):
+                invalid.append(col)
+                continue
+            if not np.isfinite(rec[col]):
+                invalid.append(col)
+        if invalid:
+            return None, f'invalid value for: {sorted(set(invalid))}'
+        rec.update(priors or dict.fromkeys(PRIOR_COLUMNS, 0))
+        for group, (raw, grouper) in GROUPED_IDS.items():
+            try:
+                rec[group] = grouper(rec[raw])
+            except (TypeError, ValueError):
+                return None, f'invalid value for: {[raw]}'
+        for raw, cat in zip(['diag_1', 'diag_2', 'diag_3'], DIAG_CAT_COLS):
+            rec[cat] = categorize_icd9(rec[raw])
+        rec['comorbidity_count'] = calculate_comorbidity(rec)
+        rec['age_numeric'] = AGE_MAPPING.get(rec['age'])
+        if rec['age_numeric'] is None:
+            return None, f"unknown age bracket {rec['age']!r}; expected one of {list(AGE_MAPPING)}"
+        return rec, None
+
+    def transform(self, features):
+        """CSR matrix for a list of processed feature dicts."""
+        indptr, indices, data = [0], [], []
+        for rec in features:
+            for col, i in self.num_index.items():
+                value = rec[col]
+                indices.append(i)
+                data.append(np.nan if value is None else float(value))
+            for col in self.cat_cols:
+                i = self.cat_index.get((col, rec[col]))
+                if i is not None:
+                    indices.append(i)
+                    data.append(1.0)
+            indptr.append(len(indices))
+        return sparse.csr_matrix((np.array(data, dtype=np.float32), indices, indptr),
+                                 shape=(len(features), self.n_features))
+
+
+class MicroBatcher:
+    """Coalesce concurrent scoring requests into one predict_proba call.
+
+    Requests wait at most `max_wait_ms` for company; a batch is closed
+    early once it holds `max_batch` encounters.
+    """
+
+    def __init__(self, record_encoder, models, max_batch=64, max_wait_ms=2.0, latency_window=10_000,
+                 history=None):
+        self.record_encoder = record_encoder
+        self.models = models
+        # Read-only connection to the patient_history table, used by the batching thread only
+        self.history = history
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._latencies = deque(maxlen=latency_window)
+        self._batch_sizes = deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, records):
+        """Queue a list of raw encounter dicts; the Future resolves to one result per record."""
+        future = Future()
+        self._queue.put((records, future, time.perf_counter()))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        n_records = len(batch[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while n_records < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            n_records += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                results = self._score([records for records, _, _ in batch])
+                outcomes, offset = [], 0
+                for records, _, _ in batch:
+                    outcomes.append((results[offset:offset + len(records)], None))
+                    offset += len(records)
+            except Exception:
+                # Something features() did not catch still broke the batch:
+                # score each request on its own so only the culprit fails
+                outcomes = [self._try_score(records) for records, _, _ in batch]
+
+            done = time.perf_counter()
+            with self._lock:
+                self._batch_sizes.append(sum(len(records) for records, _, _ in batch))
+                for (records, future, started), (result, error) in zip(batch, outcomes):
+                    if error is not None:
+                        future.set_exception(error)
+                        self.errors += 1
+                        continue
+                    future.set_result(result)
+                    self._latencies.append(done - started)
+                    self.requests += 1
+
+    def _try_score(self, records):
+        try:
+            return self._score([records]), None
+        except Exception as e:
+            return None, e
+
+    def _score(self, requests):
+        """One result per encounter of `requests` (lists of raw encounter dicts), in order."""
+        priors = record_priors(self.history, requests)
+        records = [r for records in requests for r in records]
+        features = [self.record_encoder.features(r, p) for r, p in zip(records, priors)]
+        kept = [f for f, error in features if error is None]
+        scores = {}
+        if kept:
+            X = self.record_encoder.transform(kept)
+            scores = {f'risk_{name}': model.predict_proba(X)[:, 1] for name, model in self.models.items()}
+        
+        # Same columns as the batch output of score.py: null scores and the
+        # reason for the rows that cannot be scored
+        results = []
+        k = 0
+        for record, (_, error) in zip(records, features):
+            row = {'encounter_id': record.get('encounter_id')}
+            if error is not None:
+                row.update({f'risk_{name}': None for name in self.models})
+                row['error'] = error
+            else:
+                row.update({name: float(values[k]) for name, values in scores.items()})
+                row['error'] = None
+                k += 1
+            results.append(row)
+        return results
+
+    def stats(self):
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000
+            batch_sizes = np.array(self._batch_sizes)
+            requests, errors = self.requests, self.errors
+        out = {'requests': requests, 'errors': errors, 'queue_depth': self._queue.qsize()}
+        if len(latencies):
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            out.update(latency_ms={'p50': round(p50, 3), 'p95': round(p95, 3), 'p99': round(p99, 3),
+                                   'max': round(latencies.max(), 3)},
+                       mean_batch_size=round(float(batch_sizes.mean()), 2))
+        return out
+
+
+def make_handler(batcher, timeout=30.0):
+    record_encoder = batcher.record_encoder
+
+    class ScoringHandler(BaseHTTPRequestHandler):
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/stats':
+                self._send(200, batcher.stats())
+            elif self.path == '/health':
+                self._send(200, {'status': 'ok'})
+            else:
+                self._send(404, {'error': 'not found'})
+
+        def do_POST(self):
+            if self.path != '/score':
+                self._send(404, {'error': 'not found'})
+                return
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            except ValueError:
+                self._send(400, {'error': 'invalid JSON'})
+                return
+            # Accept a single encounter, a list, or {"encounters": [...]}
+            if isinstance(payload, dict):
+                payload = payload.get('encounters', [payload])
+            if not isinstance(payload, list) or not all(isinstance(r, dict) for r in payload):
+                self._send(400, {'error': 'expected an encounter object or a list of them'})
+                return
+            if not payload:
+                self._send(200, {'results': []})
+                return
+            missing = sorted({f for r in payload for f in record_encoder.missing_fields(r)})
+            if missing:
+                self._send(400, {'error': f'missing fields: {missing}'})
+                return
+            try:
+                results = batcher.submit(payload).result(timeout=timeout)
+            except Exception as e:
+                self._send(500, {'error': str(e)})
+                return
+            self._send(200, {'results': results})
+
+        def log_message(self, format, *args):
+            # Per-request access logs would dominate at load-test rates
+            pass
+
+    return ScoringHandler
+
+
+class ScoringServer(ThreadingHTTPServer):
+    # socketserver's default listen backlog of 5 drops connections under
+    # concurrent load, which shows up as 1s+ client-side retry latency
+    request_queue_size = 128
+
+
+def serve(host='127.0.0.1', port=8000, model_dir=MODEL_DIR, max_batch=64, max_wait_ms=2.0, history_db=None):
+    encoder, models = load_artifacts(model_dir)
+    # Batches are small; thread start-up per call costs more than it saves
+    for model in models.values():
+        if hasattr(model, 'n_jobs'):
+            model.n_jobs = 1
+    history = open_history(history_db)
+    if history is None:
+        print(f"No patient history in {history_db}; every encounter is scored as a first visit")
+    batcher = MicroBatcher(RecordEncoder(encoder), models, max_batch=max_batch, max_wait_ms=max_wait_ms,
+                           history=history)
+    server = ScoringServer((host, port), make_handler(batcher))
+    print(f"Serving readmission scores on http://{host}:{port} (POST /score, GET /stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    import cli
+    cli.main(['serve'] + sys.argv[1:])
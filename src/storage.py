@@ -0,0 +1,202 @@
+import os
+
+# Intermediate tables passed between pipeline stages. Parquet/Feather keep
+# dtypes (categoricals, small ints, bools) and allow reading a subset of
+# columns; CSV is kept for compatibility with older runs and external tools.
+FORMATS = {
+    'parquet': '.parquet',
+    'feather': '.feather',
+    'csv': '.csv',
+}
+DEFAULT_FORMAT = 'parquet'
+
+
+def table_path(name, fmt=DEFAULT_FORMAT, data_dir='data'):
+    """Path of a pipeline table, e.g. ('processed_data', 'parquet') -> data/processed_data.parquet"""
+    return os.path.join(data_dir, name + FORMATS[fmt])
+
+
+def format_of(path):
+    ext = os.path.splitext(path)[1].lower()
+    for fmt, fmt_ext in FORMATS.items():
+        if ext == fmt_ext:
+            return fmt
+    raise ValueError(f"Unsupported table format for {path}; expected one of {list(FORMATS.values())}")
+
+
+def _require_pyarrow(fmt):
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError(f"Reading/writing {fmt} requires pyarrow (pip install pyarrow), "
+                          f"or run the pipeline with --format csv")
+
+
+def parse_dtypes(dtypes):
+    """`dtypes` with every integer type widened to int64, for read_csv.
+
+    read_csv parses straight into a small integer type by wrapping around
+    (300 read as int8 is 44), so narrow types are applied afterwards by
+    narrow_integers, which checks the range first.
+    """
+    return {c: 'int64' if _is_int(t) else t for c, t in dtypes.items()}
+
+
+def narrow_integers(df, dtypes):
+    """Cast the integer columns of `df` to their types in `dtypes`; ValueError if a value does not fit."""
+    import numpy as np
+    casts = {}
+    for col, dtype in dtypes.items():
+        if col not in df.columns or not _is_int(dtype) or df[col].dtype == dtype:
+            continue
+        info = np.iinfo(dtype)
+        low, high = df[col].min(), df[col].max()
+        if low < info.min or high > info.max:
+            raise ValueError(f"Column '{col}' has values from {low} to {high}, outside the range of its "
+                             f"planned type {dtype} ({info.min} to {info.max})")
+        casts[col] = dtype
+    return df.astype(casts) if casts else df
+
+
+def _is_int(dtype):
+    import numpy as np
+    try:
+        return np.issubdtype(np.dtype(dtype), np.integer)
+    except TypeError:
+        return False
+
+
+def read_table(path, columns=None, csv_dtypes=None):
+    """Load a pipeline table, optionally projecting to `columns`.
+
+    Columns in `columns` that the table does not have are skipped, so a stage
+    can list optional ones (e.g. the target of an unlabelled extract).
+    `csv_dtypes` is a dtype plan for CSV tables, which carry no types of
+    their own; entries for columns the file does not have are ignored, and
+    values out of range of a planned integer type raise ValueError.
+    """
+    import pandas as pd
+    fmt = format_of(path)
+    if fmt == 'csv':
+        header = pd.read_csv(path, nrows=0).columns
+        if columns is not None:
+            columns = [c for c in columns if c in header]
+        if not csv_dtypes:
+            return pd.read_csv(path, usecols=columns)
+        csv_dtypes = {c: t for c, t in csv_dtypes.items() if c in header}
+        return narrow_integers(pd.read_csv(path, usecols=columns, dtype=parse_dtypes(csv_dtypes)), csv_dtypes)
+    _require_pyarrow(fmt)
+    if columns is not None:
+        present = set(table_columns(path))
+        columns = [c for c in columns if c in present]
+    if fmt == 'parquet':
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_feather(path, columns=columns)
+
+
+def table_columns(path):
+    """Column names of a pipeline table, read from its header or schema only."""
+    fmt = format_of(path)
+    if fmt == 'csv':
+        import pandas as pd
+        return list(pd.read_csv(path, nrows=0).columns)
+    _require_pyarrow(fmt)
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.read_schema(path).names
+    import pyarrow as pa
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).schema.names
+
+
+def write_table(df, path):
+    """Save a pipeline table in the format implied by the file extension.
+
+    For the columnar formats, string columns are stored as categoricals so the
+    next stage gets them back without re-inferring types.
+    """
+    fmt = format_of(path)
+    if fmt == 'csv':
+        df.to_csv(path, index=False)
+        return
+    _require_pyarrow(fmt)
+    obj_cols = df.select_dtypes(include=['object']).columns
+    if len(obj_cols):
+        df = df.astype({c: 'category' for c in obj_cols})
+    if fmt == 'parquet':
+        df.to_parquet(path, index=False)
+    else:
+        df.reset_index(drop=True).to_feather(path)
+
+
+def _is_text(dtype):
+    import pandas as pd
+    return isinstance(dtype, pd.CategoricalDtype) or dtype == object or pd.api.types.is_string_dtype(dtype)
+
+
+class TableWriter:
+    """Append DataFrame chunks to a single pipeline table.
+
+    The first chunk fixes the schema; later chunks are converted to it so
+    the output reads back as one table, even when a chunk has a text column
+    with no values at all. String columns are dictionary-encoded
+    in Parquet (read back as categoricals) and plain strings in Feather.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fmt = format_of(path)
+        self._writer = None
+        self._schema = None
+        self._text_cols = []
+        self._header = True
+        if self.fmt != 'csv':
+            _require_pyarrow(self.fmt)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, df):
+        if self.fmt == 'csv':
+            df.to_csv(self.path, index=False, mode='w' if self._header else 'a', header=self._header)
+            self._header = False
+            return
+
+        import pyarrow as pa
+        if self._schema is None:
+            self._text_cols = [c for c in df.columns if _is_text(df[c].dtype)]
+        df = df.astype({c: object for c in self._text_cols})
+        if self._schema is None:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            text_type = pa.dictionary(pa.int32(), pa.string()) if self.fmt == 'parquet' else pa.string()
+            fields = [pa.field(f.name, text_type) if f.name in self._text_cols else f for f in table.schema]
+            self._schema = pa.schema(fields)
+            self._writer = self._open_writer(pa)
+        else:
+            # Convert straight to the declared types: in a chunk where a text
+            # column is all missing it arrives as float64, which cannot be
+            # cast to a dictionary, while its NaNs convert to string nulls
+            table = pa.Table.from_pandas(df, schema=self._plain_schema(pa), preserve_index=False)
+        self._writer.write_table(table.cast(self._schema))
+
+    def _plain_schema(self, pa):
+        return pa.schema([pa.field(f.name, pa.string()) if f.name in self._text_cols else f for f in self._schema])
+
+    def _open_writer(self, pa):
+        if self.fmt == 'parquet':
+            import pyarrow.parquet as pq
+            return pq.ParquetWriter(self.path, self._schema)
+        return pa.ipc.new_file(self.path, self._schema)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def add_format_argument(parser):
+    parser.add_argument('--format', choices=list(FORMATS), default=DEFAULT_FORMAT,
+                        help="File format for intermediate tables (default: %(default)s)")
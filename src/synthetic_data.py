@@ -0,0 +1,245 @@
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from preprocessing import MEDICATION_COLUMNS
+
+# Synthetic encounters in the diabetic_data.csv schema, for benchmarking at
+# sizes the 100k-row UCI extract cannot reach (and without network access).
+# Marginals are taken from the published dataset; columns are drawn
+# independently except where noted (change/diabetesMed follow the
+# medications, readmission risk rises with prior visits). Missing values
+# are written as '?' like the original.
+
+COLUMNS = [
+    'encounter_id', 'patient_nbr', 'race', 'gender', 'age', 'weight', 'admission_type_id',
+    'discharge_disposition_id', 'admission_source_id', 'time_in_hospital', 'payer_code',
+    'medical_specialty', 'num_lab_procedures', 'num_procedures', 'num_medications',
+    'number_outpatient', 'number_emergency', 'number_inpatient', 'diag_1', 'diag_2', 'diag_3',
+    'number_diagnoses', 'max_glu_serum', 'A1Cresult',
+] + MEDICATION_COLUMNS + ['change', 'diabetesMed', 'readmitted']
+
+# Value -> share of encounters; each table is normalized when sampled
+MARGINALS = {
+    'race': {'Caucasian': 74.8, 'AfricanAmerican': 18.9, '?': 2.2, 'Hispanic': 2.0, 'Other': 1.5, 'Asian': 0.6},
+    'gender': {'Female': 53.76, 'Male': 46.24, 'Unknown/Invalid': 0.003},
+    'age': {'[0-10)': 0.16, '[10-20)': 0.68, '[20-30)': 1.63, '[30-40)': 3.71, '[40-50)': 9.52,
+            '[50-60)': 16.96, '[60-70)': 22.09, '[70-80)': 25.62, '[80-90)': 16.9, '[90-100)': 2.74},
+    'weight': {'?': 96.86, '[75-100)': 1.31, '[50-75)': 0.88, '[100-125)': 0.61, '[125-150)': 0.14,
+               '[25-50)': 0.09, '[0-25)': 0.05, '[150-175)': 0.03, '[175-200)': 0.01, '>200': 0.003},
+    'admission_type_id': {1: 53.1, 3: 18.5, 2: 18.2, 6: 5.2, 5: 4.7, 8: 0.3, 7: 0.02, 4: 0.01},
+    'discharge_disposition_id': {1: 59.2, 3: 13.7, 6: 12.7, 18: 3.6, 2: 2.1, 22: 2.0, 11: 1.6, 5: 1.2,
+                                 25: 1.0, 4: 0.8, 7: 0.6, 23: 0.4, 13: 0.4, 14: 0.4, 28: 0.14, 8: 0.1,
+                                 15: 0.06, 24: 0.05, 9: 0.02, 17: 0.01, 16: 0.01, 19: 0.01, 10: 0.006,
+                                 27: 0.005, 12: 0.003, 20: 0.002},
+    'admission_source_id': {7: 56.5, 1: 29.1, 17: 6.7, 4: 3.1, 6: 2.2, 2: 1.1, 5: 0.8, 3: 0.2, 20: 0.2,
+                            9: 0.1, 8: 0.02, 22: 0.01, 10: 0.01, 14: 0.002, 11: 0.002, 25: 0.002, 13: 0.001},
+    'time_in_hospital': {1: 14.0, 2: 16.9, 3: 17.4, 4: 13.7, 5: 9.8, 6: 7.4, 7: 5.8, 8: 4.3, 9: 3.0,
+                         10: 2.3, 11: 1.8, 12: 1.4, 13: 1.2, 14: 1.0},
+    'payer_code': {'?': 39.6, 'MC': 31.9, 'HM': 6.2, 'SP': 4.9, 'BC': 4.6, 'MD': 3.5, 'CP': 2.5, 'UN': 2.4,
+                   'CM': 1.9, 'OG': 1.0, 'PO': 0.6, 'DM': 0.5, 'CH': 0.1, 'WC': 0.1, 'OT': 0.1, 'MP': 0.08,
+                   'SI': 0.05, 'FR': 0.001},
+    'medical_specialty': {'?': 49.1, 'InternalMedicine': 14.4, 'Emergency/Trauma': 7.4,
+                          'Family/GeneralPractice': 7.3, 'Cardiology': 5.3, 'Surgery-General': 3.0,
+                          'Nephrology': 1.6, 'Orthopedics': 1.4, 'Orthopedics-Reconstructive': 1.2,
+                          'Radiologist': 1.1, 'Pulmonology': 0.9, 'Psychiatry': 0.8, 'Urology': 0.7,
+                          'ObstetricsandGynecology': 0.7, 'Surgery-Cardiovascular/Thoracic': 0.6,
+                          'Gastroenterology': 0.5, 'Surgery-Vascular': 0.5, 'Surgery-Neuro': 0.5,
+                          'PhysicalMedicineandRehabilitation': 0.4, 'Oncology': 0.3, 'Pediatrics': 0.3,
+                          'Hematology/Oncology': 0.2, 'Neurology': 0.2},
+    'num_procedures': {0: 45.8, 1: 20.4, 2: 12.5, 3: 9.3, 4: 4.1, 5: 3.0, 6: 4.9},
+    'number_diagnoses': {9: 48.6, 5: 11.2, 8: 10.4, 7: 10.2, 6: 10.0, 4: 5.4, 3: 2.8, 2: 1.0, 1: 0.2,
+                         16: 0.04, 10: 0.02, 13: 0.02, 11: 0.01, 15: 0.01, 12: 0.01, 14: 0.01},
+    'max_glu_serum': {'None': 94.7, 'Norm': 2.6, '>200': 1.5, '>300': 1.2},
+    'A1Cresult': {'None': 83.3, '>8': 8.1, 'Norm': 4.9, '>7': 3.7},
+}
+
+# Share of encounters per medication as (No, Steady, Up, Down); medications
+# not listed are 'No' throughout
+MEDICATION_RATES = {
+    'metformin': (80.4, 18.0, 1.0, 0.6),
+    'repaglinide': (98.5, 1.36, 0.11, 0.04),
+    'nateglinide': (99.3, 0.66, 0.02, 0.01),
+    'chlorpropamide': (99.92, 0.08, 0.01, 0.0),
+    'glimepiride': (94.9, 4.6, 0.32, 0.19),
+    'acetohexamide': (99.999, 0.001, 0.0, 0.0),
+    'glipizide': (87.5, 11.2, 0.76, 0.55),
+    'glyburide': (89.5, 9.1, 0.8, 0.55),
+    'tolbutamide': (99.98, 0.02, 0.0, 0.0),
+    'pioglitazone': (92.8, 6.85, 0.23, 0.12),
+    'rosiglitazone': (93.7, 6.0, 0.17, 0.09),
+    'acarbose': (99.7, 0.29, 0.01, 0.0),
+    'miglitol': (99.96, 0.03, 0.0, 0.01),
+    'troglitazone': (99.997, 0.003, 0.0, 0.0),
+    'tolazamide': (99.96, 0.04, 0.0, 0.0),
+    'insulin': (46.6, 30.3, 11.1, 12.0),
+    'glyburide-metformin': (99.3, 0.68, 0.01, 0.01),
+    'glipizide-metformin': (99.99, 0.01, 0.0, 0.0),
+    'glimepiride-pioglitazone': (99.999, 0.001, 0.0, 0.0),
+    'metformin-rosiglitazone': (99.998, 0.002, 0.0, 0.0),
+    'metformin-pioglitazone': (99.999, 0.001, 0.0, 0.0),
+}
+MEDICATION_LEVELS = ['No', 'Steady', 'Up', 'Down']
+
+# Most frequent ICD-9 codes per diagnosis position (share of encounters).
+# The rest of the mass is spread over a long tail of codes drawn from
+# ICD9_TAIL, which roughly follows the chapter mix of the real extract.
+DIAG_HEAD = {
+    'diag_1': {'428': 6.7, '414': 6.5, '786': 4.0, '410': 3.5, '486': 3.4, '427': 2.7, '491': 2.3,
+               '715': 2.2, '682': 2.0, '434': 2.0, '780': 2.0, '996': 1.9, '276': 1.9, '250.8': 1.7,
+               '599': 1.6, '38': 1.5, '584': 1.4, 'V57': 1.2, '250.6': 0.9, '820': 0.8, '435': 0.8,
+               '577': 0.7, '562': 0.6, '250.13': 0.6, '403': 0.4, '?': 0.02},
+    'diag_2': {'276': 6.6, '428': 6.5, '250': 6.0, '427': 5.0, '401': 3.7, '496': 3.2, '599': 3.2,
+               '403': 2.8, '414': 2.7, '411': 2.5, '250.02': 2.0, '707': 2.0, '585': 1.9, '584': 1.6,
+               '491': 1.6, '250.01': 1.4, '285': 1.4, '780': 1.3, '425': 1.3, '682': 1.3, '?': 0.35},
+    'diag_3': {'250': 11.4, '401': 8.1, '276': 5.1, '428': 4.5, '427': 3.9, '414': 3.6, '496': 2.6,
+               '403': 2.3, '585': 2.0, '272': 1.9, '599': 1.9, 'V45': 1.3, '250.02': 1.3, '707': 1.2,
+               '780': 1.1, '285': 1.1, '425': 1.0, '424': 0.9, '250.01': 0.8, 'V58': 0.8, '?': 1.4},
+}
+# (first code, last code, share of the tail, prefix) of three-digit code blocks
+ICD9_TAIL = [
+    (1, 139, 4.0, ''),       # infectious
+    (140, 239, 6.0, ''),     # neoplasms
+    (240, 279, 8.0, ''),     # endocrine (incl. 250.xx)
+    (280, 289, 2.0, ''),     # blood
+    (290, 319, 4.0, ''),     # mental
+    (320, 389, 3.0, ''),     # nervous system
+    (390, 459, 22.0, ''),    # circulatory
+    (460, 519, 10.0, ''),    # respiratory
+    (520, 579, 9.0, ''),     # digestive
+    (580, 629, 6.0, ''),     # genitourinary
+    (680, 709, 3.0, ''),     # skin
+    (710, 739, 6.0, ''),     # musculoskeletal
+    (780, 799, 5.0, ''),     # symptoms
+    (800, 999, 8.0, ''),     # injury
+    (1, 91, 3.0, 'V'),       # supplementary V codes
+    (800, 999, 1.0, 'E'),    # external causes
+]
+ICD9_TAIL_SIZE = 700
+
+# Prior-visit counts: negative binomial (mean, dispersion), matching the
+# long right tails of the real columns (~84% / 89% / 66% zeros)
+VISIT_COUNTS = {
+    'number_outpatient': (0.37, 0.12),
+    'number_emergency': (0.20, 0.12),
+    'number_inpatient': (0.64, 0.45),
+}
+# (mean, sd, low, high) for the approximately normal lab/medication counts
+NORMAL_COUNTS = {
+    'num_lab_procedures': (43.1, 19.7, 1, 132),
+    'num_medications': (16.0, 8.1, 1, 81),
+}
+# P(readmitted '<30') = sigmoid(intercept + sum(weight * column)); of the
+# rest, a fixed share is readmitted after 30 days
+READMIT_INTERCEPT = -2.5
+READMIT_WEIGHTS = {'number_inpatient': 0.35, 'number_emergency': 0.15, 'time_in_hospital': 0.02}
+READMIT_LATE_SHARE = 0.39
+# Patients have ~1.4 encounters each in the real extract
+ENCOUNTERS_PER_PATIENT = 1.42
+
+CHUNK_ROWS = 250_000
+
+
+def _choice(rng, table, n):
+    values = np.array(list(table))
+    if values.dtype.kind == 'U':
+        values = values.astype(object)
+    p = np.array(list(table.values()), dtype=np.float64)
+    return values[rng.choice(len(values), size=n, p=p / p.sum())]
+
+
+def icd9_tail_codes(seed=0, size=ICD9_TAIL_SIZE):
+    """A fixed pool of long-tail ICD-9 codes and their sampling weights."""
+    rng = np.random.default_rng([seed, 0xD1A6])
+    shares = np.array([block[2] for block in ICD9_TAIL])
+    per_block = rng.multinomial(size, shares / shares.sum())
+    codes, weights = [], []
+    for (low, high, share, prefix), k in zip(ICD9_TAIL, per_block):
+        numbers = rng.integers(low, high + 1, k)
+        for number, decimal in zip(numbers, rng.integers(0, 4, k)):
+            code = f"{prefix}{number:02d}" if prefix == 'V' else f"{prefix}{number}"
+            # About a quarter of the codes carry a fifth-digit subdivision
+            codes.append(code if decimal else f"{code}.{rng.integers(0, 10)}{rng.integers(0, 10)}")
+        weights.extend(share / max(k, 1) * rng.pareto(1.5, k) + 1e-6)
+    codes, index = np.unique(np.array(codes, dtype=object), return_index=True)
+    weights = np.array(weights)[index]
+    return codes, weights / weights.sum()
+
+
+def _diagnoses(rng, column, n, tail_codes, tail_weights):
+    head = DIAG_HEAD[column]
+    head_share = sum(head.values()) / 100
+    codes = _choice(rng, head, n)
+    from_tail = rng.random(n) >= head_share
+    codes[from_tail] = tail_codes[rng.choice(len(tail_codes), size=from_tail.sum(), p=tail_weights)]
+    return codes
+
+
+def _visits(rng, mean, dispersion, n):
+    return rng.negative_binomial(dispersion, dispersion / (dispersion + mean), n)
+
+
+def generate_encounters(n_rows, seed=0, start_row=0, tail=None):
+    """`n_rows` synthetic encounters as a DataFrame in the raw CSV layout.
+
+    Each chunk draws from its own stream seeded by (seed, start_row), so
+    a file written in chunks is reproducible for a given seed and chunk
+    size without generating the rows before it.
+    """
+    rng = np.random.default_rng([seed, start_row])
+    tail_codes, tail_weights = tail if tail is not None else icd9_tail_codes(seed)
+    n = n_rows
+    rows = np.arange(start_row, start_row + n, dtype=np.int64)
+    d = {
+        'encounter_id': 12_522 + rows * 16 + rng.integers(0, 16, n),
+        # Repeat visits of a patient land near each other in the file
+        'patient_nbr': 135 + ((rows + rng.integers(0, 1_000, n)) / ENCOUNTERS_PER_PATIENT).astype(np.int64) * 9,
+    }
+    for col, table in MARGINALS.items():
+        d[col] = _choice(rng, table, n)
+    for col, (mean, sd, low, high) in NORMAL_COUNTS.items():
+        d[col] = np.clip(np.rint(rng.normal(mean, sd, n)), low, high).astype(np.int64)
+    for col, (mean, dispersion) in VISIT_COUNTS.items():
+        d[col] = _visits(rng, mean, dispersion, n)
+    for col in DIAG_HEAD:
+        d[col] = _diagnoses(rng, col, n, tail_codes, tail_weights)
+
+    levels = np.array(MEDICATION_LEVELS, dtype=object)
+    adjusted = np.zeros(n, dtype=bool)
+    on_medication = np.zeros(n, dtype=bool)
+    for col in MEDICATION_COLUMNS:
+        if col not in MEDICATION_RATES:
+            d[col] = np.full(n, 'No', dtype=object)
+            continue
+        p = np.array(MEDICATION_RATES[col])
+        level = rng.choice(len(levels), size=n, p=p / p.sum())
+        d[col] = levels[level]
+        on_medication |= level > 0
+        adjusted |= level > 1
+    # A dose change counts as 'Ch'; so do some switches the columns cannot show
+    d['change'] = np.where(adjusted | (rng.random(n) < 0.25), 'Ch', 'No').astype(object)
+    d['diabetesMed'] = np.where(on_medication, 'Yes', 'No').astype(object)
+
+    logit = READMIT_INTERCEPT + sum(w * d[col] for col, w in READMIT_WEIGHTS.items())
+    early = rng.random(n) < 1 / (1 + np.exp(-logit))
+    late = ~early & (rng.random(n) < READMIT_LATE_SHARE)
+    d['readmitted'] = np.select([early, late], ['<30', '>30'], 'NO').astype(object)
+    return pd.DataFrame(d)[COLUMNS]
+
+
+def write_encounters(path, n_rows, seed=0, chunk_rows=CHUNK_ROWS):
+    """Generate `n_rows` encounters to a CSV file, `chunk_rows` at a time."""
+    tail = icd9_tail_codes(seed)
+    start = time.perf_counter()
+    for offset in range(0, n_rows, chunk_rows):
+        chunk = generate_encounters(min(chunk_rows, n_rows - offset), seed, offset, tail)
+        chunk.to_csv(path, index=False, mode='w' if offset == 0 else 'a', header=offset == 0)
+    print(f"Wrote {n_rows:,} synthetic encounters to {path} in {time.perf_counter() - start:.1f}s")
+    return path
+
+
+if __name__ == "__main__":
+    import cli
+    cli.main(['synth'] + sys.argv[1:])
@@ -0,0 +1,160 @@
+import json
+import math
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import sparse
+from scipy.stats import loguniform
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import ParameterSampler, StratifiedKFold
+
+# Configurations train_and_evaluate has always used; tuned values override these
+BASE_MODELS = {
+    'logistic_regression': LogisticRegression(max_iter=1000, class_weight='balanced', random_state=42),
+    'random_forest': RandomForestClassifier(n_estimators=100, class_weight='balanced', random_state=42, n_jobs=-1),
+}
+
+SEARCH_SPACES = {
+    'logistic_regression': {
+        'C': loguniform(1e-3, 1e2),
+        'solver': ['lbfgs', 'liblinear'],
+    },
+    'random_forest': {
+        'n_estimators': [100, 200, 400],
+        'max_depth': [None, 8, 12, 16, 24],
+        'min_samples_leaf': [1, 5, 20, 50],
+        'max_features': ['sqrt', 0.2, 0.4],
+    },
+}
+
+
+def make_model(name, params=None):
+    return clone(BASE_MODELS[name]).set_params(**(params or {}))
+
+
+# --- Shared training matrix ---
+# The CSR components and labels are written once as .npy files (under
+# /dev/shm when available) and every worker maps them read-only, instead of
+# each task pickling its own copy of the matrix. Other per-row arrays
+# (here the CV folds and row order) are shared the same way.
+
+def publish_matrix(X, y, prefix='readmission_tuning_', **arrays):
+    shm = '/dev/shm' if os.path.isdir('/dev/shm') else None
+    path = tempfile.mkdtemp(prefix=prefix, dir=shm)
+    X = sparse.csr_matrix(X)
+    for name, arr in [('data', X.data), ('indices', X.indices), ('indptr', X.indptr),
+                      ('y', np.asarray(y))] + list(arrays.items()):
+        np.save(os.path.join(path, f'{name}.npy'), arr)
+    with open(os.path.join(path, 'shape.json'), 'w') as f:
+        json.dump(list(X.shape), f)
+    return path
+
+
+def load_matrix(path, names=('folds', 'order')):
+    """(X, y, *arrays named in `names`), all memory-mapped read-only."""
+    arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+              for name in ['data', 'indices', 'indptr', 'y'] + list(names)}
+    with open(os.path.join(path, 'shape.json')) as f:
+        shape = tuple(json.load(f))
+    X = sparse.csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']), shape=shape, copy=False)
+    return (X, arrays['y']) + tuple(arrays[name] for name in names)
+
+
+_SHARED = None
+
+
+def _init_worker(path):
+    global _SHARED
+    _SHARED = load_matrix(path)
+
+
+def _evaluate(task):
+    """Fit one candidate on one CV fold, restricted to the first `n_rows` of the shuffled order."""
+    name, params, fold, n_rows, scoring = task
+    X, y, folds, order = _SHARED
+    rows = np.sort(order[:n_rows])
+    train = rows[folds[rows] != fold]
+    valid = rows[folds[rows] == fold]
+    model = make_model(name, params)
+    if model.get_params().get('n_jobs') not in (None, 1):
+        # Parallelism comes from the pool
+        model.set_params(n_jobs=1)
+    model.fit(X[train], y[train])
+    return get_scorer(scoring)(model, X[valid], y[valid])
+
+
+def successive_halving(X, y, name, n_candidates=27, factor=3, min_rows=5_000, n_splits=5,
+                       scoring='roc_auc', n_workers=None, random_state=42):
+    """Stratified k-fold CV over a sampled search space with successive halving.
+
+    Each round scores every surviving candidate on all folds using a
+    training-row budget, keeps the best 1/`factor`, and multiplies the
+    budget by `factor`; the final round uses all rows.
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    rng = np.random.default_rng(random_state)
+    folds = np.empty(len(y), dtype=np.int8)
+    for k, (_, valid) in enumerate(StratifiedKFold(n_splits, shuffle=True, random_state=random_state)
+                                   .split(np.zeros(len(y)), y)):
+        folds[valid] = k
+    order = rng.permutation(len(y))
+
+    # Plain Python values, so candidates print and save as JSON cleanly
+    candidates = [{k: v.item() if isinstance(v, np.generic) else v for k, v in params.items()}
+                  for params in ParameterSampler(SEARCH_SPACES[name], n_candidates, random_state=random_state)]
+    n_rounds = max(1, math.ceil(math.log(len(candidates), factor)) + 1)
+    budget = max(min_rows, len(y) // factor ** (n_rounds - 1))
+    history = []
+
+    path = publish_matrix(X, y, folds=folds, order=order)
+    try:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(path,)) as pool:
+            for round_no in range(n_rounds):
+                n_rows = len(y) if round_no == n_rounds - 1 else min(budget, len(y))
+                start = time.perf_counter()
+                tasks = [(name, params, k, n_rows, scoring) for params in candidates for k in range(n_splits)]
+                scores = np.array(list(pool.map(_evaluate, tasks))).reshape(len(candidates), n_splits)
+                means = scores.mean(axis=1)
+                for params, mean, std in zip(candidates, means, scores.std(axis=1)):
+                    history.append({'round': round_no, 'n_rows': n_rows, 'params': params,
+                                    'mean_score': float(mean), 'std_score': float(std)})
+                print(f"  round {round_no}: {len(candidates)} candidates x {n_splits} folds on {n_rows:,} rows, "
+                      f"best {scoring} {means.max():.4f} ({time.perf_counter() - start:.1f}s)")
+
+                if n_rows >= len(y) or len(candidates) == 1:
+                    break
+                keep = max(1, len(candidates) // factor)
+                candidates = [candidates[i] for i in np.argsort(-means, kind='stable')[:keep]]
+                budget *= factor
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+    best = int(np.argmax(means))
+    return candidates[best], float(means[best]), history
+
+
+def tune(X, y, model_names=tuple(BASE_MODELS), **kwargs):
+    results = {}
+    for name in model_names:
+        print(f"\nTuning {name}...")
+        params, score, history = successive_halving(X, y, name, **kwargs)
+        print(f"Best {name}: {params} (mean CV score {score:.4f})")
+        results[name] = {'params': params, 'mean_score': score, 'history': history}
+    return results
+
+
+def save_params(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+
+
+def load_params(path):
+    with open(path) as f:
+        return {name: result['params'] for name, result in json.load(f).items()}
@@ -1,27 +1,126 @@
+import sys
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import queue
 import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import os
 
-# Set style for better aesthetics
-sns.set_theme(style="whitegrid")
-plt.rcParams['figure.figsize'] = (10, 6)
+from instrument import step
+from run_10_queries import QUERIES
+
+# Style for better aesthetics; applied when the plotting libraries are first imported
+THEME = {'style': 'whitegrid'}
+RC_PARAMS = {'figure.figsize': (10, 6)}
+
+DB_PATH = 'data/hospital.db'
+# Query results, one pickle per SQL text, valid while the database is unchanged
+CACHE_DIR = os.path.join('data', '.query_cache')
+
+# Key of the data and plot spec each figure was last drawn from
+PLOT_STATE_FILE = os.path.join('output', '.plot_state.json')
 
 def create_output_dir():
     if not os.path.exists('output'):
         os.makedirs('output')
 
-def get_data(query):
-    conn = sqlite3.connect('data/hospital.db')
-    df = pd.read_sql_query(query, conn)
-    conn.close()
+
+def _pyplot():
+    """Import matplotlib (headless Agg backend) and seaborn on first use, and apply the theme."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    if not getattr(_pyplot, 'themed', False):
+        sns.set_theme(**THEME)
+        plt.rcParams.update(RC_PARAMS)
+        _pyplot.themed = True
+    return plt, sns
+
+
+class ConnectionPool:
+    """A fixed set of read-only connections shared by the plotting threads."""
+
+    def __init__(self, db_path=DB_PATH, size=4):
+        uri = f'file:{os.path.abspath(db_path)}?mode=ro'
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(sqlite3.connect(uri, uri=True, check_same_thread=False))
+
+    @contextmanager
+    def connection(self):
+        conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get().close()
+
+
+_POOLS = {}
+# Plotting threads ask for a pool concurrently; without the lock two of
+# them can each open one for the same database
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(db_path=DB_PATH):
+    with _POOLS_LOCK:
+        if db_path not in _POOLS:
+            _POOLS[db_path] = ConnectionPool(db_path)
+        return _POOLS[db_path]
+
+
+def db_stamp(db_path=DB_PATH):
+    """Size and mtime of the database and its WAL; any committed write changes one of them.
+
+    An empty WAL holds no changes (readers create one on open), so it is ignored.
+    """
+    stamp = []
+    for path in [db_path, db_path + '-wal']:
+        if os.path.exists(path) and os.path.getsize(path):
+            st = os.stat(path)
+            stamp += [st.st_size, st.st_mtime_ns]
+    return stamp
+
+
+def get_data(query, db_path=DB_PATH, cache_dir=CACHE_DIR):
+    """Result of `query`, from the cache when the database has not changed since it was stored."""
+    stamp = db_stamp(db_path)
+    cache_path = os.path.join(cache_dir, hashlib.sha256(query.encode()).hexdigest() + '.pkl')
+    if os.path.exists(cache_path):
+        with open(cache_path, 'rb') as f:
+            cached = pickle.load(f)
+        if cached['stamp'] == stamp and cached['query'] == query:
+            return cached['df']
+
+    with get_pool(db_path).connection() as conn:
+        df = pd.read_sql_query(query, conn)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f'{cache_path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump({'query': query, 'stamp': stamp, 'df': df}, f)
+    os.replace(tmp, cache_path)
     return df
 
-def plot_race_distribution():
+
+def get_many(queries, db_path=DB_PATH, max_workers=4):
+    """Run independent queries concurrently; sqlite3 releases the GIL while a query executes."""
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(lambda q: get_data(q, db_path), queries))
+
+
+def plot_race_distribution(df, path):
     print("Plotting Race Distribution...")
-    query = "SELECT race, COUNT(*) as count FROM patients GROUP BY race ORDER BY count DESC;"
-    df = get_data(query)
+    plt, sns = _pyplot()
     
     plt.figure(figsize=(10, 6))
     sns.barplot(x='count', y='race', data=df, palette='viridis')
@@ -29,13 +128,12 @@ def plot_race_distribution():
     plt.xlabel('Count')
     plt.ylabel('Race')
     plt.tight_layout()
-    plt.savefig('output/1_race_distribution.png')
+    plt.savefig(path)
     plt.close()
 
-def plot_avg_time_hospital_gender():
+def plot_avg_time_hospital_gender(df, path):
     print("Plotting Avg Time in Hospital by Gender...")
-    query = "SELECT gender, AVG(time_in_hospital) as avg_time FROM patients GROUP BY gender;"
-    df = get_data(query)
+    plt, sns = _pyplot()
     # Filter out invalid gender if any
     df = df[df['gender'] != 'Unknown/Invalid']
     
@@ -45,13 +143,12 @@ def plot_avg_time_hospital_gender():
     plt.xlabel('Gender')
     plt.ylabel('Average Days')
     plt.tight_layout()
-    plt.savefig('output/2_avg_time_hospital_gender.png')
+    plt.savefig(path)
     plt.close()
 
-def plot_readmission_by_age():
+def plot_readmission_by_age(df, path):
     print("Plotting Readmission Rate by Age...")
-    query = "SELECT age, AVG(readmitted_binary) as readmission_rate FROM patients GROUP BY age ORDER BY age;"
-    df = get_data(query)
+    plt, sns = _pyplot()
     
     plt.figure(figsize=(12, 6))
     sns.lineplot(x='age', y='readmission_rate', data=df, marker='o', color='b')
@@ -60,13 +157,12 @@ def plot_readmission_by_age():
     plt.ylabel('Readmission Rate')
     plt.xticks(rotation=45)
     plt.tight_layout()
-    plt.savefig('output/3_readmission_by_age.png')
+    plt.savefig(path)
     plt.close()
 
-def plot_top_diagnosis():
+def plot_top_diagnosis(df, path):
     print("Plotting Top Diagnosis Categories...")
-    query = "SELECT diag_1_cat, COUNT(*) as count FROM patients GROUP BY diag_1_cat ORDER BY count DESC LIMIT 5;"
-    df = get_data(query)
+    plt, sns = _pyplot()
     
     plt.figure(figsize=(10, 6))
     sns.barplot(x='count', y='diag_1_cat', data=df, palette='crest')
@@ -74,13 +170,12 @@ def plot_top_diagnosis():
     plt.xlabel('Count')
     plt.ylabel('Diagnosis Category')
     plt.tight_layout()
-    plt.savefig('output/4_top_diagnosis.png')
+    plt.savefig(path)
     plt.close()
 
-def plot_lab_procedures_readmission():
+def plot_lab_procedures_readmission(df, path):
     print("Plotting Lab Procedures vs Readmission...")
-    query = "SELECT readmitted_binary, AVG(num_lab_procedures) as avg_lab_procedures FROM patients GROUP BY readmitted_binary;"
-    df = get_data(query)
+    plt, sns = _pyplot()
     
     plt.figure(figsize=(8, 6))
     sns.barplot(x='readmitted_binary', y='avg_lab_procedures', data=df, palette='rocket')
@@ -89,13 +184,12 @@ def plot_lab_procedures_readmission():
     plt.ylabel('Avg Lab Procedures')
     plt.xticks([0, 1], ['No', 'Yes'])
     plt.tight_layout()
-    plt.savefig('output/5_lab_procedures_readmission.png')
+    plt.savefig(path)
     plt.close()
 
-def plot_insulin_distribution():
+def plot_insulin_distribution(df, path):
     print("Plotting Insulin Usage Distribution...")
-    query = "SELECT insulin, COUNT(*) as count FROM patients GROUP BY insulin ORDER BY count DESC;"
-    df = get_data(query)
+    plt, sns = _pyplot()
     
     plt.figure(figsize=(8, 6))
     sns.barplot(x='insulin', y='count', data=df, palette='pastel')
@@ -103,13 +197,12 @@ def plot_insulin_distribution():
     plt.xlabel('Insulin Status')
     plt.ylabel('Count')
     plt.tight_layout()
-    plt.savefig('output/6_insulin_distribution.png')
+    plt.savefig(path)
     plt.close()
 
-def plot_a1c_distribution():
+def plot_a1c_distribution(df, path):
     print("Plotting A1C Result Distribution...")
-    query = "SELECT A1Cresult, COUNT(*) as count FROM patients GROUP BY A1Cresult ORDER BY count DESC;"
-    df = get_data(query)
+    plt, sns = _pyplot()
     
     plt.figure(figsize=(8, 6))
     sns.barplot(x='A1Cresult', y='count', data=df, palette='muted')
@@ -117,13 +210,12 @@ def plot_a1c_distribution():
     plt.xlabel('A1C Result')
     plt.ylabel('Count')
     plt.tight_layout()
-    plt.savefig('output/7_a1c_distribution.png')
+    plt.savefig(path)
     plt.close()
 
-def plot_max_glucose_distribution():
+def plot_max_glucose_distribution(df, path):
     print("Plotting Max Glucose Serum Distribution...")
-    query = "SELECT max_glu_serum, COUNT(*) as count FROM patients GROUP BY max_glu_serum ORDER BY count DESC;"
-    df = get_data(query)
+    plt, sns = _pyplot()
     
     plt.figure(figsize=(8, 6))
     sns.barplot(x='max_glu_serum', y='count', data=df, palette='dark')
@@ -131,20 +223,101 @@ def plot_max_glucose_distribution():
     plt.xlabel('Max Glucose Serum')
     plt.ylabel('Count')
     plt.tight_layout()
-    plt.savefig('output/8_max_glucose_distribution.png')
+    plt.savefig(path)
     plt.close()
 
-def main():
+# Each plot and the run_10_queries.QUERIES entry that feeds it, by number
+PLOTS = [
+    (plot_race_distribution, 'output/1_race_distribution.png', 1),
+    (plot_avg_time_hospital_gender, 'output/2_avg_time_hospital_gender.png', 2),
+    (plot_readmission_by_age, 'output/3_readmission_by_age.png', 3),
+    (plot_top_diagnosis, 'output/4_top_diagnosis.png', 4),
+    (plot_lab_procedures_readmission, 'output/5_lab_procedures_readmission.png', 5),
+    (plot_insulin_distribution, 'output/6_insulin_distribution.png', 6),
+    (plot_a1c_distribution, 'output/7_a1c_distribution.png', 8),
+    (plot_max_glucose_distribution, 'output/8_max_glucose_distribution.png', 10),
+]
+
+
+def plot_query(number):
+    """SQL of query `number` of run_10_queries.QUERIES (titles start with the number)."""
+    for title, sql in QUERIES:
+        if title.startswith(f'{number}. '):
+            return sql
+    raise KeyError(f"run_10_queries.QUERIES has no query {number}")
+
+
+def plot_key(plot, df):
+    """Hash of what a figure is drawn from: its data, the plot function's code and the theme."""
+    spec = json.dumps({'code': inspect.getsource(plot), 'theme': THEME, 'rc': RC_PARAMS}, sort_keys=True)
+    digest = hashlib.sha256(spec.encode())
+    digest.update(df.to_csv(index=False).encode())
+    return digest.hexdigest()
+
+
+def load_plot_state(path=PLOT_STATE_FILE):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def save_plot_state(state, path=PLOT_STATE_FILE):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _draw(task):
+    plot, df, path = task
+    with step('draw', rows_in=len(df), plot=plot.__name__) as s:
+        plot(df, path)
+        s.wrote(path)
+    return path
+
+
+def render(jobs=None, force=False, db_path=DB_PATH):
+    """Draw the figures whose data or plot spec changed, in parallel worker processes.
+
+    A figure is skipped when its file exists and its key matches the one
+    recorded when it was last drawn.
+    """
     create_output_dir()
-    plot_race_distribution()
-    plot_avg_time_hospital_gender()
-    plot_readmission_by_age()
-    plot_top_diagnosis()
-    plot_lab_procedures_readmission()
-    plot_insulin_distribution()
-    plot_a1c_distribution()
-    plot_max_glucose_distribution()
-    print("All plots generated successfully in 'output/' directory.")
+    # All queries first, concurrently; the plots then only draw
+    with step('queries', queries=len(PLOTS)) as s:
+        results = get_many([plot_query(number) for _, _, number in PLOTS], db_path)
+        s.rows_out = sum(len(df) for df in results)
+    state = load_plot_state()
+    tasks, keys = [], {}
+    for (plot, path, _), df in zip(PLOTS, results):
+        keys[path] = plot_key(plot, df)
+        if not force and state.get(path) == keys[path] and os.path.exists(path):
+            print(f"Skipping {path} (unchanged)")
+            continue
+        tasks.append((plot, df, path))
+
+    jobs = min(jobs or os.cpu_count() or 1, len(tasks))
+    with step('draw_all', plots=len(tasks), jobs=jobs) as s:
+        if jobs > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                drawn = list(pool.map(_draw, tasks))
+        else:
+            drawn = [_draw(task) for task in tasks]
+        for path in drawn:
+            s.wrote(path)
+
+    state.update({path: keys[path] for path in drawn})
+    save_plot_state(state)
+    return drawn
+
+
+def main(jobs=None, force=False, db_path=DB_PATH):
+    with step('render', plots=len(PLOTS)) as s:
+        drawn = render(jobs, force, db_path)
+        s.fields['drawn'] = len(drawn)
+    print(f"{len(drawn)} of {len(PLOTS)} plots drawn; all plots are in 'output/' directory.")
 
 if __name__ == "__main__":
-    main()
+    import cli
+    cli.main(['plots'] + sys.argv[1:])